@@ -0,0 +1,104 @@
+"""
+Compara o chunking antigo (valores do JSON concatenados + corte a cada 1000 caracteres)
+com o StructuredJSONChunker: número de trechos, tokens de embedding e precisão da busca.
+
+    cd Modelo/src
+    python -m RAG.chunking_report            # usa embeddings da OpenAI
+    python -m RAG.chunking_report --fake     # embedder local, sem rede
+"""
+import json
+import math
+import argparse
+
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from RAG.eval_retrieval import load_eval_set, is_relevant
+from RAG.index_data_for_rag import MANUAL_PATH
+from RAG.structured_chunker import StructuredJSONChunker
+
+
+def count_tokens(texts: list) -> int:
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return sum(len(encoding.encode(t)) for t in texts)
+    except ImportError:
+        return sum(math.ceil(len(t) / 4) for t in texts)
+
+
+def legacy_chunks(items: list, chunk_size: int = 1000, chunk_overlap: int = 100) -> list:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    documents = [
+        Document(page_content="\n\n".join(str(v).strip() for v in data.values()), metadata=metadata)
+        for data, metadata in items
+    ]
+    return splitter.split_documents(documents)
+
+
+def _unit(vector: list) -> list:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def precision_at_k(chunks: list, cases: list, embedder, k: int) -> float:
+    vectors = [_unit(v) for v in embedder.embed_documents([c.page_content for c in chunks])]
+    precisions = []
+    for case in cases:
+        query = _unit(embedder.embed_query(case["query"]))
+        scored = sorted(
+            range(len(chunks)),
+            key=lambda i: sum(a * b for a, b in zip(query, vectors[i])),
+            reverse=True,
+        )[:k]
+        relevant = sum(1 for i in scored if is_relevant(chunks[i], case))
+        precisions.append(relevant / k)
+    return round(sum(precisions) / len(precisions), 4) if precisions else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--manual", default=MANUAL_PATH)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--fake", action="store_true", help="usa o HashingEmbedder local")
+    args = parser.parse_args()
+
+    with open(args.manual, encoding="utf-8") as f:
+        items = [(json.load(f), {"source_table": "manual_estruturado", "file_name": "manual_estruturado.json"})]
+
+    if args.fake:
+        from bench.fakes import HashingEmbedder
+
+        embedder = HashingEmbedder()
+    else:
+        from dotenv import load_dotenv
+        from langchain_openai import OpenAIEmbeddings
+
+        load_dotenv()
+        embedder = OpenAIEmbeddings(model="text-embedding-3-small")
+
+    variants = {
+        "antigo": legacy_chunks(items),
+        "estruturado": StructuredJSONChunker().split(items),
+    }
+
+    # Só entram na precisão as consultas que têm algum trecho relevante neste corpus.
+    cases = [
+        case for case in load_eval_set()
+        if any(is_relevant(chunk, case) for chunks in variants.values() for chunk in chunks)
+    ]
+
+    report = {}
+    for name, chunks in variants.items():
+        report[name] = {
+            "trechos": len(chunks),
+            "tokens_embedding": count_tokens([c.page_content for c in chunks]),
+            f"precisao_at_{args.k}": precision_at_k(chunks, cases, embedder, args.k),
+        }
+    report["consultas_avaliadas"] = len(cases)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Avaliação offline da busca de documentação: recall@k e latência, busca densa vs híbrida.
+
+    cd Modelo/src
+    python -m RAG.eval_retrieval --k 5
+"""
+import os
+import json
+import time
+import argparse
+
+from dotenv import load_dotenv
+
+from helpers.text import fold_accents
+from RAG.hybrid_search import HybridRetriever, load_lexical_index
+from RAG.index_store import current_directory
+
+DEFAULT_EVAL_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrieval_eval_set.jsonl")
+
+
+def load_eval_set(path: str = DEFAULT_EVAL_SET) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_relevant(doc, case: dict) -> bool:
+    text = fold_accents(doc.page_content.lower())
+    if any(fold_accents(term.lower()) in text for term in case.get("relevant_terms", [])):
+        return True
+    expected = case.get("relevant_metadata")
+    if expected:
+        return all(doc.metadata.get(k) == v for k, v in expected.items())
+    return False
+
+
+def evaluate(retriever, cases: list) -> dict:
+    """recall@k por consulta (1 se algum trecho relevante aparece no top-k) e latências."""
+    hits, latencies = 0, []
+    misses = []
+    for case in cases:
+        start = time.perf_counter()
+        docs = retriever.search(case["query"], case.get("source_filter"))
+        latencies.append(time.perf_counter() - start)
+        if any(is_relevant(doc, case) for doc in docs):
+            hits += 1
+        else:
+            misses.append(case["query"])
+
+    latencies.sort()
+    return {
+        "recall_at_k": round(hits / len(cases), 4) if cases else 0.0,
+        "latency_mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "latency_p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2) if latencies else 0.0,
+        "misses": misses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index-dir", default=current_directory(), help="padrão: versão publicada em RAG_INDEX_ROOT")
+    parser.add_argument("--eval-set", default=DEFAULT_EVAL_SET)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    load_dotenv()
+    from langchain_community.vectorstores import Chroma
+    from langchain_openai import OpenAIEmbeddings
+    from cache.cache import ManualCachedEmbedder
+
+    embedder = ManualCachedEmbedder(base_embedder=OpenAIEmbeddings(model="text-embedding-3-small"))
+    vectorstore = Chroma(persist_directory=args.index_dir, embedding_function=embedder)
+    cases = load_eval_set(args.eval_set)
+
+    # Aquece o cache de embeddings para que a latência compare só a busca.
+    embedder.embed_documents([case["query"] for case in cases])
+
+    lexical_index = load_lexical_index(args.index_dir)
+    if lexical_index is None:
+        print("Aviso: índice lexical não encontrado; rode o RAGIndexer novamente.")
+
+    results = {
+        "densa": evaluate(HybridRetriever(vectorstore, None, k=args.k), cases),
+        "hibrida": evaluate(HybridRetriever(vectorstore, lexical_index, k=args.k), cases),
+    }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
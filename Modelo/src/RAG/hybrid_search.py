@@ -0,0 +1,84 @@
+import os
+import hashlib
+from typing import Optional
+
+from langchain_core.documents import Document
+
+from RAG.lexical_index import BM25Index, LEXICAL_INDEX_FILE
+
+_loaded_indexes = {}
+
+
+def load_lexical_index(directory: str) -> Optional[BM25Index]:
+    """
+    Carrega o índice BM25 uma vez por processo; recarrega se o arquivo mudar. Ao trocar
+    de diretório (versão nova publicada), o índice anterior é descartado.
+    """
+    path = os.path.join(directory, LEXICAL_INDEX_FILE)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _loaded_indexes.get(directory)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    index = BM25Index.load(directory)
+    _loaded_indexes.clear()
+    _loaded_indexes[directory] = (mtime, index)
+    return index
+
+
+def reciprocal_rank_fusion(ranked_lists: list, k: int = 60) -> list:
+    """Funde listas de ids ordenadas: score(d) = soma de 1 / (k + posição)."""
+    scores = {}
+    for ranked in ranked_lists:
+        for rank, doc_id in enumerate(ranked, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def document_key(doc: Document) -> str:
+    chunk_id = doc.metadata.get("chunk_id")
+    if chunk_id:
+        return chunk_id
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class HybridRetriever:
+    """
+    Busca densa (Chroma) + lexical (BM25) fundidas por RRF. O `source_filter` é aplicado
+    nas duas buscas. Sem índice lexical, cai para a busca densa pura.
+    """
+
+    def __init__(self, vectorstore, lexical_index: Optional[BM25Index] = None,
+                 k: int = 5, fetch_k: int = 20, rrf_k: int = 60):
+        self.vectorstore = vectorstore
+        self.lexical_index = lexical_index
+        self.k = k
+        self.fetch_k = fetch_k
+        self.rrf_k = rrf_k
+
+    def _dense(self, query: str, source_filter: Optional[dict], fetch_k: int) -> list:
+        kwargs = {"k": fetch_k}
+        if source_filter:
+            kwargs["filter"] = source_filter
+        return self.vectorstore.similarity_search(query, **kwargs)
+
+    def search(self, query: str, source_filter: Optional[dict] = None) -> list:
+        if self.lexical_index is None:
+            return self._dense(query, source_filter, self.k)
+
+        dense_docs = self._dense(query, source_filter, self.fetch_k)
+        lexical_hits = self.lexical_index.search(query, k=self.fetch_k, source_filter=source_filter)
+
+        by_key = {document_key(doc): doc for doc in dense_docs}
+        dense_ranking = list(by_key)
+        lexical_ranking = [doc_id for doc_id, _ in lexical_hits]
+
+        fused = reciprocal_rank_fusion([dense_ranking, lexical_ranking], k=self.rrf_k)[:self.k]
+        results = []
+        for doc_id in fused:
+            doc = by_key.get(doc_id) or self.lexical_index.document(doc_id)
+            if doc is not None:
+                results.append(doc)
+        return results
@@ -1,5 +1,7 @@
 import os
 import json
+import shutil
+import hashlib
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
@@ -8,17 +10,60 @@ from dotenv import load_dotenv
 import pyodbc
 import fitz
 
+from RAG.lexical_index import BM25Index
+from llm_scheduler.coordinator import scheduler_enabled
+from llm_scheduler.langchain_gate import GatedEmbeddings
+from RAG.quantized_store import QuantizedVectorStore
+from RAG.index_store import DEFAULT_INDEX_ROOT, new_version, validate_version, publish, collect_garbage
+from RAG.structured_chunker import StructuredJSONChunker
+from RAG.source_loaders import ConnectionPool, ConcurrentSourceReader, fetch_rows
+
+MANUAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "manual_estruturado.json")
+
+DEFAULT_JSON_TABLES = [
+    "tecelagem_e_revisao", "mantas", "recepcao_de_materiais", "preparacao_de_fios",
+    "pean_sean_felts_PSF", "metrologia", "expedicao", "acabamento",
+]
+DEFAULT_PDF_TABLES = ["DocumentosPDF"]
+
+
+def _tables_from_env(name: str, default: list) -> list:
+    value = os.getenv(name)
+    return [t.strip() for t in value.split(",") if t.strip()] if value else list(default)
+
 class RAGIndexer:
-    def __init__(self, persist_directory: str = "./rag_db", 
+    def __init__(self, index_root: str = DEFAULT_INDEX_ROOT, 
                  embedding_model: str = "text-embedding-3-small",
                  chunk_size: int = 1000, 
                  chunk_overlap: int = 100,
-                 db_config: dict = None):
+                 db_config: dict = None,
+                 manual_path: str = MANUAL_PATH,
+                 quantized_dtype: str = "int8",
+                 quantized_nlist: int = 0,
+                 keep_versions: int = 3,
+                 json_tables: list = None,
+                 pdf_tables: list = None,
+                 loader_workers: int = None,
+                 fetch_batch_size: int = None):
         
-        self.persist_directory = persist_directory
+        self.index_root = index_root
+        self.keep_versions = keep_versions
         self.embeddings = OpenAIEmbeddings(model=embedding_model)
+        if scheduler_enabled():
+            # Prioridade de fundo: a indexação só usa a cota que os chats deixam livre.
+            self.embeddings = GatedEmbeddings(self.embeddings, priority="background")
         self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.json_chunker = StructuredJSONChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
         self.db_config = db_config 
+        self.manual_path = manual_path
+        self.quantized_dtype = quantized_dtype
+        self.quantized_nlist = quantized_nlist
+        # Tabelas lidas em paralelo, configuráveis por RAG_JSON_TABLES / RAG_PDF_TABLES (separadas por vírgula).
+        self.json_tables = json_tables or _tables_from_env("RAG_JSON_TABLES", DEFAULT_JSON_TABLES)
+        self.pdf_tables = pdf_tables or _tables_from_env("RAG_PDF_TABLES", DEFAULT_PDF_TABLES)
+        self.loader_workers = loader_workers or int(os.getenv("RAG_LOADER_WORKERS", "4"))
+        self.fetch_batch_size = fetch_batch_size or int(os.getenv("RAG_FETCH_BATCH_SIZE", "200"))
+        self.pool = None
 
     def _get_db_connection(self):
         if not self.db_config:
@@ -35,141 +80,159 @@ class RAGIndexer:
             print(f"Erro ao conectar ao SQL Server: {ex}")
             return None
     
-    def _load_docs_from_pdf_in_db(self, table_name: str, id_column: str = 'id', filename_column: str = 'file_name', content_column: str = 'pdf_content') -> list[Document]:
-        documents = []
-        print(f"Buscando PDFs da tabela '{table_name}' para extração de texto...")
-        
-        try:
-            with self._get_db_connection() as conn:
-                if not conn: return []
-                with conn.cursor() as cursor:
-                    query = f"SELECT {id_column}, {filename_column}, {content_column} FROM {table_name}"
-                    cursor.execute(query)
-                    
-                    for row in cursor.fetchall():
-                        pdf_id = row[0]
-                        pdf_filename = row[1]
-                        pdf_binary_data = row[2]
-
-                        if not pdf_binary_data:
-                            continue
-
-                        print(f"  - Processando PDF: ID={pdf_id}, Nome='{pdf_filename}'")
-                        
-                        try:
-                            # Abre o PDF a partir dos dados binários em memória
-                            with fitz.open(stream=pdf_binary_data, filetype="pdf") as doc:
-                                extracted_text = ""
-                                for page in doc:
-                                    extracted_text += page.get_text("text")
-                                
-                                if extracted_text:
-                                    metadata = {
-                                        "source_table": table_name,
-                                        "file_name": pdf_filename,
-                                        "content_column": content_column,
-                                    }
-                                    documents.append(Document(page_content=extracted_text, metadata=metadata))
-
-                        except Exception as e:
-                            print(f"    ERRO: Não foi possível processar o PDF com ID={pdf_id}. Erro: {e}")
-
-            print(f"Extração concluída. Coletados {len(documents)} documentos a partir dos PDFs.")
-        except Exception as e:
-            print(f"Erro geral ao buscar dados da tabela de PDF '{table_name}': {e}")
-            
-        return documents
-
-    def _extract_content_and_metadata(self, row_data: dict, table_name: str, name_column: str = None, doc_type: str = None) -> Document:
-        metadata = {"source_table": table_name}
-        if 'id' in row_data:
-            metadata['id'] = row_data['id']
-        if name_column and name_column in row_data:
-            metadata['file_name'] = row_data[name_column]
-        if doc_type:
-            metadata['type'] = doc_type
-        
-        clean_row_data = {k: str(v or '').strip() for k, v in row_data.items()}
-        content_for_page = json.dumps(clean_row_data, ensure_ascii=False, indent=2)
-        return Document(page_content=content_for_page, metadata=metadata)
-        
-    def _load_data_from_sql(self, table_name: str, name_column: str = None, doc_type: str = None) -> list[Document]:
-        documents = []
-        try:
-            with self._get_db_connection() as conn:
-                if not conn: return []
-                with conn.cursor() as cursor:
-                    cursor.execute(f"SELECT * FROM {table_name}")
-                    columns = [column[0] for column in cursor.description]
-
-                    for row in cursor.fetchall():
-                        row_dict = dict(zip(columns, row))
-                        doc = self._extract_content_and_metadata(row_dict, table_name, name_column, doc_type)
-                        documents.append(doc)
-            print(f"Coletados {len(documents)} documentos da tabela '{table_name}'.")
-        except Exception as e:
-            print(f"Erro ao processar dados da tabela '{table_name}': {e}")
-        return documents
+    def _iter_docs_from_pdf_in_db(self, table_name: str, stats=None, id_column: str = 'id', filename_column: str = 'file_name', content_column: str = 'pdf_content'):
+        """Gera um Document por PDF da tabela, extraindo o texto conforme as linhas chegam."""
+        query = f"SELECT {id_column}, {filename_column}, {content_column} FROM {table_name}"
+        with self.pool.connection() as conn:
+            for row in fetch_rows(conn, query, self.fetch_batch_size):
+                if stats: stats.rows += 1
+                pdf_id = row[id_column]
+                pdf_filename = row[filename_column]
+                pdf_binary_data = row[content_column]
+
+                if not pdf_binary_data:
+                    if stats: stats.skipped += 1
+                    continue
+
+                try:
+                    # Abre o PDF a partir dos dados binários em memória
+                    with fitz.open(stream=pdf_binary_data, filetype="pdf") as doc:
+                        extracted_text = "".join(page.get_text("text") for page in doc)
+                except Exception as e:
+                    print(f"    ERRO: Não foi possível processar o PDF com ID={pdf_id}. Erro: {e}")
+                    if stats: stats.skipped += 1
+                    continue
+
+                if extracted_text:
+                    metadata = {
+                        "source_table": table_name,
+                        "id": pdf_id,
+                        "file_name": pdf_filename,
+                        "content_column": content_column,
+                    }
+                    yield Document(page_content=extracted_text, metadata=metadata)
 
-    def _load_docs_from_json_column(self, table_name: str, content_column: str = 'file_content', metadata_columns: list = ['id', 'file_name']) -> list[Document]:
-        documents = []
+    def _iter_json_items_from_column(self, table_name: str, stats=None, content_column: str = 'file_content', metadata_columns: list = ['id', 'file_name']):
+        """Gera pares (json, metadados) para o StructuredJSONChunker, sem concatenar as seções."""
+        columns_to_select = ", ".join(metadata_columns + [content_column])
+        with self.pool.connection() as conn:
+            for row_dict in fetch_rows(conn, f"SELECT {columns_to_select} FROM {table_name}", self.fetch_batch_size):
+                if stats: stats.rows += 1
+                json_string = row_dict.get(content_column)
+                try:
+                    data = json.loads(json_string) if json_string else None
+                except json.JSONDecodeError:
+                    data = None
+                if data is None:
+                    if stats: stats.skipped += 1
+                    continue
+                metadata = {"source_table": table_name, "content_column": content_column}
+                for col in metadata_columns:
+                    if col in row_dict: metadata[col] = row_dict[col]
+                yield data, metadata
+
+    def _load_manual_items(self) -> list[tuple]:
         try:
-            with self._get_db_connection() as conn:
-                if not conn: return []
-                with conn.cursor() as cursor:
-                    columns_to_select = ", ".join(metadata_columns + [content_column])
-                    cursor.execute(f"SELECT {columns_to_select} FROM {table_name}")
-                    print(f"Buscando e processando documentos da tabela '{table_name}' (formato JSON)...")
-                    cols = [column[0] for column in cursor.description]
-                    for row in cursor.fetchall():
-                        row_dict = dict(zip(cols, row))
-                        json_string = row_dict.get(content_column)
-                        if not json_string: continue
-                        try:
-                            data = json.loads(json_string)
-                            page_content = "\n\n".join(str(value).strip() for value in data.values())
-                            metadata = {"source_table": table_name, "content_column": content_column}
-                            for col in metadata_columns:
-                                if col in row_dict: metadata[col] = row_dict[col]
-                            documents.append(Document(page_content=page_content, metadata=metadata))
-                        except json.JSONDecodeError:
-                            pass
-            print(f"Coletados e processados {len(documents)} documentos da tabela '{table_name}'.")
-        except Exception as e:
-            print(f"Erro ao processar a tabela '{table_name}': {e}")
-        return documents
+            with open(self.manual_path, encoding="utf-8") as f:
+                manual = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Erro ao carregar o manual estruturado '{self.manual_path}': {e}")
+            return []
+        metadata = {"source_table": "manual_estruturado", "file_name": os.path.basename(self.manual_path)}
+        return [(manual, metadata)]
     
+    def _assign_chunk_ids(self, chunks: list[Document]) -> list[str]:
+        """
+        Id do fragmento = hash(fonte, id da linha, posição do fragmento dentro da linha).
+        Inserir ou remover uma linha na origem não muda o id dos fragmentos das outras.
+        """
+        offsets = {}
+        ids = []
+        for chunk in chunks:
+            source = chunk.metadata.get("source_table", "")
+            row = chunk.metadata.get("id", chunk.metadata.get("file_name", ""))
+            offset = offsets.get((source, row), 0)
+            offsets[(source, row)] = offset + 1
+            digest = hashlib.sha1(f"{source}|{row}|{offset}".encode("utf-8")).hexdigest()
+            chunk.metadata["chunk_id"] = digest
+            ids.append(digest)
+        return ids
+
+    def _load_sources(self) -> tuple:
+        """
+        Lê todas as tabelas em paralelo pelo pool de conexões. Os PDFs são fragmentados assim
+        que chegam; os itens JSON ficam por fonte porque o StructuredJSONChunker precisa do
+        conjunto inteiro para detectar boilerplate. A saída segue a ordem configurada das
+        tabelas, para os ids dos fragmentos não dependerem de qual leitura terminou antes.
+        O pool é criado a cada execução e fechado no fim, então o mesmo indexador pode
+        rodar index_data() de novo.
+        """
+        self.pool = ConnectionPool(self._get_db_connection, size=self.loader_workers)
+        sources = [(t, lambda stats, t=t: self._iter_json_items_from_column(t, stats)) for t in self.json_tables]
+        sources += [(t, lambda stats, t=t: self._iter_docs_from_pdf_in_db(t, stats)) for t in self.pdf_tables]
+
+        reader = ConcurrentSourceReader(workers=self.loader_workers)
+        json_by_source = {t: [] for t in self.json_tables}
+        pdf_chunks_by_source = {t: [] for t in self.pdf_tables}
+        try:
+            for source, item in reader.stream(sources):
+                if source in pdf_chunks_by_source:
+                    pdf_chunks_by_source[source].extend(self.text_splitter.split_documents([item]))
+                else:
+                    json_by_source[source].append(item)
+        finally:
+            self.pool.close_all()
+
+        print("Leitura das fontes:\n" + reader.report())
+        json_items = [item for t in self.json_tables for item in json_by_source[t]]
+        pdf_chunks = [chunk for t in self.pdf_tables for chunk in pdf_chunks_by_source[t]]
+        return json_items, pdf_chunks, reader.stats
+
     def index_data(self):
-        all_documents = []
-
-        all_documents.extend(self._load_docs_from_json_column(table_name="tecelagem_e_revisao"))
-        all_documents.extend(self._load_docs_from_json_column(table_name="mantas"))
-        all_documents.extend(self._load_docs_from_json_column(table_name="recepcao_de_materiais"))
-        all_documents.extend(self._load_docs_from_json_column(table_name="preparacao_de_fios"))
-        all_documents.extend(self._load_docs_from_json_column(table_name="pean_sean_felts_PSF"))
-        all_documents.extend(self._load_docs_from_json_column(table_name="metrologia"))
-        all_documents.extend(self._load_docs_from_json_column(table_name="expedicao"))
-        all_documents.extend(self._load_docs_from_json_column(table_name="acabamento"))
-        all_documents.extend(self._load_docs_from_pdf_in_db(table_name="DocumentosPDF"))
-        
-        if not all_documents:
+        json_items, pdf_chunks, stats = self._load_sources()
+        failed = {name: s.error for name, s in stats.items() if s.error}
+        if failed:
+            # Publicar uma leitura parcial trocaria o índice bom por um menor; a versão atual fica.
+            for name, error in failed.items():
+                print(f"    ERRO: falha ao ler a fonte '{name}': {error}")
+            print(f"Leitura incompleta ({len(failed)} de {len(stats)} fontes com erro). Indexação abortada.")
+            return
+        json_items.extend(self._load_manual_items())
+
+        if not json_items and not pdf_chunks:
             print("Nenhum dado encontrado para indexar. Indexação abortada.")
             return
 
-        chunks = self.text_splitter.split_documents(all_documents)
+        chunks = self.json_chunker.split(json_items) + pdf_chunks
         print(f"Total de fragmentos gerados: {len(chunks)}")
 
+        ids = self._assign_chunk_ids(chunks)
+
+        version, version_directory = new_version(self.index_root)
+        print(f"Construindo a versão {version} em {version_directory}")
+
         try:
-            Chroma.from_documents(
+            vectorstore = Chroma.from_documents(
                 documents=chunks, 
                 embedding=self.embeddings, 
-                persist_directory=self.persist_directory
+                persist_directory=version_directory,
+                ids=ids
             )
-            print("Indexação concluída. Dados armazenados com sucesso!")
+            BM25Index.from_documents(chunks).save(version_directory)
+            QuantizedVectorStore.build_from_chroma(vectorstore, version_directory,
+                                                   dtype=self.quantized_dtype, nlist=self.quantized_nlist)
+            validate_version(version_directory, expected_chunks=len(ids))
         except Exception as e:
-            print(f"Erro durante a indexação ou persistência no ChromaDB: {e}")
+            print(f"Erro durante a indexação; a versão publicada não foi alterada: {e}")
+            shutil.rmtree(version_directory, ignore_errors=True)
+            return
+
+        publish(version, self.index_root)
+        removed = collect_garbage(self.index_root, keep=self.keep_versions)
+        print(f"Indexação concluída. Versão {version} publicada; versões removidas: {len(removed)}")
 
 if __name__ == "__main__":
+    # Executar a partir de Modelo/src: python -m RAG.index_data_for_rag
     load_dotenv()
     sql_config = {
         'driver': '{ODBC Driver 17 for SQL Server}', 
@@ -179,5 +242,5 @@ if __name__ == "__main__":
         'pwd': os.getenv("DB_PASSWORD") 
     }
     
-    indexer = RAGIndexer(persist_directory="./rag_db_index", db_config=sql_config)
+    indexer = RAGIndexer(db_config=sql_config)
     indexer.index_data()
\ No newline at end of file
@@ -0,0 +1,114 @@
+import os
+import time
+import uuid
+import shutil
+from dotenv import load_dotenv
+
+from RAG.lexical_index import BM25Index, LEXICAL_INDEX_FILE
+
+load_dotenv()
+
+# Layout do índice:
+#   <raiz>/versions/<versão>/   um índice completo (Chroma + BM25 + quantizado)
+#   <raiz>/CURRENT              nome da versão publicada, trocado com os.replace
+# O indexador sempre escreve numa versão nova; quem lê só enxerga versões já validadas.
+
+DEFAULT_INDEX_ROOT = os.getenv(
+    "RAG_INDEX_ROOT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "rag_db_index"),
+)
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+CHROMA_FILE = "chroma.sqlite3"
+
+
+class IndexValidationError(Exception):
+    pass
+
+
+def new_version(root: str = DEFAULT_INDEX_ROOT) -> tuple:
+    """Reserva um diretório vazio para a próxima versão. Retorna (versão, caminho)."""
+    version = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(root, VERSIONS_DIR, version)
+    os.makedirs(path)
+    return version, path
+
+
+def current_version(root: str = DEFAULT_INDEX_ROOT) -> str:
+    try:
+        with open(os.path.join(root, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def current_directory(root: str = DEFAULT_INDEX_ROOT) -> str:
+    """
+    Diretório da versão publicada. Sem arquivo CURRENT a raiz é tratada como um índice
+    no layout antigo (tudo direto na pasta), que continua funcionando.
+    """
+    version = current_version(root)
+    if not version:
+        return root
+    return os.path.join(root, VERSIONS_DIR, version)
+
+
+def validate_version(path: str, expected_chunks: int = None):
+    """Confere se a versão está completa e consistente antes de publicá-la."""
+    if not os.path.exists(os.path.join(path, CHROMA_FILE)):
+        raise IndexValidationError(f"{CHROMA_FILE} ausente em {path}")
+    if not os.path.exists(os.path.join(path, LEXICAL_INDEX_FILE)):
+        raise IndexValidationError(f"{LEXICAL_INDEX_FILE} ausente em {path}")
+
+    lexical = BM25Index.load(path)
+    if lexical is None or not lexical.doc_ids:
+        raise IndexValidationError(f"índice BM25 vazio em {path}")
+    counts = {"bm25": len(lexical.doc_ids)}
+
+    # Importado aqui: quem só lê o ponteiro (main_agent) não precisa do numpy.
+    from RAG.quantized_store import QuantizedVectorStore, QUANTIZED_META_FILE
+
+    if os.path.exists(os.path.join(path, QUANTIZED_META_FILE)):
+        store = QuantizedVectorStore(path, embedding_function=None)
+        counts["quantizado"] = store.meta["count"]
+        # Busca com o próprio vetor do primeiro trecho: ele precisa voltar em primeiro.
+        found = store.similarity_search_by_vector(store.full[0], k=1)
+        if not found or found[0].page_content != store.texts[0]:
+            raise IndexValidationError(f"busca de verificação falhou no índice quantizado de {path}")
+
+    if expected_chunks is not None:
+        counts["esperado"] = expected_chunks
+    if len(set(counts.values())) > 1:
+        raise IndexValidationError(f"contagens de trechos divergentes em {path}: {counts}")
+
+
+def publish(version: str, root: str = DEFAULT_INDEX_ROOT):
+    """Troca atômica do ponteiro: leitores passam a usar a versão nova na próxima consulta."""
+    if not os.path.isdir(os.path.join(root, VERSIONS_DIR, version)):
+        raise IndexValidationError(f"versão inexistente: {version}")
+    pointer = os.path.join(root, CURRENT_FILE)
+    tmp_pointer = f"{pointer}.{os.getpid()}.tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pointer, pointer)
+
+
+def collect_garbage(root: str = DEFAULT_INDEX_ROOT, keep: int = 3) -> list:
+    """
+    Remove as versões antigas, mantendo a publicada e as `keep` mais recentes. Manter mais
+    de uma dá tempo para processos que ainda estão com a versão anterior aberta.
+    """
+    versions_dir = os.path.join(root, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return []
+    current = current_version(root)
+    versions = sorted(os.listdir(versions_dir), reverse=True)
+    removed = []
+    for version in versions[keep:]:
+        if version == current:
+            continue
+        shutil.rmtree(os.path.join(versions_dir, version), ignore_errors=True)
+        removed.append(version)
+    return removed
@@ -0,0 +1,142 @@
+import os
+import re
+import json
+import math
+from collections import Counter, defaultdict
+from typing import Optional
+
+from langchain_core.documents import Document
+
+from helpers.text import fold_accents
+
+LEXICAL_INDEX_FILE = "lexical_index.json"
+
+# Mantém códigos como "tp500-1", "nl19/3" e "45001" inteiros e também emite as partes,
+# para que "TP500" encontre "TP500-1".
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-/.][a-z0-9]+)*")
+_PARTS = re.compile(r"[-/.]")
+
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for token in _TOKEN.findall(fold_accents(text.lower())):
+        tokens.append(token)
+        parts = _PARTS.split(token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+
+def matches_filter(metadata: dict, source_filter: Optional[dict]) -> bool:
+    """Mesma semântica de igualdade usada no filtro do Chroma (inclui $and e $in simples)."""
+    if not source_filter:
+        return True
+    for key, expected in source_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, f) for f in expected):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, f) for f in expected):
+                return False
+        elif isinstance(expected, dict):
+            if "$in" in expected and metadata.get(key) not in expected["$in"]:
+                return False
+            if "$eq" in expected and metadata.get(key) != expected["$eq"]:
+                return False
+        elif metadata.get(key) != expected:
+            return False
+    return True
+
+
+class BM25Index:
+    """Índice invertido com ranking BM25, persistido como JSON ao lado do índice do Chroma."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.texts = []
+        self.metadatas = []
+        self.doc_lengths = []
+        self.postings = defaultdict(list)
+
+    @property
+    def avg_length(self) -> float:
+        return sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def add(self, doc_id: str, text: str, metadata: dict):
+        position = len(self.doc_ids)
+        counts = Counter(tokenize(text))
+        self.doc_ids.append(doc_id)
+        self.texts.append(text)
+        self.metadatas.append(metadata)
+        self.doc_lengths.append(sum(counts.values()))
+        for term, freq in counts.items():
+            self.postings[term].append((position, freq))
+
+    def search(self, query: str, k: int = 20, source_filter: Optional[dict] = None) -> list:
+        """Retorna [(doc_id, score)] dos k melhores documentos que passam no filtro."""
+        total_docs = len(self.doc_ids)
+        if not total_docs:
+            return []
+        avg_length = self.avg_length or 1.0
+        scores = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, freq in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / avg_length)
+                scores[position] += idf * freq * (self.k1 + 1) / (freq + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        results = []
+        for position, score in ranked:
+            if matches_filter(self.metadatas[position], source_filter):
+                results.append((self.doc_ids[position], score))
+                if len(results) >= k:
+                    break
+        return results
+
+    def document(self, doc_id: str) -> Optional[Document]:
+        if not hasattr(self, "_positions"):
+            self._positions = {d: i for i, d in enumerate(self.doc_ids)}
+        position = self._positions.get(doc_id)
+        if position is None:
+            return None
+        return Document(page_content=self.texts[position], metadata=self.metadatas[position])
+
+    def save(self, directory: str):
+        path = os.path.join(directory, LEXICAL_INDEX_FILE)
+        data = {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": self.doc_ids,
+            "texts": self.texts,
+            "metadatas": self.metadatas,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        path = os.path.join(directory, LEXICAL_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        for doc_id, text, metadata in zip(data["doc_ids"], data["texts"], data["metadatas"]):
+            index.add(doc_id, text, metadata)
+        return index
+
+    @classmethod
+    def from_documents(cls, documents: list) -> "BM25Index":
+        index = cls()
+        for doc in documents:
+            index.add(doc.metadata["chunk_id"], doc.page_content, doc.metadata)
+        return index
@@ -0,0 +1,176 @@
+import os
+import json
+from typing import Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from RAG.lexical_index import matches_filter
+
+QUANTIZED_META_FILE = "quantized_meta.json"
+QUANTIZED_DOCS_FILE = "quantized_docs.json"
+VECTORS_FULL_FILE = "vectors_f32.npy"
+VECTORS_QUANT_FILE = "vectors_quant.npy"
+SCALES_FILE = "vectors_scales.npy"
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGNMENTS_FILE = "ivf_assignments.npy"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = vectors[assignments == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+        centroids = _normalize_rows(centroids)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+
+class QuantizedVectorStore:
+    """
+    Índice vetorial compacto em arquivos .npy abertos com mmap: todos os processos do nó
+    compartilham as mesmas páginas pelo page cache do sistema. A busca faz produto escalar
+    vetorizado sobre a matriz quantizada (int8 com escala por linha, ou float16), opcionalmente
+    restrita às listas IVF mais próximas, e reordena os melhores candidatos com os vetores
+    float32. Os metadados ficam em uma tabela lateral para aplicar o `filter`.
+    Expõe `similarity_search` com a mesma assinatura usada do Chroma.
+    """
+
+    def __init__(self, directory: str, embedding_function, nprobe: int = 8,
+                 rescore_factor: int = 4, block_rows: int = 8192):
+        self.directory = directory
+        self.embedding_function = embedding_function
+        self.nprobe = nprobe
+        self.rescore_factor = rescore_factor
+        self.block_rows = block_rows
+
+        with open(os.path.join(directory, QUANTIZED_META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(directory, QUANTIZED_DOCS_FILE), encoding="utf-8") as f:
+            docs = json.load(f)
+        self.ids = docs["ids"]
+        self.texts = docs["texts"]
+        self.metadatas = docs["metadatas"]
+
+        self.full = np.load(os.path.join(directory, VECTORS_FULL_FILE), mmap_mode="r")
+        self.quant = np.load(os.path.join(directory, VECTORS_QUANT_FILE), mmap_mode="r")
+        self.scales = np.load(os.path.join(directory, SCALES_FILE), mmap_mode="r") \
+            if self.meta["dtype"] == "int8" else None
+
+        self.centroids = None
+        self.lists = None
+        if self.meta.get("nlist"):
+            self.centroids = np.load(os.path.join(directory, CENTROIDS_FILE))
+            assignments = np.load(os.path.join(directory, ASSIGNMENTS_FILE))
+            self.lists = [np.flatnonzero(assignments == c) for c in range(self.meta["nlist"])]
+
+        self._filter_masks = {}
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, QUANTIZED_META_FILE))
+
+    @classmethod
+    def build(cls, directory: str, ids: list, texts: list, metadatas: list, embeddings,
+              dtype: str = "int8", nlist: int = 0):
+        """Grava o índice a partir de vetores já calculados (ex.: exportados do Chroma)."""
+        os.makedirs(directory, exist_ok=True)
+        full = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+        if dtype == "int8":
+            scales = np.abs(full).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quant = np.round(full / scales[:, None]).astype(np.int8)
+            np.save(os.path.join(directory, SCALES_FILE), scales.astype(np.float32))
+        elif dtype == "float16":
+            quant = full.astype(np.float16)
+        else:
+            raise ValueError(f"dtype não suportado: {dtype}")
+
+        np.save(os.path.join(directory, VECTORS_FULL_FILE), full)
+        np.save(os.path.join(directory, VECTORS_QUANT_FILE), quant)
+
+        if nlist and len(full) > nlist:
+            centroids, assignments = _kmeans(full, nlist)
+            np.save(os.path.join(directory, CENTROIDS_FILE), centroids)
+            np.save(os.path.join(directory, ASSIGNMENTS_FILE), assignments)
+        else:
+            nlist = 0
+
+        with open(os.path.join(directory, QUANTIZED_DOCS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "texts": texts, "metadatas": metadatas}, f, ensure_ascii=False)
+        with open(os.path.join(directory, QUANTIZED_META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"dtype": dtype, "dimensions": int(full.shape[1]), "count": int(full.shape[0]),
+                       "nlist": int(nlist)}, f)
+
+    @classmethod
+    def build_from_chroma(cls, vectorstore, directory: str, dtype: str = "int8", nlist: int = 0):
+        """Exporta os vetores que o Chroma já calculou, sem gerar embeddings de novo."""
+        data = vectorstore.get(include=["embeddings", "documents", "metadatas"])
+        cls.build(directory, data["ids"], data["documents"], data["metadatas"], data["embeddings"],
+                  dtype=dtype, nlist=nlist)
+
+    def _mask(self, source_filter: Optional[dict]) -> Optional[np.ndarray]:
+        if not source_filter:
+            return None
+        key = json.dumps(source_filter, sort_keys=True)
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = np.fromiter((matches_filter(m, source_filter) for m in self.metadatas),
+                               dtype=bool, count=len(self.metadatas))
+            self._filter_masks[key] = mask
+        return mask
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if self.centroids is None:
+            return None
+        nearest = np.argsort(self.centroids @ query)[::-1][:self.nprobe]
+        return np.sort(np.concatenate([self.lists[c] for c in nearest]))
+
+    def _approximate_scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        count = len(rows) if rows is not None else self.quant.shape[0]
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, self.block_rows):
+            stop = min(start + self.block_rows, count)
+            index = rows[start:stop] if rows is not None else slice(start, stop)
+            block = np.asarray(self.quant[index], dtype=np.float32)
+            block_scores = block @ query
+            if self.scales is not None:
+                block_scores *= self.scales[index]
+            scores[start:stop] = block_scores
+        return scores
+
+    def similarity_search_by_vector(self, embedding, k: int = 5, filter: Optional[dict] = None) -> list:
+        query = np.array(embedding, dtype=np.float32)
+        query /= (np.linalg.norm(query) or 1.0)
+
+        rows = self._candidate_rows(query)
+        scores = self._approximate_scores(query, rows)
+        row_ids = rows if rows is not None else np.arange(len(scores))
+
+        mask = self._mask(filter)
+        if mask is not None:
+            keep = mask[row_ids]
+            scores, row_ids = scores[keep], row_ids[keep]
+        if not len(scores):
+            return []
+
+        shortlist = min(len(scores), k * self.rescore_factor)
+        top = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        candidates = np.sort(row_ids[top])
+        exact = np.asarray(self.full[candidates], dtype=np.float32) @ query
+        best = candidates[np.argsort(-exact)[:k]]
+
+        return [Document(page_content=self.texts[i], metadata=self.metadatas[i]) for i in best]
+
+    def similarity_search(self, query: str, k: int = 5, filter: Optional[dict] = None, **kwargs) -> list:
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k=k, filter=filter)
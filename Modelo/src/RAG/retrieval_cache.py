@@ -0,0 +1,85 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from helpers.text import normalize_query
+from telemetry.metrics import REGISTRY
+
+
+class RetrievalCache:
+    """
+    Cache dos trechos formatados por search_documentation (sem o cabeçalho com a pergunta), por processo.
+    Chave: consulta normalizada + source_filter + versão do índice. Quando o indexador
+    publica uma versão nova, todas as entradas são descartadas. O tamanho total das
+    respostas guardadas é limitado por `max_bytes` (despejo LRU).
+    """
+
+    def __init__(self, version_source, max_bytes: int = 8 * 2**20, version_check_interval: float = 1.0):
+        self.version_source = version_source
+        self.max_bytes = max_bytes
+        self.version_check_interval = version_check_interval
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._version_checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _current_version(self) -> str:
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked_at >= self.version_check_interval:
+            version = self.version_source()
+            if self._version is not None and version != self._version:
+                self._entries.clear()
+                self._bytes = 0
+                self.invalidations += 1
+            self._version = version
+            self._version_checked_at = now
+        return self._version
+
+    def _key(self, query: str, source_filter: Optional[dict]) -> tuple:
+        filter_key = json.dumps(source_filter, sort_keys=True, ensure_ascii=False) if source_filter else ""
+        return normalize_query(query), filter_key, self._current_version()
+
+    def get(self, query: str, source_filter: Optional[dict] = None) -> Optional[str]:
+        with self._lock:
+            key = self._key(query, source_filter)
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                REGISTRY.increment("retrieval_cache", result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            REGISTRY.increment("retrieval_cache", result="hit")
+            return result
+
+    def put(self, query: str, source_filter: Optional[dict], result: str):
+        size = len(result.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            key = self._key(query, source_filter)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.encode("utf-8"))
+            self._entries[key] = result
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.encode("utf-8"))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+
+class ConnectionPool:
+    """
+    Pool simples de conexões pyodbc para os leitores paralelos do indexador: até `size`
+    conexões criadas sob demanda e devolvidas ao fim de cada leitura. Uma conexão que
+    falhou durante o uso é fechada em vez de voltar ao pool.
+    """
+
+    def __init__(self, connect: Callable, size: int = 4):
+        self.connect = connect
+        self.size = size
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                conn = self.connect()
+                if conn is None:
+                    with self._lock:
+                        self._created -= 1
+                    raise ConnectionError("não foi possível conectar ao banco de dados")
+            else:
+                conn = self._idle.get()
+
+        # try/finally (e não except Exception): um produtor fechado cedo recebe GeneratorExit
+        # aqui, e a conexão tem de ser descartada para não ficar contada em _created.
+        returned = False
+        try:
+            yield conn
+            returned = True
+        finally:
+            if returned:
+                self._idle.put(conn)
+            else:
+                self._discard(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+
+def fetch_rows(conn, query: str, batch_size: int = 200) -> Iterator[dict]:
+    """Executa `query` e entrega as linhas como dicts, em lotes de fetchmany (sem fetchall)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query)
+        columns = [column[0] for column in cursor.description]
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            for row in batch:
+                yield dict(zip(columns, row))
+    finally:
+        cursor.close()
+
+
+@dataclass
+class SourceStats:
+    source: str
+    rows: int = 0
+    items: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+_DONE = object()
+
+
+class ConcurrentSourceReader:
+    """
+    Estágio produtor do indexador: cada fonte é um gerador `loader(stats)` executado em
+    paralelo (até `workers` threads) e os itens chegam ao consumidor por uma fila limitada,
+    na ordem em que ficam prontos. Erros de uma fonte ficam em stats.error sem parar as demais.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 256):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.stats = {}
+
+    @staticmethod
+    def _put(out: queue.Queue, entry: tuple, stop: threading.Event) -> bool:
+        """put com timeout: se o consumidor parou (stop), desiste em vez de bloquear para sempre."""
+        while not stop.is_set():
+            try:
+                out.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, name: str, loader: Callable, out: queue.Queue, slots: threading.Semaphore,
+                 stop: threading.Event):
+        stats = self.stats[name]
+        try:
+            with slots:
+                if stop.is_set():
+                    return
+                start = time.perf_counter()
+                try:
+                    for item in loader(stats):
+                        stats.items += 1
+                        if not self._put(out, (name, item), stop):
+                            return
+                finally:
+                    stats.seconds = time.perf_counter() - start
+        except Exception as e:
+            stats.error = str(e)
+        finally:
+            self._put(out, (name, _DONE), stop)
+
+    def stream(self, sources: list) -> Iterator[tuple]:
+        """
+        `sources` são pares (nome, loader). Gera (nome, item) conforme as fontes produzem.
+        Se o consumidor falhar ou parar antes do fim, os produtores são avisados e encerram.
+        """
+        out = queue.Queue(maxsize=self.queue_size)
+        slots = threading.Semaphore(self.workers)
+        stop = threading.Event()
+        self.stats = {name: SourceStats(name) for name, _ in sources}
+        threads = [
+            threading.Thread(target=self._produce, args=(name, loader, out, slots, stop),
+                             name=f"rag-source-{name}", daemon=True)
+            for name, loader in sources
+        ]
+        for thread in threads:
+            thread.start()
+
+        pending = len(threads)
+        try:
+            while pending:
+                name, item = out.get()
+                if item is _DONE:
+                    pending -= 1
+                    continue
+                yield name, item
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def report(self) -> str:
+        lines = [f"{'fonte':<28}{'linhas':>8}{'itens':>8}{'ignoradas':>11}{'segundos':>10}"]
+        for s in self.stats.values():
+            line = f"{s.source:<28}{s.rows:>8}{s.items:>8}{s.skipped:>11}{s.seconds:>10.2f}"
+            lines.append(line + (f"  ERRO: {s.error}" if s.error else ""))
+        return "\n".join(lines)
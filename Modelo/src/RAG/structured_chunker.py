@@ -0,0 +1,135 @@
+import re
+import hashlib
+from collections import Counter
+from typing import Iterable
+
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from helpers.text import normalize_question
+
+_SPACES = re.compile(r"[ \t ]+")
+_SPACE_BEFORE_NEWLINE = re.compile(r" *\n *")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def compact_text(text: str) -> str:
+    """Remove espaços redundantes sem mexer na quebra entre parágrafos."""
+    text = _SPACES.sub(" ", str(text))
+    text = _SPACE_BEFORE_NEWLINE.sub("\n", text)
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def section_title(key: str) -> str:
+    return str(key).replace("_", " ").strip().capitalize()
+
+
+def compact_row(row_data: dict) -> str:
+    """Uma linha "coluna: valor" por campo preenchido, no lugar do JSON com indent=2."""
+    lines = []
+    for key, value in row_data.items():
+        value = compact_text(value if value is not None else "")
+        if value:
+            lines.append(f"{key}: {value}")
+    return "\n".join(lines)
+
+
+def _walk_sections(value, path: tuple):
+    """Gera (caminho, texto) para cada folha do JSON, preservando a hierarquia das chaves."""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from _walk_sections(child, path + (section_title(key),))
+    elif isinstance(value, list):
+        if all(not isinstance(item, (dict, list)) for item in value):
+            yield path, "\n".join(f"- {compact_text(item)}" for item in value if item not in (None, ""))
+        else:
+            for position, item in enumerate(value, start=1):
+                yield from _walk_sections(item, path + (str(position),))
+    elif value not in (None, ""):
+        yield path, compact_text(value)
+
+
+class StructuredJSONChunker:
+    """
+    Divide documentos JSON pelas chaves/seções em vez de cortar o texto concatenado.
+    Cada trecho carrega o título da seção no texto e em `metadata["section"]`; seções
+    curtas do mesmo documento são agrupadas até `chunk_size` e seções longas são
+    subdivididas por parágrafo, repetindo o título. Parágrafos que se repetem
+    em muitos documentos (cabeçalhos, rodapés, avisos padrão) são mantidos só na
+    primeira ocorrência.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 100, boilerplate_min_repeats: int = 3):
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=["\n\n", "\n", ". ", " ", ""]
+        )
+        self.chunk_size = chunk_size
+        self.boilerplate_min_repeats = boilerplate_min_repeats
+
+    @staticmethod
+    def _paragraph_key(paragraph: str) -> str:
+        return hashlib.sha1(normalize_question(paragraph).encode("utf-8")).hexdigest()
+
+    def _boilerplate_keys(self, sections: list) -> set:
+        counts = Counter()
+        for _, _, text in sections:
+            counts.update({self._paragraph_key(p) for p in text.split("\n\n") if len(p) > 40})
+        return {key for key, count in counts.items() if count >= self.boilerplate_min_repeats}
+
+    def _dedupe(self, text: str, boilerplate: set, seen: set) -> str:
+        paragraphs = []
+        for paragraph in text.split("\n\n"):
+            key = self._paragraph_key(paragraph)
+            if key in boilerplate:
+                if key in seen:
+                    continue
+                seen.add(key)
+            paragraphs.append(paragraph)
+        return "\n\n".join(paragraphs)
+
+    def split(self, items: Iterable[tuple]) -> list:
+        """`items` são pares (dados_json, metadados_base). Retorna a lista de Documents."""
+        sections = []
+        for doc_index, (data, base_metadata) in enumerate(items):
+            for path, text in _walk_sections(data, ()):
+                if text:
+                    sections.append((doc_index, base_metadata, path, text))
+
+        boilerplate = self._boilerplate_keys([(p, m, t) for _, m, p, t in sections])
+        seen_boilerplate = set()
+        documents = []
+        pending = []
+
+        def flush():
+            if not pending:
+                return
+            base_metadata = pending[0][0]
+            titles = [title for _, title, _ in pending]
+            content = "\n\n".join(f"{title}\n{text}" if title else text for _, title, text in pending)
+            documents.append(Document(page_content=content, metadata={**base_metadata, "section": " | ".join(titles)}))
+            pending.clear()
+
+        previous_doc = None
+        for doc_index, base_metadata, path, text in sections:
+            text = self._dedupe(text, boilerplate, seen_boilerplate)
+            if not text:
+                continue
+            if doc_index != previous_doc:
+                flush()
+                previous_doc = doc_index
+
+            title = " > ".join(path)
+            size = len(title) + len(text) + 2
+            if size > self.chunk_size:
+                flush()
+                for piece in self.splitter.split_text(text):
+                    content = f"{title}\n{piece}" if title else piece
+                    documents.append(Document(page_content=content, metadata={**base_metadata, "section": title}))
+                continue
+
+            if sum(len(t) + len(x) + 3 for _, t, x in pending) + size > self.chunk_size:
+                flush()
+            pending.append((base_metadata, title, text))
+
+        flush()
+        return documents
@@ -0,0 +1,95 @@
+"""
+Compara memória por processo e latência de busca entre o Chroma e o QuantizedVectorStore.
+Cada backend roda em processos filhos separados, como os processos de usuário do main.py.
+As consultas são vetores do próprio índice com ruído, então não há chamadas à OpenAI.
+
+    cd Modelo/src
+    python -m RAG.vector_store_bench --workers 4 --queries 200
+"""
+import os
+import json
+import time
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from RAG.index_store import current_directory
+from RAG.quantized_store import QuantizedVectorStore, VECTORS_FULL_FILE
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _open(backend: str, index_dir: str):
+    if backend == "quantized":
+        return QuantizedVectorStore(index_dir, embedding_function=None)
+    from langchain_community.vectorstores import Chroma
+
+    return Chroma(persist_directory=index_dir)
+
+
+def _worker(backend: str, index_dir: str, queries: list, k: int, results):
+    before = _rss_mb()
+    store = _open(backend, index_dir)
+    latencies, tops = [], []
+    for query in queries:
+        start = time.perf_counter()
+        docs = store.similarity_search_by_vector(query, k=k)
+        latencies.append(time.perf_counter() - start)
+        tops.append([d.page_content for d in docs])
+    results.put({
+        "rss_increase_mb": round(_rss_mb() - before, 2),
+        "latencies": latencies,
+        "tops": tops,
+    })
+
+
+def run_backend(backend: str, index_dir: str, queries: list, k: int, workers: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_worker, args=(backend, index_dir, queries, k, results)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    collected = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+
+    latencies = sorted(l for r in collected for l in r["latencies"])
+    return {
+        "rss_por_worker_mb": round(sum(r["rss_increase_mb"] for r in collected) / workers, 2),
+        "latencia_p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "latencia_p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 3),
+        "tops": collected[0]["tops"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index-dir", default=current_directory(), help="padrão: versão publicada em RAG_INDEX_ROOT")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.05)
+    args = parser.parse_args()
+
+    full = np.load(os.path.join(args.index_dir, VECTORS_FULL_FILE), mmap_mode="r")
+    rng = np.random.default_rng(0)
+    rows = rng.choice(full.shape[0], size=min(args.queries, full.shape[0]), replace=False)
+    queries = [(full[r] + rng.normal(0, args.noise, full.shape[1])).astype(np.float32).tolist() for r in rows]
+
+    report = {backend: run_backend(backend, args.index_dir, queries, args.k, args.workers)
+              for backend in ("chroma", "quantized")}
+
+    overlaps = [
+        len(set(a) & set(b)) / args.k
+        for a, b in zip(report["chroma"].pop("tops"), report["quantized"].pop("tops"))
+    ]
+    report["quantized"]["sobreposicao_top_k_com_chroma"] = round(sum(overlaps) / len(overlaps), 4)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
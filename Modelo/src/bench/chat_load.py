@@ -0,0 +1,207 @@
+"""
+Benchmark de carga do loop real do ChatAndritz contra substitutos locais
+(logs em memória, LLM falso, Dude simulado e índice Chroma descartável).
+
+    cd Modelo/src
+    python -m bench.chat_load --users 20 --messages 5 --rate 0.2 --llm-latency 0.8
+    python -m bench.chat_load --save-baseline bench/baselines/chat_load.json
+    python -m bench.chat_load --compare bench/baselines/chat_load.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import resource
+
+from bench.fakes import (
+    FakeLogStore, FakeMachineStatusDB, FakeMessageSource, HashingEmbedder, ScriptedChatModel, StubDudeServer,
+    build_agent_prompt, build_throwaway_index, load_manual_documents,
+)
+from telemetry.metrics import REGISTRY
+
+QUESTIONS = [
+    "Quais EPIs são recomendados para aguarrás?",
+    "Qual o procedimento de recepção de materiais?",
+    "Ordens abertas da Dilo",
+    "Tem alguma ordem de serviço do tear 5 em andamento?",
+    "Quais normas o manual de SSMA segue?",
+    "Procedimento de limpeza da CLT-2 e ordens abertas dela",
+    "Por que o tear 5 parou hoje de manhã?",
+    "A Dilo parou de novo, o que pode ser?",
+]
+
+# Métricas onde um aumento é regressão; throughput é comparado ao contrário.
+LOWER_IS_BETTER = ("p50_s", "p95_s", "p99_s", "db_queries_per_message", "rss_per_user_mb")
+
+MANUAL_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "manual_estruturado.json")
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _send_messages(store: FakeLogStore, user_id: str, count: int, rate: float, rng: random.Random):
+    for _ in range(count):
+        time.sleep(rng.expovariate(rate))
+        store.insert_user_message(user_id, rng.choice(QUESTIONS))
+
+
+def run_benchmark(users: int, messages: int, rate: float, llm_latency: float,
+                  dude_latency: float, timeout: float, seed: int, sql_latency: float = 0.15) -> dict:
+    import main_agent
+    from main import ChatAndritz
+    from main_agent import IntelligentAssistant
+    from db_logs.inbox import UserInbox
+
+    # Status ao vivo sem SQL Server: a ferramenta e o prefetcher resolvem o nome no módulo.
+    machine_db = FakeMachineStatusDB(latency=sql_latency)
+    main_agent._machine_status_query = machine_db.query
+
+    workdir = tempfile.mkdtemp(prefix="bench_chat_")
+    os.environ["LLM_CACHE_SQLITE_PATH"] = os.path.join(workdir, "llm_cache.sqlite3")
+
+    dude = StubDudeServer(latency=dude_latency)
+    os.environ["DUDE_API"] = dude.start()
+
+    embedder = HashingEmbedder()
+    index_dir = os.path.join(workdir, "rag_db_index")
+    build_throwaway_index(index_dir, load_manual_documents(MANUAL_PATH), embedder)
+
+    store = FakeLogStore()
+    rss_before = _rss_bytes()
+    bots = []
+    for n in range(users):
+        user_id = f"bench-user-{n:03d}"
+        assistant = IntelligentAssistant(
+            index_root=index_dir,
+            llm=ScriptedChatModel(latency=llm_latency),
+            prompt=build_agent_prompt(),
+            embedder=embedder,
+        )
+        bots.append(ChatAndritz(
+            user_id,
+            message_fetcher=UserInbox(FakeMessageSource(store, user_id)),
+            assistant=assistant,
+            conversation_factory=store.conversation,
+        ))
+    rss_after = _rss_bytes()
+
+    for bot in bots:
+        threading.Thread(target=bot.chat, daemon=True).start()
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    producers = [
+        threading.Thread(
+            target=_send_messages,
+            args=(store, bot.user_id, messages, rate, random.Random(rng.random())),
+            daemon=True,
+        )
+        for bot in bots
+    ]
+    for p in producers:
+        p.start()
+    for p in producers:
+        p.join()
+
+    deadline = time.perf_counter() + timeout
+    while store.pending_count() and time.perf_counter() < deadline:
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - started
+    dude.stop()
+
+    answered = len(store.latencies)
+    snapshot = REGISTRY.snapshot()
+    prefetch = {
+        result: sum(v for k, v in snapshot["counters"].items() if k.startswith("prefetch{") and f"result={result}" in k)
+        for result in ("hit", "unused", "failed")
+    }
+    saved = sum(h["sum"] for k, h in snapshot["histograms"].items() if k.startswith("prefetch_saved_seconds"))
+    return {
+        "users": users,
+        "messages_sent": len(store.user_logs),
+        "answered": answered,
+        "superseded": store.superseded,
+        "unanswered": store.pending_count(),
+        "p50_s": round(_percentile(store.latencies, 0.50), 4),
+        "p95_s": round(_percentile(store.latencies, 0.95), 4),
+        "p99_s": round(_percentile(store.latencies, 0.99), 4),
+        "throughput_msg_s": round(answered / elapsed, 4) if elapsed else 0.0,
+        "db_queries_per_message": round(store.queries / max(answered, 1), 2),
+        "rss_per_user_mb": round((rss_after - rss_before) / users / 2**20, 3),
+        "dude_requests": dude.requests,
+        "machine_status_queries": machine_db.queries,
+        "prefetch": prefetch,
+        "prefetch_hit_rate": round(prefetch["hit"] / max(sum(prefetch.values()), 1), 4),
+        "prefetch_saved_s": round(saved, 3),
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for key in LOWER_IS_BETTER:
+        old, new = baseline.get(key), current.get(key)
+        if old and new is not None and new > old * (1 + tolerance):
+            regressions.append(f"{key}: {old} -> {new}")
+    old, new = baseline.get("throughput_msg_s"), current.get("throughput_msg_s")
+    if old and new is not None and new < old * (1 - tolerance):
+        regressions.append(f"throughput_msg_s: {old} -> {new}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=5, help="mensagens por usuário")
+    parser.add_argument("--rate", type=float, default=0.2, help="mensagens por segundo por usuário")
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--dude-latency", type=float, default=0.2)
+    parser.add_argument("--sql-latency", type=float, default=0.15, help="latência da consulta de status ao vivo")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save-baseline", help="grava o resultado como baseline neste arquivo")
+    parser.add_argument("--compare", help="compara com um baseline salvo")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    result = run_benchmark(args.users, args.messages, args.rate, args.llm_latency,
+                           args.dude_latency, args.timeout, args.seed, args.sql_latency)
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline salvo em {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print("Regressões encontradas:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("Sem regressões em relação ao baseline.")
+
+
+if __name__ == "__main__":
+    main()
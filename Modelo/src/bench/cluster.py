@@ -0,0 +1,190 @@
+"""
+Roda um cluster local: cada nó é um processo com o SessionSupervisor real em modo
+cluster, coordenado por um arquivo SQLite no lugar do SQL Server (SqliteLeaseStore).
+As sessões de chat são processos falsos que só registram "estou atendendo" a cada
+100 ms; no fim, a linha do tempo de cada usuário é conferida para garantir que dois nós
+nunca atenderam o mesmo usuário ao mesmo tempo.
+
+Fases: sobem `--nodes` nós, entra mais um, um nó morre (SIGKILL) e outro sai de forma
+limpa (SIGTERM). Para cada fase: tempo até o cluster convergir e sessões por nó.
+
+    cd Modelo/src
+    python -m bench.cluster --users 200 --nodes 3
+"""
+import os
+import json
+import time
+import logging
+import signal
+import sqlite3
+import argparse
+import tempfile
+import multiprocessing
+from collections import defaultdict
+
+from cluster.leases import SqliteLeaseStore
+from cluster.membership import ClusterMembership, HashRing
+
+LEASE_SECONDS = 6.0
+NODE_TIMEOUT = 3.0
+TICK = 0.2
+VNODES = 64
+
+
+class SqliteUserFetcher:
+    """Mesma interface do SqlServerUserFetcher, lendo a tabela active_users do bench."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _query(self, sql: str):
+        with sqlite3.connect(self.path, timeout=10) as conn:
+            return conn.execute(sql).fetchall()
+
+    def get_user_ids(self) -> list:
+        return [row[0] for row in self._query("SELECT userId FROM active_users")]
+
+    def presence_signature(self):
+        return tuple(self._query("SELECT COUNT(*), GROUP_CONCAT(userId) FROM active_users")[0])
+
+
+def _fake_session(user_id, stop_event):
+    from main import exit_when_orphaned
+
+    exit_when_orphaned(interval=0.1)
+    node_id, path = os.environ["CLUSTER_NODE_ID"], os.environ["BENCH_CLUSTER_DB"]
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    while not stop_event.is_set():
+        conn.execute("INSERT INTO answers (userId, nodeId, pid, ts) VALUES (?, ?, ?, ?)",
+                     (user_id, node_id, os.getpid(), time.time()))
+        stop_event.wait(0.1)
+
+
+def _run_node(node_id: str, path: str):
+    from helpers.presence import PresenceMonitor
+    from main import SessionSupervisor
+
+    os.environ["CLUSTER_NODE_ID"] = node_id
+    os.environ["BENCH_CLUSTER_DB"] = path
+    membership = ClusterMembership(SqliteLeaseStore(path), node_id=node_id,
+                                   lease_seconds=LEASE_SECONDS, node_timeout=NODE_TIMEOUT, vnodes=VNODES)
+    supervisor = SessionSupervisor(
+        multiprocessing.get_context("fork"),
+        PresenceMonitor(SqliteUserFetcher(path)),
+        max_sessions=10_000,
+        drain_timeout=2.0,
+        target=_fake_session,
+        cluster=membership,
+    )
+
+    def _terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        while True:
+            supervisor.tick()
+            time.sleep(TICK)
+    except KeyboardInterrupt:
+        supervisor.shutdown()
+
+
+def _converged(store: SqliteLeaseStore, path: str, live: list, users: list) -> bool:
+    """Toda concessão com o dono que o anel dos nós vivos indica e sessões = concessões em cada nó."""
+    ring = HashRing(live, VNODES)
+    with sqlite3.connect(path, timeout=10) as conn:
+        leases = dict(conn.execute("SELECT userId, nodeId FROM chat_leases WHERE expiresAt > ?", (time.time(),)))
+    if any(leases.get(uid) != ring.owner(uid) for uid in users):
+        return False
+    nodes = {node: (sessions, held) for node, _, sessions, held in store.nodes()}
+    return all(node in nodes and nodes[node][0] == nodes[node][1] for node in live)
+
+
+def _wait(store, path, live, users, timeout: float) -> dict:
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        if _converged(store, path, live, users):
+            break
+        time.sleep(0.1)
+    else:
+        return {"convergiu": False, "segundos": timeout}
+    per_node = {node: sessions for node, age, sessions, _ in store.nodes() if node in live}
+    return {"convergiu": True, "segundos": round(time.monotonic() - start, 2), "sessoes_por_no": per_node}
+
+
+def _overlaps(path: str) -> int:
+    """Sessões (processos) que começaram a atender um usuário antes de a anterior parar."""
+    intervals = defaultdict(list)
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT userId, MIN(ts), MAX(ts) FROM answers GROUP BY userId, pid")
+        for user_id, first, last in rows:
+            intervals[user_id].append((first, last))
+    violations = 0
+    for spans in intervals.values():
+        spans.sort()
+        busy_until = None
+        for first, last in spans:
+            if busy_until is not None and first <= busy_until:
+                violations += 1
+            busy_until = last if busy_until is None else max(busy_until, last)
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--verbose", action="store_true", help="mostra os logs dos nós")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.getLogger("andritz").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cluster.sqlite3")
+        store = SqliteLeaseStore(path)
+        users = [f"user{i:04d}@andritz.com" for i in range(args.users)]
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE active_users (userId TEXT PRIMARY KEY)")
+            conn.execute("CREATE TABLE answers (userId TEXT, nodeId TEXT, pid INTEGER, ts REAL)")
+            conn.executemany("INSERT INTO active_users VALUES (?)", [(u,) for u in users])
+
+        ctx = multiprocessing.get_context("fork")
+        processes = {}
+
+        def start(node_id):
+            p = ctx.Process(target=_run_node, args=(node_id, path), name=node_id)
+            p.start()
+            processes[node_id] = p
+
+        report = {"usuarios": args.users, "concessao_s": LEASE_SECONDS, "timeout_no_s": NODE_TIMEOUT}
+        try:
+            for n in range(args.nodes):
+                start(f"node-{n + 1}")
+            report["partida"] = _wait(store, path, list(processes), users, args.timeout)
+
+            joined = f"node-{args.nodes + 1}"
+            start(joined)
+            report[f"entrada_{joined}"] = _wait(store, path, list(processes), users, args.timeout)
+
+            killed = "node-1"
+            os.kill(processes.pop(killed).pid, signal.SIGKILL)
+            report[f"morte_{killed}"] = _wait(store, path, list(processes), users, args.timeout)
+
+            left = "node-2"
+            processes[left].terminate()
+            processes.pop(left).join(args.timeout)
+            report[f"saida_{left}"] = _wait(store, path, list(processes), users, args.timeout)
+        finally:
+            for p in processes.values():
+                p.terminate()
+            for p in processes.values():
+                p.join(args.timeout)
+        time.sleep(0.5)
+        report["sobreposicoes"] = _overlaps(path)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
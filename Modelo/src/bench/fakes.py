@@ -0,0 +1,309 @@
+"""
+Substitutos locais para rodar o ChatAndritz real sem SQL Server, OpenAI ou Dude.
+"""
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+
+class FakeLogStore:
+    """Tabelas user_logs e bot_logs em memória, com contagem de consultas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.user_logs = []
+        self.bot_logs = []
+        self.queries = 0
+        self._pending = {}
+        self.latencies = []
+        self.superseded = 0
+
+    def insert_user_message(self, user_id: str, message: str):
+        with self._lock:
+            now = time.perf_counter()
+            self.user_logs.append((user_id, now, message))
+            if user_id in self._pending:
+                self.superseded += 1
+            self._pending[user_id] = now
+
+    def newest_user_row(self, user_id: str):
+        with self._lock:
+            self.queries += 1
+            for uid, ts, message in reversed(self.user_logs):
+                if uid == user_id:
+                    return ts, message
+        return None
+
+    def user_rows_since(self, user_id: str, timestamp) -> list:
+        with self._lock:
+            self.queries += 1
+            return [(ts, message) for uid, ts, message in self.user_logs if uid == user_id and ts > timestamp]
+
+    def insert_bot_message(self, user_id: str, message: str):
+        with self._lock:
+            self.queries += 1
+            now = time.perf_counter()
+            self.bot_logs.append((user_id, now, message))
+            sent_at = self._pending.pop(user_id, None)
+            if sent_at is not None:
+                self.latencies.append(now - sent_at)
+            return now
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def conversation(self, message: str, user_id: str) -> "FakeConversation":
+        return FakeConversation(self, message, user_id)
+
+
+class FakeMessageSource:
+    """Mesma interface do SqlMessageSource (usada pelo UserInbox), lendo do FakeLogStore."""
+
+    def __init__(self, store: FakeLogStore, user_id: str):
+        self.store = store
+        self.user_id = user_id
+
+    def newest(self):
+        return self.store.newest_user_row(self.user_id)
+
+    def rows_since(self, timestamp) -> list:
+        return self.store.user_rows_since(self.user_id, timestamp)
+
+
+class FakeConversation:
+    def __init__(self, store: FakeLogStore, message: str, user_id: str):
+        self.store = store
+        self.message = message
+        self.user_id = user_id
+
+    def botResponse(self):
+        ts = self.store.insert_bot_message(self.user_id, self.message)
+        return {"botMessage": self.message, "botTimeStamp": ts}
+
+    def close(self):
+        pass
+
+
+class HashingEmbedder(Embeddings):
+    """Embedder determinístico por hashing de tokens; não faz chamadas de rede."""
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        return vector
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+
+_MACHINE_MENTION = re.compile(r"tear ?\d+|clt-?\d+|dilo")
+
+
+def _tool_call(call_id: str, name: str, args: dict) -> dict:
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(args, ensure_ascii=False)}}
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Modelo falso com latência configurável. No primeiro turno pede ferramentas de acordo
+    com palavras da pergunta; depois de receber os resultados, devolve a resposta final.
+    """
+
+    latency: float = 0.5
+    cache: Optional[bool] = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def _script(self, messages: List[BaseMessage]) -> AIMessage:
+        last_human = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        if any(isinstance(m, ToolMessage) for m in messages[last_human + 1:]):
+            return AIMessage(content="Resposta simulada com base nos resultados das ferramentas.")
+
+        question = str(messages[last_human].content)
+        lowered = question.lower()
+        calls = []
+        if "ordem" in lowered or "ordens" in lowered or " os " in f" {lowered} ":
+            calls.append(_tool_call(f"call_{len(calls)}", "search_service_orders_api", {"user_input": question}))
+        machine = _MACHINE_MENTION.search(lowered)
+        if machine and ("parou" in lowered or "status" in lowered):
+            calls.append(_tool_call(f"call_{len(calls)}", "get_live_machine_status",
+                                    {"machine_name_db": machine.group()}))
+        if not calls or "procedimento" in lowered or "epi" in lowered:
+            calls.append(_tool_call(f"call_{len(calls)}", "search_documentation", {"query": question}))
+
+        return AIMessage(
+            content="",
+            additional_kwargs={"tool_calls": calls},
+            tool_calls=[
+                {"id": c["id"], "name": c["function"]["name"], "args": json.loads(c["function"]["arguments"])}
+                for c in calls
+            ],
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._script(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._script(messages))])
+
+
+class SizedChatModel(ScriptedChatModel):
+    """
+    ScriptedChatModel com nome de modelo e uso de tokens, para medir os níveis de modelo.
+    Se a pergunta contém `unsure_on`, a resposta final admite não saber (baixa confiança).
+    """
+
+    model_name: str = "fake"
+    unsure_on: str = ""
+
+    def _script(self, messages: List[BaseMessage]) -> AIMessage:
+        message = super()._script(messages)
+        question = next(str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage))
+        if self.unsure_on and self.unsure_on in question.lower() and not message.tool_calls:
+            message.content = "Não tenho certeza sobre isso."
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = len(str(message.content)) // 4 + 20 * len(message.tool_calls)
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                  "total_tokens": input_tokens + output_tokens}
+        return message
+
+
+def build_agent_prompt() -> ChatPromptTemplate:
+    """Prompt local equivalente ao hwchase17/openai-functions-agent (sem hub.pull)."""
+    return ChatPromptTemplate.from_messages([
+        ("system", "You are a helpful assistant"),
+        MessagesPlaceholder("chat_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder("agent_scratchpad"),
+    ])
+
+
+def _fake_work_orders(count: int) -> list:
+    statuses = ["New Request", "In Progress", "Completed"]
+    assets = ["Tear 05 - Texo HF 324", "Dilo PMA 82", "CLT-2", "Fehrer NL-19/3"]
+    return [{
+        "WorkOrderNo": f"{i:06d}",
+        "Name": f"Troca de rolamento {i}",
+        "ProblemName": "Vibração",
+        "WorkCategoryName": "Corretiva",
+        "SourceLocationName": "Tecelagem",
+        "SourceAssetName": assets[i % len(assets)],
+        "WOStatusName": statuses[i % len(statuses)],
+        "DateOriginated": "2025-05-10T06:00:00",
+        "WorkRequested": "Verificar ruído no mancal.",
+        "LastModifiedOn": "2025-05-11T08:00:00",
+        "DateExpected": "2025-05-12T08:00:00",
+    } for i in range(count)]
+
+
+class FakeMachineStatusDB:
+    """Substitui a consulta SQL de status ao vivo (_machine_status_query) com latência fixa."""
+
+    def __init__(self, latency: float = 0.15):
+        self.latency = latency
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def query(self, canonical_equipment_name: str) -> str:
+        with self._lock:
+            self.queries += 1
+        time.sleep(self.latency)
+        return json.dumps({"machine_name": canonical_equipment_name, "status": "Rodando", "speed": 42},
+                          ensure_ascii=False)
+
+
+class StubDudeServer:
+    """Servidor HTTP local que imita /login e /workorders/searches da API do Dude."""
+
+    def __init__(self, latency: float = 0.2, orders: int = 300, page_size: int = 200):
+        self.latency = latency
+        self.orders = _fake_work_orders(orders)
+        self.page_size = page_size
+        self.requests = 0
+        self._server = None
+
+    def start(self) -> str:
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                stub.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                time.sleep(stub.latency)
+
+                if self.path.endswith("/login"):
+                    payload = b"token-falso"
+                    content_type = "text/plain"
+                else:
+                    page = json.loads(body or b"{}").get("Page", {}).get("PageNumber", 1)
+                    start = (page - 1) * stub.page_size
+                    total_pages = max(1, -(-len(stub.orders) // stub.page_size))
+                    payload = json.dumps({
+                        "Items": stub.orders[start:start + stub.page_size],
+                        "TotalPages": total_pages,
+                    }).encode("utf-8")
+                    content_type = "application/json"
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+
+
+def load_manual_documents(path: str) -> List[Document]:
+    with open(path, encoding="utf-8") as f:
+        manual = json.load(f)
+    return [
+        Document(page_content=str(text), metadata={"source_table": "manual_estruturado", "file_name": section})
+        for section, text in manual.items()
+    ]
+
+
+def build_throwaway_index(persist_directory: str, documents: List[Document], embedder: Embeddings):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.vectorstores import Chroma
+
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100).split_documents(documents)
+    Chroma.from_documents(documents=chunks, embedding=embedder, persist_directory=persist_directory)
+    return len(chunks)
@@ -0,0 +1,88 @@
+"""
+Perfil de tempo de importação (python -X importtime) de um módulo e verificação de orçamento.
+
+    cd Modelo/src
+    python -m bench.import_profile main --budget-ms 400
+    python -m bench.import_profile main_agent --top 30
+
+`check_budget` é usado por tests/test_import_budget.py para travar regressões no start.
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Módulos que o supervisor (main.py) não deve importar; eles só carregam no processo do usuário.
+SUPERVISOR_FORBIDDEN = (
+    "main_agent", "langchain_openai", "langchain_community", "chromadb",
+    "langchain.agents", "redis", "thefuzz",
+)
+
+
+def profile_imports(module: str, python: str = sys.executable) -> list:
+    """Retorna [(módulo, self_us, cumulativo_us, profundidade)] na ordem do -X importtime."""
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao importar '{module}':\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def total_ms(entries: list) -> float:
+    return sum(cumulative for _, _, cumulative, depth in entries if depth == 0) / 1000
+
+
+def check_budget(module: str, budget_ms: float, forbidden=()) -> list:
+    """Lista de problemas encontrados; vazia quando o módulo está dentro do orçamento."""
+    entries = profile_imports(module)
+    problems = []
+    elapsed = total_ms(entries)
+    if elapsed > budget_ms:
+        problems.append(f"'{module}' levou {elapsed:.0f} ms para importar (orçamento: {budget_ms:.0f} ms)")
+    imported = {name for name, *_ in entries}
+    for name in forbidden:
+        if name in imported:
+            problems.append(f"'{module}' importa '{name}' no start")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float)
+    args = parser.parse_args()
+
+    entries = profile_imports(args.module)
+    print(f"Tempo total de importação de '{args.module}': {total_ms(entries):.1f} ms\n")
+    print(f"{'cumulativo (ms)':>16} {'próprio (ms)':>13}  módulo")
+    for name, self_us, cumulative_us, _ in sorted(entries, key=lambda e: e[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>13.1f}  {name}")
+
+    if args.budget_ms is not None:
+        forbidden = SUPERVISOR_FORBIDDEN if args.module == "main" else ()
+        problems = check_budget(args.module, args.budget_ms, forbidden)
+        if problems:
+            print("\nFora do orçamento:")
+            for p in problems:
+                print(f"  - {p}")
+            sys.exit(1)
+        print("\nDentro do orçamento.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Exercita o agendador de LLM do nó com modelos falsos: vários processos de "usuário"
+chamando um chat model e um processo de fundo gerando embeddings, todos pelo mesmo
+coordenador. Mostra espera por prioridade, divisão das liberações entre usuários e o
+efeito de um 429 simulado.
+
+    cd Modelo/src
+    python -m bench.llm_scheduler --users 6 --calls 10 --rpm 120
+"""
+import json
+import time
+import argparse
+import multiprocessing
+
+from llm_scheduler.coordinator import SchedulerClient, serve_coordinator
+from llm_scheduler.fair_scheduler import FairScheduler
+from telemetry.metrics import REGISTRY
+
+ADDRESS = ("127.0.0.1", 6099)
+AUTHKEY = b"bench-llm-scheduler"
+
+
+class RateLimitError(Exception):
+    """Mesmo nome da exceção do SDK da OpenAI, que é o que o handler reconhece."""
+
+
+def _interactive_worker(calls: int, throttle_on: int, results):
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from llm_scheduler.langchain_gate import gate_chat_model
+
+    client = SchedulerClient(address=ADDRESS, authkey=AUTHKEY, estimated_tokens=100)
+    llm = gate_chat_model(FakeListChatModel(responses=["ok"]), client)
+    grants = []
+    for n in range(calls):
+        start = time.perf_counter()
+        llm.invoke("pergunta")
+        grants.append((time.time(), time.perf_counter() - start))
+        if n == throttle_on:
+            for handler in llm.callbacks:
+                handler.on_llm_error(RateLimitError("429"))
+    results.put((multiprocessing.current_process().name, "interactive", grants))
+
+
+def _background_worker(batches: int, results):
+    from bench.fakes import HashingEmbedder
+    from llm_scheduler.langchain_gate import GatedEmbeddings
+
+    client = SchedulerClient(address=ADDRESS, authkey=AUTHKEY)
+    embedder = GatedEmbeddings(HashingEmbedder(), client, batch_size=8)
+    grants = []
+    for _ in range(batches):
+        start = time.perf_counter()
+        embedder.embed_documents(["trecho de documentação para indexar"] * 8)
+        grants.append((time.time(), time.perf_counter() - start))
+    results.put((multiprocessing.current_process().name, "background", grants))
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[int(q * (len(values) - 1))], 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=6)
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--background-batches", type=int, default=10)
+    parser.add_argument("--rpm", type=float, default=120)
+    parser.add_argument("--tpm", type=float, default=1_000_000)
+    parser.add_argument("--throttle-on", type=int, default=3, help="chamada em que um usuário simula um 429")
+    args = parser.parse_args()
+
+    scheduler = FairScheduler(requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    # Começa com o balde vazio para o teste medir o regime de saturação, não a rajada inicial.
+    scheduler.requests.level = 0
+    listener = serve_coordinator(scheduler, ADDRESS, AUTHKEY)
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_interactive_worker, name=f"ChatAndritz-user{n}",
+                    args=(args.calls, args.throttle_on if n == 0 else -1, results))
+        for n in range(args.users)
+    ]
+    processes.append(ctx.Process(target=_background_worker, name="RAGIndexer",
+                                 args=(args.background_batches, results)))
+
+    started = time.time()
+    for p in processes:
+        p.start()
+    collected = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+    elapsed = time.time() - started
+    listener.close()
+
+    waits = {"interactive": [], "background": []}
+    finished_at = {}
+    for name, priority, grants in collected:
+        waits[priority].extend(w for _, w in grants)
+        finished_at[name] = round(max(t for t, _ in grants) - started, 2)
+
+    total = sum(len(g) for _, _, g in collected)
+    report = {
+        "chamadas": total,
+        "duracao_s": round(elapsed, 2),
+        "rpm_observado": round(total / elapsed * 60, 1),
+        "rpm_limite": args.rpm,
+        "espera_s": {
+            priority: {"p50": _percentile(v, 0.5), "p95": _percentile(v, 0.95)}
+            for priority, v in waits.items()
+        },
+        "termino_por_cliente_s": dict(sorted(finished_at.items())),
+        "pausas_por_429": REGISTRY.snapshot()["counters"].get("llm_throttled", 0),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
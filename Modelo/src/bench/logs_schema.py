@@ -0,0 +1,178 @@
+"""
+Mede as consultas quentes de user_logs (última mensagem do usuário, mensagens desde um
+timestamp e a varredura em lote do supervisor) numa tabela sintética com milhões de
+linhas, sem e com o índice de cobertura (userId, userTimeStamp DESC), e o custo por lote
+do arquivamento. O SQLite faz o papel do SQL Server: os planos mostram a mesma troca de
+varredura + ordenação por busca no índice que o db_logs.schema cria no servidor.
+
+    cd Modelo/src
+    python -m bench.logs_schema --rows 2000000 --users 5000
+"""
+import os
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+QUERIES = {
+    "ultima_mensagem": (
+        "SELECT userTimeStamp, userMessage FROM user_logs "
+        "WHERE userId = ? ORDER BY userTimeStamp DESC LIMIT 1"
+    ),
+    "mensagens_desde": (
+        "SELECT userTimeStamp, userMessage FROM user_logs "
+        "WHERE userId = ? AND userTimeStamp > ? ORDER BY userTimeStamp ASC"
+    ),
+    "varredura_supervisor": (
+        "SELECT userId, MAX(userTimeStamp) FROM user_logs WHERE userId IN ({}) GROUP BY userId"
+    ),
+}
+
+# O SQLite não tem INCLUDE: a mensagem entra como última coluna da chave para cobrir a consulta.
+COVERING_INDEX = (
+    "CREATE INDEX IX_user_logs_userId_userTimeStamp "
+    "ON user_logs (userId, userTimeStamp DESC, userMessage)"
+)
+RETENTION_INDEX = "CREATE INDEX IX_user_logs_userTimeStamp ON user_logs (userTimeStamp)"
+
+WORDS = ("tear", "dilo", "ordem", "manutenção", "rolamento", "feltro", "agulha", "status",
+         "procedimento", "epi", "limpeza", "turno", "parada", "produção", "qualidade")
+
+
+def _populate(conn, rows: int, users: int, days: int, seed: int):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    span = days * 86400
+    conn.execute("""
+        CREATE TABLE user_logs (
+            id INTEGER PRIMARY KEY,
+            userId TEXT NOT NULL,
+            userMessage TEXT NOT NULL,
+            userTimeStamp TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE TABLE user_logs_archive (id INTEGER PRIMARY KEY, userId TEXT, userMessage TEXT, userTimeStamp TEXT)")
+
+    def generate():
+        # Inserção em ordem de tempo, como na produção (o id identity acompanha o relógio).
+        offsets = sorted(rng.random() * span for _ in range(rows))
+        for offset in offsets:
+            ts = (start + timedelta(seconds=offset)).isoformat()
+            message = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 14)))
+            yield f"user-{rng.randrange(users):05d}", message, ts
+
+    conn.executemany("INSERT INTO user_logs (userId, userMessage, userTimeStamp) VALUES (?, ?, ?)", generate())
+    conn.commit()
+    return start + timedelta(seconds=span)
+
+
+def _plans(conn) -> dict:
+    params = {
+        "ultima_mensagem": ("user-00001",),
+        "mensagens_desde": ("user-00001", "2024-06-01"),
+        "varredura_supervisor": tuple(f"user-{i:05d}" for i in range(50)),
+    }
+    plans = {}
+    for name, sql in QUERIES.items():
+        if "{}" in sql:
+            sql = sql.format(",".join("?" * len(params[name])))
+        rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params[name]).fetchall()
+        plans[name] = [row[-1] for row in rows]
+    return plans
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def _latencies(conn, users: int, samples: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    result = {}
+    for name, sql in QUERIES.items():
+        timings = []
+        for _ in range(samples):
+            if name == "varredura_supervisor":
+                batch = [f"user-{rng.randrange(users):05d}" for _ in range(200)]
+                args = (sql.format(",".join("?" * len(batch))), batch)
+            elif name == "mensagens_desde":
+                args = (sql, (f"user-{rng.randrange(users):05d}", "2024-06-01"))
+            else:
+                args = (sql, (f"user-{rng.randrange(users):05d}",))
+            start = time.perf_counter()
+            conn.execute(*args).fetchall()
+            timings.append(time.perf_counter() - start)
+        result[name] = {
+            "p50_ms": round(_percentile(timings, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(timings, 0.95) * 1000, 3),
+        }
+    return result
+
+
+def _archive(conn, cutoff: str, batch_size: int) -> dict:
+    """Mesmo laço do RetentionJob: lotes limitados, cada um na sua transação."""
+    timings, moved = [], 0
+    while True:
+        start = time.perf_counter()
+        with conn:
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM user_logs WHERE userTimeStamp < ? ORDER BY userTimeStamp LIMIT ?",
+                (cutoff, batch_size))]
+            if ids:
+                marks = ",".join("?" * len(ids))
+                conn.execute(f"INSERT INTO user_logs_archive SELECT * FROM user_logs WHERE id IN ({marks})", ids)
+                conn.execute(f"DELETE FROM user_logs WHERE id IN ({marks})", ids)
+        timings.append(time.perf_counter() - start)
+        moved += len(ids)
+        if len(ids) < batch_size:
+            break
+    return {
+        "linhas_arquivadas": moved,
+        "lotes": len(timings),
+        "lote_p50_ms": round(_percentile(timings, 0.50) * 1000, 2),
+        "lote_max_ms": round(max(timings) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--samples", type=int, default=50, help="consultas medidas por tipo")
+    parser.add_argument("--retention-days", type=int, default=90)
+    parser.add_argument("--batch-size", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = sqlite3.connect(os.path.join(directory, "logs.sqlite3"))
+        start = time.perf_counter()
+        end = _populate(conn, args.rows, args.users, args.days, args.seed)
+        report = {"linhas": args.rows, "usuarios": args.users,
+                  "carga_s": round(time.perf_counter() - start, 1)}
+
+        report["sem_indice"] = {"planos": _plans(conn),
+                                "latencia": _latencies(conn, args.users, args.samples, args.seed)}
+
+        start = time.perf_counter()
+        conn.execute(COVERING_INDEX)
+        conn.execute(RETENTION_INDEX)
+        conn.execute("ANALYZE")
+        report["criacao_indices_s"] = round(time.perf_counter() - start, 1)
+        report["com_indice"] = {"planos": _plans(conn),
+                                "latencia": _latencies(conn, args.users, args.samples, args.seed)}
+
+        cutoff = (end - timedelta(days=args.retention_days)).isoformat()
+        report["arquivamento"] = _archive(conn, cutoff, args.batch_size)
+        report["depois_do_arquivamento"] = {"latencia": _latencies(conn, args.users, args.samples, args.seed)}
+        conn.close()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
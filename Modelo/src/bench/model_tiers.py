@@ -0,0 +1,87 @@
+"""
+Compara o agente com todos os papéis no modelo grande contra os níveis de modelo
+(helpers.model_tiers), com modelos falsos: o pequeno é rápido e barato, o grande é lento e
+caro. Mostra latência, tokens e custo por papel e quantas vezes houve escalonamento.
+
+    cd Modelo/src
+    python -m bench.model_tiers --small-latency 0.05 --large-latency 0.25
+"""
+import json
+import time
+import argparse
+
+from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain_core.tools import tool
+
+import helpers.model_tiers as model_tiers
+from bench.fakes import SizedChatModel, build_agent_prompt
+from helpers.model_tiers import ModelTiers
+from telemetry.metrics import MetricsRegistry
+
+QUESTIONS = [
+    "Qual o procedimento de troca do rolo da calandra?",
+    "Quais ordens abertas do tear 5?",
+    "Qual EPI usar na limpeza da carda?",
+    "Existe procedimento para vibração anormal no rolo?",
+    "Manual longo: procedimento completo de partida da linha",
+]
+
+
+@tool
+def search_documentation(query: str) -> str:
+    """Busca na documentação técnica."""
+    base = "Trecho do manual sobre o assunto pesquisado. "
+    return base * (400 if "longo" in query.lower() else 10)
+
+
+@tool
+def search_service_orders_api(user_input: str) -> str:
+    """Busca ordens de serviço."""
+    return json.dumps([{"ordem": 123, "status": "In Progress"}])
+
+
+def _run(tiers: ModelTiers, label: str) -> dict:
+    model_tiers.REGISTRY = registry = MetricsRegistry()
+    tools = [search_documentation, search_service_orders_api]
+    agent = create_openai_tools_agent(tiers.chat_model("auto"), tools, build_agent_prompt())
+    executor = AgentExecutor(agent=agent, tools=tools)
+
+    started = time.perf_counter()
+    for question in QUESTIONS:
+        executor.invoke({"input": question, "chat_history": []})
+    elapsed = time.perf_counter() - started
+
+    snapshot = registry.snapshot()
+    return {
+        "config": label,
+        "duracao_s": round(elapsed, 3),
+        "latencia_por_papel": {k: {"count": v["count"], "sum": v["sum"]} for k, v in snapshot["histograms"].items()},
+        "tokens": {k: v for k, v in snapshot["counters"].items() if k.startswith("llm_role_tokens")},
+        "custo_usd": round(sum(v for k, v in snapshot["counters"].items() if k.startswith("llm_role_cost_usd")), 6),
+        "escalonamentos": {k: v for k, v in snapshot["counters"].items() if k.startswith("llm_escalations")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--small-latency", type=float, default=0.05)
+    parser.add_argument("--large-latency", type=float, default=0.25)
+    parser.add_argument("--escalate-tokens", type=int, default=1500)
+    args = parser.parse_args()
+
+    def factory(name: str):
+        small = name != "gpt-4o"
+        return SizedChatModel(model_name=name, latency=args.small_latency if small else args.large_latency,
+                              unsure_on="vibração" if small else "")
+
+    large_only = ModelTiers(factory, role_models={r: "gpt-4o" for r in model_tiers.ROLES},
+                            max_small_context_tokens=args.escalate_tokens)
+    tiered = ModelTiers(factory, role_models={r: "gpt-4o-mini" for r in model_tiers.ROLES},
+                        large_model="gpt-4o", max_small_context_tokens=args.escalate_tokens)
+
+    report = [_run(large_only, "somente gpt-4o"), _run(tiered, "níveis")]
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
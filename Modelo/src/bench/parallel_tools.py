@@ -0,0 +1,95 @@
+"""
+Compara a execução serial e concorrente das ferramentas do agente usando ferramentas
+lentas simuladas e um modelo falso que pede as duas ferramentas no mesmo turno.
+
+    cd Modelo/src
+    python -m bench.parallel_tools --delay 1.5
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.tools import tool
+
+from helpers.tool_runtime import with_timeout
+from main_agent import create_agent_executor
+
+
+def build_slow_tools(delay: float) -> list:
+    @tool
+    def get_live_machine_status(machine_name_db: str) -> str:
+        """Status simulado de uma máquina."""
+        time.sleep(delay)
+        return json.dumps({"machine_name": machine_name_db, "status": "Rodando"})
+
+    @tool
+    def search_service_orders_api(user_input: str, equipment_name: str = None) -> str:
+        """Ordens de serviço simuladas."""
+        time.sleep(delay)
+        return "### ORDEM DE SERVIÇO\n*** ID: 000123\n*** Status: In Progress"
+
+    return [with_timeout(get_live_machine_status, delay * 4),
+            with_timeout(search_service_orders_api, delay * 4)]
+
+
+def _tool_call(call_id: str, name: str, args: dict) -> dict:
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+
+
+def build_fake_llm() -> FakeMessagesListChatModel:
+    calls = [
+        _tool_call("call_1", "get_live_machine_status", {"machine_name_db": "Tear05 / HF324"}),
+        _tool_call("call_2", "search_service_orders_api",
+                   {"user_input": "status do tear 5 e ordens abertas dele", "equipment_name": "Tear 05"}),
+    ]
+    tool_turn = AIMessage(
+        content="",
+        additional_kwargs={"tool_calls": calls},
+        tool_calls=[
+            {"id": c["id"], "name": c["function"]["name"], "args": json.loads(c["function"]["arguments"])}
+            for c in calls
+        ],
+    )
+    final_turn = AIMessage(content="O tear 5 está rodando e há uma ordem em andamento.")
+    return FakeMessagesListChatModel(responses=[tool_turn, final_turn])
+
+
+def build_prompt() -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages([
+        ("system", "Você é um assistente de fábrica."),
+        MessagesPlaceholder("chat_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder("agent_scratchpad"),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay", type=float, default=1.0, help="latência simulada de cada ferramenta (s)")
+    args = parser.parse_args()
+
+    question = {"input": "status do tear 5 e ordens abertas dele", "chat_history": []}
+
+    executor = create_agent_executor(build_fake_llm(), build_slow_tools(args.delay), build_prompt())
+    executor.verbose = False
+    start = time.perf_counter()
+    executor.invoke(question)
+    serial = time.perf_counter() - start
+
+    executor = create_agent_executor(build_fake_llm(), build_slow_tools(args.delay), build_prompt())
+    executor.verbose = False
+    start = time.perf_counter()
+    asyncio.run(executor.ainvoke(question))
+    concurrent = time.perf_counter() - start
+
+    print(f"Serial:      {serial:.2f}s")
+    print(f"Concorrente: {concurrent:.2f}s")
+    print(f"Economia:    {serial - concurrent:.2f}s ({(1 - concurrent / serial) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
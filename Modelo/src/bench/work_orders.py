@@ -0,0 +1,142 @@
+"""
+Compara o pipeline antigo de ordens do Dude (item JSON -> dict do controller -> dict com
+chaves acentuadas do DudeSolutions -> Filter) com o atual (item JSON -> WorkOrder ->
+Filter), em CPU e memória, para um lote grande de ordens vindo em páginas de 200.
+
+    cd Modelo/src
+    python -m bench.work_orders --orders 10000
+"""
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+
+from bench.fakes import _fake_work_orders
+from dude.filter import Filter
+from dude.work_order import WorkOrder
+
+PAGE_SIZE = 200
+
+_LEGACY_STOPWORDS = [
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "do", "da", "dos", "das",
+    "em", "no", "na", "nos", "nas", "por", "com", "para", "e", "que", "é", "ao", "à", "às", "aos",
+    "saber", "sobre", "tear", "dilo", "nl19", "hechtenberg", "nli", "sixmeter",
+    "iso", "clt-1", "clt-2", "0", "1", "2", "3", "4", "5", "6", "7", "9", "01", "02", "03", "04",
+    "05", "06", "07", "08", "09", "10", "11", "12", "13", "14", "15",
+]
+
+
+def _legacy_parse(pages: list, status_filter: str) -> list:
+    """Reprodução do caminho anterior: páginas acumuladas cruas e dois dicts por ordem."""
+    raw = []
+    for page in pages:
+        raw.extend(json.loads(page)["Items"])
+    mapped = []
+    for o in raw:
+        if status_filter == "vazio" or (status_filter in (o.get("WOStatusName") or "") and o.get("SourceAssetName")):
+            mapped.append({
+                "IdOrdem": o.get("WorkOrderNo", "Sem apontamento."),
+                "Nome": o.get("Name", "Sem apontamento."),
+                "Problema": o.get("ProblemName", "Sem apontamento."),
+                "Categoria": o.get("WorkCategoryName", "Sem apontamento."),
+                "Setor": o.get("SourceLocationName", "Sem apontamento."),
+                "Ativo": o.get("SourceAssetName", "Sem apontamento."),
+                "Status": o.get("WOStatusName", "Sem apontamento."),
+                "CriadoEm": o.get("DateOriginated", "Sem apontamento."),
+                "TrabalhoReq": o.get("WorkRequested", "Sem apontamento."),
+                "UltimaModif": o.get("LastModifiedOn", "Sem apontamento."),
+                "DataEsperada": o.get("DateExpected", "Sem apontamento."),
+            })
+    return [{
+        "ID": ordem["IdOrdem"], "Nome": ordem["Nome"], "Problema": ordem.get("Problema", "—"),
+        "Categoria": ordem["Categoria"], "Setor": ordem["Setor"], "Ativo": ordem["Ativo"],
+        "Status": ordem["Status"], "Criado em": ordem["CriadoEm"],
+        "Trabalho requisitado": ordem.get("TrabalhoReq", "").strip(),
+        "Última modificação": ordem["UltimaModif"], "Data Esperada": ordem["DataEsperada"],
+    } for ordem in mapped]
+
+
+def _legacy_filter(orders: list, user_message: str, machine_code: str) -> str:
+    def by_name(order):
+        stopwords = set(_LEGACY_STOPWORDS)
+        words = {w for w in user_message.lower().split() if w not in stopwords}
+        ids = {w.lstrip("0") for w in order["ID"].split() if w.lstrip("0") not in stopwords}
+        names = {w for w in order["Nome"].lower().split() if w not in stopwords}
+        return next(iter(words & ids), False) or next(iter(words & names), False)
+
+    base = [o for o in orders if by_name(o)] or orders
+    filtered = [o for o in base if str(o.get("Ativo")) == machine_code]
+    if not filtered:
+        return "Nenhuma ordem encontrada"
+    return "\n".join(f"""
+            ### ORDEM DE SERVIÇO
+            *** ID: {s['ID']}
+            *** Nome: {s['Nome']}
+            *** Problema: {s['Problema']}
+            *** Categoria: {s['Categoria']}
+            *** Setor: {s['Setor']}
+            *** Ativo: {s['Ativo']}
+            *** Status: {s['Status']}
+            *** Criado em: {s['Criado em']}
+            *** Trabalho requisitado: {s['Trabalho requisitado']}
+            *** Última modificação: {s['Última modificação']}
+            *** Data Esperada: {s['Data Esperada']}
+        """ for s in filtered)
+
+
+def _current_parse(pages: list, status_filter: str) -> list:
+    orders = []
+    for page in pages:
+        orders.extend(WorkOrder.from_json(item) for item in json.loads(page)["Items"])
+    if status_filter == "vazio":
+        return orders
+    return [o for o in orders if status_filter in (o.status or "") and o.asset]
+
+
+def _current_filter(orders: list, user_message: str, machine_code: str) -> str:
+    return Filter(["vazio", "vazio", machine_code], user_message)._filter_by_machine(orders)
+
+
+def _measure(parse, filter_, pages: list, user_message: str, machine: str) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    orders = parse(pages, "vazio")
+    parse_s = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    output = filter_(orders, user_message, machine)
+    filter_s = time.perf_counter() - start
+    return {
+        "ordens": len(orders),
+        "parse_s": round(parse_s, 4),
+        "filtro_formatacao_s": round(filter_s, 4),
+        "memoria_retida_mb": round(retained / 2**20, 2),
+        "pico_mb": round(peak / 2**20, 2),
+        "saida_chars": len(output),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--machine", default="Dilo PMA 82")
+    parser.add_argument("--question", default="ordens de troca de rolamento da dilo")
+    args = parser.parse_args()
+
+    items = _fake_work_orders(args.orders)
+    pages = [json.dumps({"Items": items[i:i + PAGE_SIZE]}) for i in range(0, len(items), PAGE_SIZE)]
+    del items
+
+    report = {
+        "anterior": _measure(_legacy_parse, _legacy_filter, pages, args.question, args.machine),
+        "atual": _measure(_current_parse, _current_filter, pages, args.question, args.machine),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Any
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load.dump import dumps
+from langchain_core.load.load import loads
+
+from telemetry.logs import get_logger
+from telemetry.metrics import REGISTRY
+
+logger = get_logger("llm_cache")
+
+# Campos que mudam a cada chamada e não alteram a resposta do modelo.
+VOLATILE_KEYS = {
+    "run_id", "request_timeout", "max_retries", "streaming", "callbacks",
+    "tags", "metadata", "response_metadata", "usage_metadata",
+}
+
+
+def _strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            k: _strip_volatile(v) for k, v in value.items()
+            if k not in VOLATILE_KEYS and not (k == "id" and isinstance(v, str))
+        }
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+def _normalize_json_fragment(text: str) -> str:
+    try:
+        data = json.loads(text)
+    except (ValueError, TypeError):
+        return " ".join(text.split())
+    return json.dumps(_strip_volatile(data), sort_keys=True, ensure_ascii=False)
+
+
+def normalize_cache_key(prompt: str, llm_string: str) -> str:
+    """Gera a chave do cache ignorando ids de execução, timeouts e outros campos voláteis."""
+    llm_params, _, extra = llm_string.partition("---")
+    normalized = "\n".join([
+        _normalize_json_fragment(prompt),
+        _normalize_json_fragment(llm_params),
+        extra.strip(),
+    ])
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class TierStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class MemoryTier:
+    name = "memoria"
+
+    def __init__(self, max_entries: int = 1000, ttl: int = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            payload, expires_at = item
+            if time.time() >= expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: bytes):
+        with self._lock:
+            self._data[key] = (payload, time.time() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteTier:
+    """Tier em disco compartilhado por todos os processos do nó (modo WAL)."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 20000, ttl: int = 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key         TEXT PRIMARY KEY,
+                value       BLOB NOT NULL,
+                expires_at  REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        now = time.time()
+        if now >= expires_at:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, payload: bytes):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, payload, now + self.ttl, now),
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        conn.execute("""
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM llm_cache")
+
+
+class RedisTier:
+    name = "redis"
+
+    def __init__(self, redis_url: str, ttl: int = 24 * 3600, prefix: str = "llm_cache"):
+        import redis
+
+        self.client = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(f"{self.prefix}:{key}")
+
+    def set(self, key: str, payload: bytes):
+        self.client.setex(f"{self.prefix}:{key}", self.ttl, payload)
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+
+class TieredLLMCache(BaseCache):
+    """
+    Cache de LLM em camadas: LRU em memória, SQLite compartilhado no nó e Redis opcional.
+    Um acerto em uma camada inferior é promovido para as camadas acima. Camadas que falham
+    ficam desativadas por `retry_after` segundos em vez de derrubar a chamada ao modelo.
+    """
+
+    def __init__(self, tiers: list, compress_threshold: int = 2048, retry_after: int = 30):
+        self.tiers = tiers
+        self.compress_threshold = compress_threshold
+        self.retry_after = retry_after
+        self._stats = {tier.name: TierStats(tier.name) for tier in tiers}
+        self._disabled_until = {tier.name: 0.0 for tier in tiers}
+
+    def _encode(self, return_val: RETURN_VAL_TYPE) -> bytes:
+        raw = dumps(list(return_val)).encode("utf-8")
+        if len(raw) >= self.compress_threshold:
+            return b"z" + zlib.compress(raw)
+        return b"r" + raw
+
+    @staticmethod
+    def _decode(payload: bytes) -> RETURN_VAL_TYPE:
+        flag, body = payload[:1], payload[1:]
+        if flag == b"z":
+            body = zlib.decompress(body)
+        return loads(body.decode("utf-8"))
+
+    def _available(self, tier) -> bool:
+        return time.time() >= self._disabled_until[tier.name]
+
+    def _fail(self, tier, error: Exception):
+        self._stats[tier.name].errors += 1
+        REGISTRY.increment("llm_cache", tier=tier.name, result="error")
+        self._disabled_until[tier.name] = time.time() + self.retry_after
+        logger.warning("camada '%s' do cache de LLM indisponível: %s", tier.name, error)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = normalize_cache_key(prompt, llm_string)
+        missed = []
+
+        for tier in self.tiers:
+            if not self._available(tier):
+                continue
+            try:
+                payload = tier.get(key)
+            except Exception as e:
+                self._fail(tier, e)
+                continue
+
+            if payload is None:
+                self._stats[tier.name].misses += 1
+                REGISTRY.increment("llm_cache", tier=tier.name, result="miss")
+                missed.append(tier)
+                continue
+
+            self._stats[tier.name].hits += 1
+            REGISTRY.increment("llm_cache", tier=tier.name, result="hit")
+            for upper in missed:
+                try:
+                    upper.set(key, payload)
+                except Exception as e:
+                    self._fail(upper, e)
+            return self._decode(payload)
+
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = normalize_cache_key(prompt, llm_string)
+        payload = self._encode(return_val)
+        for tier in self.tiers:
+            if not self._available(tier):
+                continue
+            try:
+                tier.set(key, payload)
+            except Exception as e:
+                self._fail(tier, e)
+
+    def clear(self, **kwargs: Any) -> None:
+        for tier in self.tiers:
+            try:
+                tier.clear()
+            except Exception as e:
+                self._fail(tier, e)
+
+    def stats(self) -> dict:
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+
+def build_llm_cache() -> TieredLLMCache:
+    """Monta o cache a partir das variáveis de ambiente. Redis só entra se REDIS_URL estiver definido."""
+    ttl = int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+    memory_entries = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1000"))
+    disk_entries = int(os.getenv("LLM_CACHE_DISK_ENTRIES", "20000"))
+    sqlite_path = os.getenv("LLM_CACHE_SQLITE_PATH", "./llm_cache.sqlite3")
+    compress_threshold = int(os.getenv("LLM_CACHE_COMPRESS_BYTES", "2048"))
+
+    tiers = [MemoryTier(max_entries=memory_entries, ttl=ttl)]
+
+    try:
+        tiers.append(SQLiteTier(sqlite_path, max_entries=disk_entries, ttl=ttl))
+    except sqlite3.Error as e:
+        logger.warning("cache de LLM em disco desativado: %s", e)
+
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        try:
+            tiers.append(RedisTier(redis_url, ttl=ttl))
+        except Exception as e:
+            logger.warning("cache de LLM com Redis desativado: %s", e)
+
+    return TieredLLMCache(tiers, compress_threshold=compress_threshold)
@@ -0,0 +1,384 @@
+import re
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, field
+from typing import Optional, List, Iterable, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from helpers.text import normalize_question
+from telemetry.metrics import REGISTRY
+
+# Categoria da resposta de acordo com as ferramentas usadas pelo agente.
+TOOL_CATEGORIES = {
+    "search_documentation": "documentacao",
+    "get_live_general_status": "status_ao_vivo",
+    "get_live_machine_status": "status_ao_vivo",
+    "get_live_product_status": "status_ao_vivo",
+    "search_service_orders_api": "dude",
+}
+
+# TTL em segundos por categoria. Zero significa que a resposta nunca é armazenada.
+DEFAULT_CATEGORY_TTLS = {
+    "conversa": 60 * 60,
+    "documentacao": 24 * 60 * 60,
+    "status_ao_vivo": 30,
+    "dude": 0,
+}
+
+
+def categorize_tools(tool_names: Iterable[str], category_ttls: dict = None) -> str:
+    """Retorna a categoria mais volátil entre as ferramentas usadas em uma resposta."""
+    ttls = category_ttls or DEFAULT_CATEGORY_TTLS
+    categories = {TOOL_CATEGORIES.get(name, "dude") for name in tool_names}
+    if not categories:
+        return "conversa"
+    return min(categories, key=lambda c: ttls.get(c, 0))
+
+
+# Palavras que só fazem sentido com a conversa anterior ("e ela?", "e o anterior?").
+_CONTEXT_WORDS = {
+    "ele", "ela", "eles", "elas", "dele", "dela", "deles", "delas", "nele", "nela",
+    "isso", "disso", "nisso", "esse", "essa", "desse", "dessa", "nesse", "nessa",
+    "aquele", "aquela", "daquele", "daquela", "anterior", "anteriores",
+    "mesmo", "mesma", "outro", "outra", "tambem", "ultimo", "ultima",
+}
+
+
+def depends_on_history(normalized: str, chat_history: Optional[list]) -> bool:
+    """
+    Verdadeiro quando a pergunta normalizada é continuação da conversa: começa com "e"
+    ("e o tear 6?") ou usa pronomes e referências ao que foi dito antes. A mesma frase
+    numa conversa nova é independente, por isso sem histórico a resposta é sempre False.
+    """
+    if not chat_history:
+        return False
+    words = normalized.split()
+    return bool(words) and (words[0] == "e" or any(word in _CONTEXT_WORDS for word in words))
+
+
+def identifier_tokens(normalized: str) -> List[str]:
+    """
+    Números e códigos citados na pergunta ("tear 05" -> ["5"], "HF-324" -> ["324", "hf324"]).
+    Duas perguntas só compartilham resposta se estes tokens forem idênticos: a similaridade
+    dos embeddings não distingue o tear 5 do tear 6.
+    """
+    tokens = set()
+    for word in re.split(r"[\s/]+", normalized):
+        code = re.sub(r"[^a-z0-9]", "", word)
+        if not re.search(r"\d", code):
+            continue
+        numbers = re.findall(r"\d+", code)
+        tokens.update(str(int(n)) for n in numbers)
+        if re.search(r"[a-z]", code):
+            tokens.add(re.sub(r"\d+", lambda m: str(int(m.group())), code))
+    return sorted(tokens)
+
+
+def _unit_vector(vector) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+
+
+@dataclass
+class SemanticCacheEntry:
+    key: str
+    question: str
+    vector: Optional[np.ndarray]
+    answer: str
+    category: str
+    created_at: float
+    expires_at: float
+    hits: int = 0
+    identifiers: List[str] = field(default_factory=list)
+
+    def is_expired(self, now: float) -> bool:
+        return now >= self.expires_at
+
+    def metadata(self) -> dict:
+        """Campos da entrada sem o vetor, que os backends guardam à parte."""
+        return {name: value for name, value in self.__dict__.items() if name != "vector"}
+
+
+class VectorMatrix:
+    """
+    Vetores unitários numa matriz float32 contígua, uma linha por chave: a busca é um
+    único produto matriz-vetor em vez de um laço em Python. Remoções trocam a linha
+    removida pela última, mantendo a matriz compacta.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self._rows = {}
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: str, vector: np.ndarray):
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if self._matrix is None:
+                self._matrix = np.empty((16, len(vector)), dtype=np.float32)
+            elif row == len(self._matrix):
+                grown = np.empty((2 * row, self._matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self._matrix
+                self._matrix = grown
+            self.keys.append(key)
+            self._rows[key] = row
+        self._matrix[row] = vector
+
+    def remove(self, key: str):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        last = len(self.keys) - 1
+        if row != last:
+            moved = self.keys[last]
+            self._matrix[row] = self._matrix[last]
+            self.keys[row] = moved
+            self._rows[moved] = row
+        self.keys.pop()
+
+    def clear(self):
+        self.keys, self._rows, self._matrix = [], {}, None
+
+    def search(self, vector: np.ndarray, threshold: float) -> List[Tuple[float, str]]:
+        """(similaridade, chave) acima do limiar, da mais parecida para a menos."""
+        if not self.keys:
+            return []
+        scores = self._matrix[:len(self.keys)] @ vector
+        above = np.flatnonzero(scores >= threshold)
+        ordered = above[np.argsort(-scores[above], kind="stable")]
+        return [(float(scores[row]), self.keys[row]) for row in ordered]
+
+
+@dataclass
+class SemanticCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    hits_by_category: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        data = asdict(self)
+        data["hit_rate"] = round(self.hits / total, 4) if total else 0.0
+        return data
+
+
+class InMemorySemanticBackend:
+    """Backend local (por processo) com despejo LRU."""
+
+    def __init__(self, max_entries: int = 500):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._vectors = VectorMatrix()
+
+    def entries(self) -> List[SemanticCacheEntry]:
+        return list(self._entries.values())
+
+    def search(self, vector: np.ndarray, threshold: float) -> List[Tuple[float, SemanticCacheEntry]]:
+        return [(score, self._entries[key]) for score, key in self._vectors.search(vector, threshold)]
+
+    def add(self, entry: SemanticCacheEntry) -> int:
+        self._entries[entry.key] = entry
+        self._entries.move_to_end(entry.key)
+        self._vectors.add(entry.key, entry.vector)
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            self._vectors.remove(key)
+            evicted += 1
+        return evicted
+
+    def touch(self, entry: SemanticCacheEntry):
+        if entry.key in self._entries:
+            self._entries.move_to_end(entry.key)
+
+    def remove(self, key: str):
+        self._entries.pop(key, None)
+        self._vectors.remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._vectors.clear()
+
+
+class RedisSemanticBackend:
+    """
+    Backend compartilhado entre processos. A ordem LRU fica em um sorted set, os vetores
+    em um hash de bytes float32 e os demais campos em outro hash (JSON). Cada processo
+    mantém uma cópia local da matriz de vetores e só a recarrega quando o contador de
+    versão muda: a busca custa um GET, o produto matriz-vetor e um HMGET dos candidatos.
+    """
+
+    def __init__(self, redis_url: str, max_entries: int = 500, prefix: str = "semantic_cache"):
+        import redis
+
+        self.client = redis.Redis.from_url(redis_url)
+        self.max_entries = max_entries
+        self.entries_key = f"{prefix}:entries"
+        self.vectors_key = f"{prefix}:vectors"
+        self.lru_key = f"{prefix}:lru"
+        self.version_key = f"{prefix}:version"
+        self._vectors = VectorMatrix()
+        self._version = None
+
+    @staticmethod
+    def _decode(raw) -> SemanticCacheEntry:
+        return SemanticCacheEntry(vector=None, **json.loads(raw))
+
+    def entries(self) -> List[SemanticCacheEntry]:
+        return [self._decode(raw) for raw in self.client.hvals(self.entries_key)]
+
+    def _sync_vectors(self):
+        version = self.client.get(self.version_key)
+        if self._version is not None and version == self._version:
+            return
+        self._vectors.clear()
+        for key, raw in self.client.hgetall(self.vectors_key).items():
+            self._vectors.add(key.decode(), np.frombuffer(raw, dtype=np.float32))
+        self._version = version
+
+    def search(self, vector: np.ndarray, threshold: float) -> List[Tuple[float, SemanticCacheEntry]]:
+        self._sync_vectors()
+        candidates = self._vectors.search(vector, threshold)
+        if not candidates:
+            return []
+        raws = self.client.hmget(self.entries_key, [key for _, key in candidates])
+        return [(score, self._decode(raw)) for (score, _), raw in zip(candidates, raws) if raw]
+
+    def _delete(self, keys):
+        pipe = self.client.pipeline()
+        pipe.hdel(self.entries_key, *keys)
+        pipe.hdel(self.vectors_key, *keys)
+        pipe.zrem(self.lru_key, *keys)
+        pipe.incr(self.version_key)
+        pipe.execute()
+
+    def add(self, entry: SemanticCacheEntry) -> int:
+        pipe = self.client.pipeline()
+        pipe.hset(self.entries_key, entry.key, json.dumps(entry.metadata(), ensure_ascii=False))
+        pipe.hset(self.vectors_key, entry.key, np.asarray(entry.vector, dtype=np.float32).tobytes())
+        pipe.zadd(self.lru_key, {entry.key: time.time()})
+        pipe.incr(self.version_key)
+        pipe.execute()
+
+        overflow = self.client.zcard(self.lru_key) - self.max_entries
+        if overflow <= 0:
+            return 0
+        oldest = self.client.zrange(self.lru_key, 0, overflow - 1)
+        if oldest:
+            self._delete(oldest)
+        return len(oldest)
+
+    def touch(self, entry: SemanticCacheEntry):
+        self.client.zadd(self.lru_key, {entry.key: time.time()})
+
+    def remove(self, key: str):
+        self._delete([key])
+
+    def clear(self):
+        self.client.delete(self.entries_key, self.vectors_key, self.lru_key)
+        self.client.incr(self.version_key)
+
+
+class SemanticAnswerCache:
+    """
+    Cache de respostas finais do assistente, indexado pelo embedding da pergunta normalizada.
+    Uma pergunta nova reaproveita a resposta de uma pergunta antiga quando a similaridade
+    de cosseno passa do limiar, os números e códigos citados são exatamente os mesmos e a
+    entrada ainda está dentro do TTL da sua categoria. Perguntas que dependem do histórico
+    da conversa não são consultadas nem armazenadas.
+    """
+
+    def __init__(self, embedder: Embeddings, backend=None,
+                 similarity_threshold: float = 0.92,
+                 category_ttls: dict = None,
+                 min_words: int = 3):
+        self.embedder = embedder
+        self.backend = backend or InMemorySemanticBackend()
+        self.similarity_threshold = similarity_threshold
+        self.category_ttls = {**DEFAULT_CATEGORY_TTLS, **(category_ttls or {})}
+        self.min_words = min_words
+        self.metrics = SemanticCacheStats()
+
+    def _is_cacheable_question(self, normalized: str) -> bool:
+        return len(normalized.split()) >= self.min_words
+
+    def lookup(self, question: str, chat_history: Optional[list] = None) -> Optional[str]:
+        normalized = normalize_question(question)
+        if not self._is_cacheable_question(normalized) or depends_on_history(normalized, chat_history):
+            self.metrics.misses += 1
+            REGISTRY.increment("semantic_cache", result="miss", reason="nao_cacheavel")
+            return None
+
+        vector = _unit_vector(self.embedder.embed_query(normalized))
+        identifiers = identifier_tokens(normalized)
+        now = time.time()
+        best_entry = None
+
+        for _, entry in self.backend.search(vector, self.similarity_threshold):
+            if entry.is_expired(now):
+                self.backend.remove(entry.key)
+                REGISTRY.increment("semantic_cache_evictions", reason="expirada")
+                continue
+            if entry.identifiers == identifiers:
+                best_entry = entry
+                break
+
+        if best_entry is None:
+            self.metrics.misses += 1
+            REGISTRY.increment("semantic_cache", result="miss", reason="sem_similar")
+            return None
+
+        best_entry.hits += 1
+        self.backend.touch(best_entry)
+        self.metrics.hits += 1
+        by_category = self.metrics.hits_by_category
+        by_category[best_entry.category] = by_category.get(best_entry.category, 0) + 1
+        REGISTRY.increment("semantic_cache", result="hit", category=best_entry.category)
+        return best_entry.answer
+
+    def store(self, question: str, answer: str, tools_used: Iterable[str] = (),
+              chat_history: Optional[list] = None) -> bool:
+        normalized = normalize_question(question)
+        if not answer or not self._is_cacheable_question(normalized) or depends_on_history(normalized, chat_history):
+            return False
+
+        category = categorize_tools(tools_used, self.category_ttls)
+        ttl = self.category_ttls.get(category, 0)
+        if ttl <= 0:
+            return False
+
+        now = time.time()
+        entry = SemanticCacheEntry(
+            key=uuid.uuid4().hex,
+            question=normalized,
+            vector=_unit_vector(self.embedder.embed_query(normalized)),
+            answer=answer,
+            category=category,
+            created_at=now,
+            expires_at=now + ttl,
+            identifiers=identifier_tokens(normalized),
+        )
+        evicted = self.backend.add(entry)
+        self.metrics.evictions += evicted
+        self.metrics.stores += 1
+        REGISTRY.increment("semantic_cache_stores", category=category)
+        if evicted:
+            REGISTRY.increment("semantic_cache_evictions", evicted, reason="lru")
+        return True
+
+    def stats(self) -> dict:
+        return self.metrics.as_dict()
+
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,208 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Concessões: uma linha por usuário em atendimento (userId -> nó, validade). Só quem tem a
+# linha válida pode manter a sessão do usuário aberta; a validade é renovada em bloco a
+# cada heartbeat do nó. As tabelas no SQL Server são criadas pela migração 5 de db_logs.schema.
+
+
+class SqlServerLeaseStore:
+    """Nós e concessões nas tabelas chat_nodes/chat_leases, com o relógio do próprio SQL Server."""
+
+    def __init__(self, conn_str: str = None):
+        from db_logs.receive import _connection_string
+
+        self.conn_str = conn_str or _connection_string()
+
+    def _connect(self):
+        import pyodbc
+
+        return pyodbc.connect(self.conn_str, autocommit=False)
+
+    def heartbeat(self, node_id: str, sessions: int, node_timeout: float) -> list:
+        """Marca o nó como vivo e retorna os nós com heartbeat dentro de `node_timeout` segundos."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE chat_nodes SET heartbeatAt = SYSUTCDATETIME(), sessions = ? WHERE nodeId = ?;
+                IF @@ROWCOUNT = 0
+                    INSERT INTO chat_nodes (nodeId, startedAt, heartbeatAt, sessions)
+                    VALUES (?, SYSUTCDATETIME(), SYSUTCDATETIME(), ?);
+            """, sessions, node_id, node_id, sessions)
+            cursor.execute("""
+                SELECT nodeId FROM chat_nodes
+                WHERE heartbeatAt >= DATEADD(MILLISECOND, -?, SYSUTCDATETIME())
+            """, int(node_timeout * 1000))
+            nodes = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+        return nodes
+
+    def renew(self, node_id: str, lease_seconds: float) -> set:
+        """Estende as concessões ainda válidas do nó. Retorna os usuários que ele detém."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE chat_leases SET expiresAt = DATEADD(MILLISECOND, ?, SYSUTCDATETIME())
+                OUTPUT INSERTED.userId
+                WHERE nodeId = ? AND expiresAt > SYSUTCDATETIME()
+            """, int(lease_seconds * 1000), node_id)
+            owned = {row[0] for row in cursor.fetchall()}
+            conn.commit()
+        return owned
+
+    def acquire(self, node_id: str, user_ids, lease_seconds: float) -> set:
+        """Toma as concessões livres ou vencidas. Retorna os usuários efetivamente obtidos."""
+        acquired = set()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            for user_id in user_ids:
+                # HOLDLOCK serializa dois nós disputando o mesmo usuário ainda sem linha.
+                cursor.execute("""
+                    MERGE chat_leases WITH (HOLDLOCK) AS t
+                    USING (SELECT ? AS userId) AS s ON t.userId = s.userId
+                    WHEN MATCHED AND t.expiresAt <= SYSUTCDATETIME() THEN
+                        UPDATE SET nodeId = ?, expiresAt = DATEADD(MILLISECOND, ?, SYSUTCDATETIME())
+                    WHEN NOT MATCHED THEN
+                        INSERT (userId, nodeId, expiresAt)
+                        VALUES (s.userId, ?, DATEADD(MILLISECOND, ?, SYSUTCDATETIME()))
+                    OUTPUT INSERTED.userId;
+                """, user_id, node_id, int(lease_seconds * 1000), node_id, int(lease_seconds * 1000))
+                acquired.update(row[0] for row in cursor.fetchall())
+                conn.commit()
+        return acquired
+
+    def release(self, node_id: str, user_ids):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            for user_id in user_ids:
+                cursor.execute("DELETE FROM chat_leases WHERE userId = ? AND nodeId = ?", user_id, node_id)
+            conn.commit()
+
+    def leave(self, node_id: str):
+        """Saída limpa: libera tudo de uma vez para os outros nós não esperarem as concessões vencerem."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM chat_leases WHERE nodeId = ?", node_id)
+            cursor.execute("DELETE FROM chat_nodes WHERE nodeId = ?", node_id)
+            conn.commit()
+
+    def nodes(self) -> list:
+        """[(nó, segundos desde o heartbeat, sessões informadas, concessões)] para observação."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT n.nodeId, DATEDIFF(MILLISECOND, n.heartbeatAt, SYSUTCDATETIME()) / 1000.0,
+                       n.sessions, COUNT(l.userId)
+                FROM chat_nodes n
+                LEFT JOIN chat_leases l ON l.nodeId = n.nodeId AND l.expiresAt > SYSUTCDATETIME()
+                GROUP BY n.nodeId, n.heartbeatAt, n.sessions
+                ORDER BY n.nodeId
+            """)
+            return [tuple(row) for row in cursor.fetchall()]
+
+
+class SqliteLeaseStore:
+    """
+    As mesmas operações num arquivo SQLite, para rodar vários nós como processos locais
+    (desenvolvimento e bench.cluster). O relógio é o time.time() da máquina, comum a todos.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_nodes (
+                    nodeId TEXT PRIMARY KEY, startedAt REAL NOT NULL,
+                    heartbeatAt REAL NOT NULL, sessions INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_leases (
+                    userId TEXT PRIMARY KEY, nodeId TEXT NOT NULL, expiresAt REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS IX_chat_leases_nodeId ON chat_leases (nodeId)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def heartbeat(self, node_id: str, sessions: int, node_timeout: float) -> list:
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("""
+                INSERT INTO chat_nodes (nodeId, startedAt, heartbeatAt, sessions) VALUES (?, ?, ?, ?)
+                ON CONFLICT(nodeId) DO UPDATE SET heartbeatAt = excluded.heartbeatAt, sessions = excluded.sessions
+            """, (node_id, now, now, sessions))
+            rows = conn.execute("SELECT nodeId FROM chat_nodes WHERE heartbeatAt >= ?", (now - node_timeout,))
+            return [row[0] for row in rows]
+
+    def renew(self, node_id: str, lease_seconds: float) -> set:
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute("""
+                UPDATE chat_leases SET expiresAt = ? WHERE nodeId = ? AND expiresAt > ? RETURNING userId
+            """, (now + lease_seconds, node_id, now)).fetchall()
+        return {row[0] for row in rows}
+
+    def acquire(self, node_id: str, user_ids, lease_seconds: float) -> set:
+        now = time.time()
+        acquired = set()
+        with self._transaction() as conn:
+            for user_id in user_ids:
+                row = conn.execute("""
+                    INSERT INTO chat_leases (userId, nodeId, expiresAt) VALUES (?, ?, ?)
+                    ON CONFLICT(userId) DO UPDATE SET nodeId = excluded.nodeId, expiresAt = excluded.expiresAt
+                    WHERE chat_leases.expiresAt <= ?
+                    RETURNING userId
+                """, (user_id, node_id, now + lease_seconds, now)).fetchone()
+                if row:
+                    acquired.add(row[0])
+        return acquired
+
+    def release(self, node_id: str, user_ids):
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM chat_leases WHERE userId = ? AND nodeId = ?",
+                             [(user_id, node_id) for user_id in user_ids])
+
+    def leave(self, node_id: str):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM chat_leases WHERE nodeId = ?", (node_id,))
+            conn.execute("DELETE FROM chat_nodes WHERE nodeId = ?", (node_id,))
+
+    def nodes(self) -> list:
+        now = time.time()
+        rows = self._connection().execute("""
+            SELECT n.nodeId, ? - n.heartbeatAt, n.sessions, COUNT(l.userId)
+            FROM chat_nodes n
+            LEFT JOIN chat_leases l ON l.nodeId = n.nodeId AND l.expiresAt > ?
+            GROUP BY n.nodeId ORDER BY n.nodeId
+        """, (now, now))
+        return [tuple(row) for row in rows]
+
+
+def lease_store_from_env():
+    """CLUSTER_STORE=sqlserver (padrão) ou sqlite:<arquivo> para nós locais."""
+    value = os.getenv("CLUSTER_STORE", "sqlserver")
+    if value.startswith("sqlite:"):
+        return SqliteLeaseStore(value[len("sqlite:"):])
+    return SqlServerLeaseStore()
@@ -0,0 +1,142 @@
+import os
+import time
+import bisect
+import socket
+import hashlib
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from cluster.leases import lease_store_from_env
+from telemetry.logs import get_logger
+from telemetry.metrics import REGISTRY
+
+load_dotenv()
+
+logger = get_logger("cluster")
+
+
+def cluster_enabled() -> bool:
+    return os.getenv("CLUSTER", "off").lower() == "on"
+
+
+def default_node_id() -> str:
+    return os.getenv("CLUSTER_NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Hash consistente com `vnodes` pontos por nó: quando um nó entra ou sai, só os usuários
+    dos arcos dele mudam de dono (~1/N), e todos os nós que veem o mesmo conjunto de membros
+    chegam ao mesmo dono sem conversar entre si.
+    """
+
+    def __init__(self, nodes, vnodes: int = 64):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._keys = [key for key, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, user_id: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(user_id)) % len(self._keys)
+        return self._nodes[index]
+
+
+class ClusterMembership:
+    """
+    Participação de um nó no cluster. O anel de hash decide quem *deveria* atender cada
+    usuário; a concessão na tabela de coordenação é o que autoriza de fato. Assim, mesmo
+    com dois nós vendo anéis diferentes por alguns segundos, só um abre a sessão.
+
+    - heartbeat + renovação das concessões a cada `renew_interval` segundos;
+    - concessões de usuários que passaram para outro nó só são liberadas depois que a
+      sessão local terminou (o supervisor informa quem ainda está rodando);
+    - sem renovar por metade da validade da concessão, o nó se considera isolado e
+      `sync` retorna None: o supervisor derruba as sessões antes que a concessão vença e
+      outro nó a assuma.
+    """
+
+    def __init__(self, store=None, node_id: str = None, lease_seconds: float = None,
+                 node_timeout: float = None, vnodes: int = None):
+        self.store = store or lease_store_from_env()
+        self.node_id = node_id or default_node_id()
+        self.lease_seconds = lease_seconds or float(os.getenv("CLUSTER_LEASE_SECONDS", "30"))
+        self.node_timeout = node_timeout or float(os.getenv("CLUSTER_NODE_TIMEOUT_SECONDS", "15"))
+        self.vnodes = vnodes or int(os.getenv("CLUSTER_VNODES", "64"))
+        self.renew_interval = min(self.lease_seconds / 5, self.node_timeout / 3)
+        self.nodes = ()
+        self.ring = HashRing([], self.vnodes)
+        self.owned = set()
+        self._last_renew = None
+        self._rebalance_started = None
+
+    def _refresh(self, sessions: int):
+        started = time.monotonic()
+        nodes = tuple(sorted(self.store.heartbeat(self.node_id, sessions, self.node_timeout)))
+        self.owned = self.store.renew(self.node_id, self.lease_seconds)
+        self._last_renew = started
+        if nodes != self.nodes:
+            logger.info("membros do cluster alterados",
+                        extra={"node": self.node_id, "nodes": list(nodes), "before": list(self.nodes)})
+            REGISTRY.increment("cluster_membership_changes", node=self.node_id)
+            self.nodes = nodes
+            self.ring = HashRing(nodes, self.vnodes)
+            self._rebalance_started = started
+
+    def isolated(self) -> bool:
+        return self._last_renew is None or time.monotonic() - self._last_renew >= self.lease_seconds / 2
+
+    def sync(self, active: set, running: set) -> Optional[set]:
+        """
+        Usuários que este nó deve atender agora, dados os usuários online (`active`) e os que
+        ainda têm processo local (`running`, inclusive os em drenagem). None = nó isolado.
+        """
+        if self._last_renew is None or time.monotonic() - self._last_renew >= self.renew_interval:
+            try:
+                self._refresh(len(running))
+            except Exception as e:
+                logger.warning("falha ao renovar as concessões do cluster: %s", e, extra={"node": self.node_id})
+        if self.isolated():
+            self.owned = set()
+            return None
+
+        desired = {uid for uid in active if self.ring.owner(uid) == self.node_id}
+        try:
+            release = self.owned - desired - running
+            if release:
+                self.store.release(self.node_id, release)
+                self.owned -= release
+            missing = desired - self.owned
+            if missing:
+                self.owned |= self.store.acquire(self.node_id, missing, self.lease_seconds)
+        except Exception as e:
+            logger.warning("falha ao atualizar as concessões do cluster: %s", e, extra={"node": self.node_id})
+
+        serving = self.owned & desired
+        handing_off = (running - desired) & active
+        if self._rebalance_started is not None and serving == desired and not handing_off:
+            seconds = time.monotonic() - self._rebalance_started
+            REGISTRY.observe("cluster_rebalance_seconds", seconds, node=self.node_id)
+            logger.info("rebalanceamento concluído",
+                        extra={"node": self.node_id, "seconds": round(seconds, 2), "users": len(serving)})
+            self._rebalance_started = None
+        REGISTRY.set_gauge("cluster_leases", len(self.owned), node=self.node_id)
+        return serving
+
+    def leave(self):
+        try:
+            self.store.leave(self.node_id)
+        except Exception as e:
+            logger.warning("falha ao sair do cluster: %s", e, extra={"node": self.node_id})
+        self.owned = set()
+
+
+if __name__ == "__main__":
+    print(f"{'nó':<32}{'heartbeat(s)':>14}{'sessões':>9}{'concessões':>12}")
+    for node, age, sessions, leases in lease_store_from_env().nodes():
+        print(f"{node:<32}{age:>14.1f}{sessions:>9}{leases:>12}")
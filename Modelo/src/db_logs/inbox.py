@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+import pyodbc
+from datetime import datetime
+from typing import Optional
+
+from db_logs.receive import _connection_string
+from telemetry.metrics import REGISTRY
+
+
+class SqlMessageSource:
+    """Leitura das mensagens de um usuário na tabela user_logs."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.conn_str = _connection_string()
+
+    def newest(self):
+        with pyodbc.connect(self.conn_str) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT TOP 1 
+                  userTimeStamp, 
+                  userMessage 
+                FROM user_logs 
+                WHERE userId = ? 
+                ORDER BY userTimeStamp DESC
+            """, self.user_id)
+            return cursor.fetchone()
+
+    def rows_since(self, timestamp) -> list:
+        with pyodbc.connect(self.conn_str) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT userTimeStamp, userMessage
+                FROM user_logs
+                WHERE userId = ? AND userTimeStamp > ?
+                ORDER BY userTimeStamp ASC
+            """, self.user_id, timestamp)
+            return cursor.fetchall()
+
+
+class UserInbox:
+    """
+    Caixa de entrada de um usuário: guarda todas as mensagens desde o último timestamp
+    lido, em vez de só a mais recente. Mensagens que chegam em sequência (cada uma a menos
+    de `coalesce_window` segundos da anterior) viram um único turno do agente.
+
+    Na primeira leitura da sessão (sem timestamp conhecido) só a mensagem mais recente é
+    considerada, como antes, para não reprocessar o histórico antigo.
+
+    A janela conta a partir do timestamp da mensagem, não de quando ela foi vista: se ela
+    já está quieta há `coalesce_window` segundos, sai na hora. `has_new_message` roda na
+    thread que vigia a resposta em andamento, por isso o estado fica sob `_lock`.
+    """
+
+    def __init__(self, source, coalesce_window: float = None, poll_interval: float = 0.25,
+                 max_coalesce_wait: float = 5.0):
+        self.source = source
+        self.coalesce_window = coalesce_window if coalesce_window is not None \
+            else float(os.getenv("INBOX_COALESCE_SECONDS", "0.75"))
+        self.poll_interval = poll_interval
+        self.max_coalesce_wait = max_coalesce_wait
+        self.last_message_timestamp = None
+        self.pending = []
+        # Timestamp da primeira mensagem do turno em espera e do último turno entregue.
+        self._first_timestamp = None
+        self.message_timestamp = None
+        self._lock = threading.Lock()
+
+    def _poll(self) -> int:
+        with self._lock:
+            if self.last_message_timestamp is None:
+                row = self.source.newest()
+                rows = [row] if row else []
+            else:
+                rows = self.source.rows_since(self.last_message_timestamp)
+            for timestamp, message in rows:
+                if not self.pending:
+                    self._first_timestamp = timestamp
+                self.pending.append(message)
+                self.last_message_timestamp = timestamp
+            return len(rows)
+
+    def _quiet_until(self) -> float:
+        """Instante (monotonic) em que a janela da mensagem mais recente termina."""
+        elapsed = 0.0
+        timestamp = self.last_message_timestamp
+        if isinstance(timestamp, datetime):
+            elapsed = (datetime.now(timestamp.tzinfo) - timestamp).total_seconds()
+        return time.monotonic() + self.coalesce_window - min(max(elapsed, 0.0), self.coalesce_window)
+
+    def has_new_message(self) -> bool:
+        """Usado durante uma resposta: mensagens que chegarem ficam guardadas para o próximo turno."""
+        self._poll()
+        with self._lock:
+            return bool(self.pending)
+
+    def requeue(self, message: str):
+        """Devolve a mensagem de uma resposta cancelada para frente da fila."""
+        with self._lock:
+            self.pending.insert(0, message)
+
+    def next_message(self) -> Optional[str]:
+        with self._lock:
+            has_pending = bool(self.pending)
+        if not has_pending and not self._poll():
+            return None
+
+        deadline = time.monotonic() + self.max_coalesce_wait
+        quiet_until = self._quiet_until()
+        while True:
+            remaining = min(quiet_until, deadline) - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(self.poll_interval, remaining))
+            if self._poll():
+                quiet_until = self._quiet_until()
+
+        with self._lock:
+            messages, self.pending = self.pending, []
+            self.message_timestamp, self._first_timestamp = self._first_timestamp, None
+        if len(messages) > 1:
+            REGISTRY.increment("inbox_coalesced_messages", amount=len(messages) - 1)
+        return "\n".join(messages)
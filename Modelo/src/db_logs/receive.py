@@ -2,42 +2,45 @@ import os
 import pyodbc
 from dotenv import load_dotenv
 
-class LastMessageFetcher:
-    def __init__(self, user_id):
-        load_dotenv()
+def _connection_string() -> str:
+    load_dotenv()
+    return (
+        'DRIVER={ODBC Driver 17 for SQL Server};'
+        f'SERVER={os.getenv("DB_SERVER_DEV")};'
+        f'DATABASE={os.getenv("DB_NAME")};'
+        f'UID={os.getenv("DB_USER_DEV")};'
+        f'PWD={os.getenv("DB_PASSWORD")};'
+        'TrustServerCertificate=yes;'
+    )
 
-        self.server   = os.getenv('DB_SERVER_DEV')
-        self.database = os.getenv('DB_NAME')
-        self.username = os.getenv('DB_USER_DEV')
-        self.password = os.getenv('DB_PASSWORD')
-        self.user_id  = user_id
-        self.last_message_timestamp = None
+class PendingMessageScanner:
+    """
+    Verifica de uma vez, para todas as sessões hibernadas, quem recebeu mensagem nova.
+    Uma consulta por rodada do supervisor, independente de quantos usuários dormem.
+    """
+    BATCH_SIZE = 500
 
-        self.conn_str = (
-            'DRIVER={ODBC Driver 17 for SQL Server};'
-            f'SERVER={self.server};'
-            f'DATABASE={self.database};'
-            f'UID={self.username};'
-            f'PWD={self.password};'
-            'TrustServerCertificate=yes;'
-        )
+    def __init__(self):
+        self.conn_str = _connection_string()
 
-    def fetch_last_message(self):
+    def users_with_new_messages(self, last_seen: dict) -> set:
+        """`last_seen` mapeia userId -> timestamp da última mensagem já lida (ou None)."""
+        if not last_seen:
+            return set()
+        user_ids = list(last_seen)
+        pending = set()
         with pyodbc.connect(self.conn_str) as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT TOP 1 
-                  userTimeStamp, 
-                  userMessage 
-                FROM user_logs 
-                WHERE userId = ? 
-                ORDER BY userTimeStamp DESC
-            """, self.user_id)
-            row = cursor.fetchone()
-
-        if row:
-            userTimeStamp, userMessage = row
-            if userTimeStamp != self.last_message_timestamp:
-                self.last_message_timestamp = userTimeStamp
-                return userMessage
-        return None
+            for start in range(0, len(user_ids), self.BATCH_SIZE):
+                batch = user_ids[start:start + self.BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                cursor.execute(f"""
+                    SELECT userId, MAX(userTimeStamp)
+                    FROM user_logs
+                    WHERE userId IN ({placeholders})
+                    GROUP BY userId
+                """, *batch)
+                for user_id, newest in cursor.fetchall():
+                    if newest != last_seen.get(user_id):
+                        pending.add(user_id)
+        return pending
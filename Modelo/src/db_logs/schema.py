@@ -0,0 +1,336 @@
+import os
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pyodbc
+
+from db_logs.receive import _connection_string
+from telemetry.logs import get_logger
+from telemetry.metrics import REGISTRY
+
+logger = get_logger("db_logs.schema")
+
+# Migrações versionadas das tabelas de log. Cada versão roda uma única vez (registrada em
+# schema_migrations) e cada comando é um lote separado, para que um comando possa usar a
+# coluna criada/renomeada pelo anterior. Nunca altere uma versão já publicada: acrescente outra.
+MIGRATIONS = [
+    (1, "tabelas user_logs e bot_logs", [
+        """
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'user_logs')
+        CREATE TABLE user_logs (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            userId NVARCHAR(50) NOT NULL,
+            userMessage NVARCHAR(MAX) NOT NULL,
+            userTimeStamp DATETIMEOFFSET NOT NULL DEFAULT SYSDATETIMEOFFSET()
+        )
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'bot_logs')
+        CREATE TABLE bot_logs (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            userId NVARCHAR(50) NOT NULL,
+            botMessage NVARCHAR(MAX) NOT NULL,
+            botTimeStamp DATETIMEOFFSET NOT NULL DEFAULT SYSDATETIMEOFFSET()
+        )
+        """,
+    ]),
+    # O Conversation antigo criava bot_logs com a coluna userTimeStamp, mas o INSERT dele e a
+    # API leem botTimeStamp.
+    (2, "bot_logs.userTimeStamp -> botTimeStamp", [
+        """
+        IF COL_LENGTH('bot_logs', 'botTimeStamp') IS NULL
+           AND COL_LENGTH('bot_logs', 'userTimeStamp') IS NOT NULL
+        EXEC sp_rename 'bot_logs.userTimeStamp', 'botTimeStamp', 'COLUMN'
+        """,
+    ]),
+    (3, "índices de cobertura (userId, timestamp DESC)", [
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_user_logs_userId_userTimeStamp')
+        CREATE NONCLUSTERED INDEX IX_user_logs_userId_userTimeStamp
+            ON user_logs (userId, userTimeStamp DESC) INCLUDE (userMessage)
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_bot_logs_userId_botTimeStamp')
+        CREATE NONCLUSTERED INDEX IX_bot_logs_userId_botTimeStamp
+            ON bot_logs (userId, botTimeStamp DESC) INCLUDE (botMessage)
+        """,
+    ]),
+    (4, "tabelas de arquivo e índices de retenção", [
+        """
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'user_logs_archive')
+        CREATE TABLE user_logs_archive (
+            id INT NOT NULL PRIMARY KEY,
+            userId NVARCHAR(50) NOT NULL,
+            userMessage NVARCHAR(MAX) NOT NULL,
+            userTimeStamp DATETIMEOFFSET NOT NULL,
+            archivedAt DATETIMEOFFSET NOT NULL DEFAULT SYSDATETIMEOFFSET()
+        )
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'bot_logs_archive')
+        CREATE TABLE bot_logs_archive (
+            id INT NOT NULL PRIMARY KEY,
+            userId NVARCHAR(50) NOT NULL,
+            botMessage NVARCHAR(MAX) NOT NULL,
+            botTimeStamp DATETIMEOFFSET NOT NULL,
+            archivedAt DATETIMEOFFSET NOT NULL DEFAULT SYSDATETIMEOFFSET()
+        )
+        """,
+        # O job de retenção procura pelas linhas mais antigas; sem este índice cada lote
+        # varreria a tabela inteira.
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_user_logs_userTimeStamp')
+        CREATE NONCLUSTERED INDEX IX_user_logs_userTimeStamp ON user_logs (userTimeStamp)
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_bot_logs_botTimeStamp')
+        CREATE NONCLUSTERED INDEX IX_bot_logs_botTimeStamp ON bot_logs (botTimeStamp)
+        """,
+    ]),
+    (5, "coordenação do cluster (chat_nodes, chat_leases)", [
+        """
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'chat_nodes')
+        CREATE TABLE chat_nodes (
+            nodeId NVARCHAR(100) NOT NULL PRIMARY KEY,
+            startedAt DATETIME2 NOT NULL,
+            heartbeatAt DATETIME2 NOT NULL,
+            sessions INT NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'chat_leases')
+        CREATE TABLE chat_leases (
+            userId NVARCHAR(50) NOT NULL PRIMARY KEY,
+            nodeId NVARCHAR(100) NOT NULL,
+            expiresAt DATETIME2 NOT NULL,
+            INDEX IX_chat_leases_nodeId (nodeId)
+        )
+        """,
+    ]),
+]
+
+# Índice -> (tabela, colunas-chave com DESC, colunas incluídas), conferido a cada partida.
+COVERING_INDEXES = {
+    "IX_user_logs_userId_userTimeStamp": ("user_logs", [("userId", False), ("userTimeStamp", True)], ["userMessage"]),
+    "IX_bot_logs_userId_botTimeStamp": ("bot_logs", [("userId", False), ("botTimeStamp", True)], ["botMessage"]),
+}
+
+# Tabela -> (arquivo, coluna de tempo, colunas copiadas).
+RETENTION_TABLES = {
+    "user_logs": ("user_logs_archive", "userTimeStamp", ["id", "userId", "userMessage", "userTimeStamp"]),
+    "bot_logs": ("bot_logs_archive", "botTimeStamp", ["id", "userId", "botMessage", "botTimeStamp"]),
+}
+
+# Abaixo de ~5000 linhas por comando o SQL Server não escala os bloqueios para a tabela
+# inteira, e as inserções dos chats continuam passando durante o arquivamento.
+DEFAULT_ARCHIVE_BATCH_SIZE = 4000
+
+_LOCK_NAME = "chatbot_logs_schema"
+
+
+def _connect(conn_str: str = None):
+    return pyodbc.connect(conn_str or _connection_string(), autocommit=False)
+
+
+def _ensure_migrations_table(cursor):
+    cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'schema_migrations')
+        CREATE TABLE schema_migrations (
+            version INT NOT NULL PRIMARY KEY,
+            description NVARCHAR(200) NOT NULL,
+            appliedAt DATETIMEOFFSET NOT NULL DEFAULT SYSDATETIMEOFFSET()
+        )
+    """)
+
+
+def applied_versions(cursor) -> set:
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def index_definition(cursor, name: str, table: str):
+    """(colunas-chave com DESC, colunas incluídas) do índice, ou None se ele não existe."""
+    cursor.execute("""
+        SELECT c.name, ic.is_descending_key, ic.is_included_column
+        FROM sys.indexes i
+        JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+        JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+        WHERE i.name = ? AND i.object_id = OBJECT_ID(?)
+        ORDER BY ic.is_included_column, ic.key_ordinal, c.name
+    """, name, table)
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    keys = [(column, bool(desc)) for column, desc, included in rows if not included]
+    includes = [column for column, _, included in rows if included]
+    return keys, includes
+
+
+def _create_index_sql(name: str, table: str, keys: list, includes: list, rebuild: bool) -> str:
+    key_sql = ", ".join(f"{column} DESC" if desc else column for column, desc in keys)
+    sql = f"CREATE NONCLUSTERED INDEX {name} ON {table} ({key_sql})"
+    if includes:
+        sql += f" INCLUDE ({', '.join(includes)})"
+    return sql + (" WITH (DROP_EXISTING = ON)" if rebuild else "")
+
+
+def verify_indexes(cursor) -> list:
+    """Recria índices de cobertura ausentes ou com definição diferente. Retorna os recriados."""
+    fixed = []
+    for name, (table, keys, includes) in COVERING_INDEXES.items():
+        current = index_definition(cursor, name, table)
+        if current == (keys, sorted(includes)):
+            continue
+        logger.warning("índice de cobertura ausente ou divergente; recriando",
+                       extra={"index": name, "table": table, "found": str(current)})
+        cursor.execute(_create_index_sql(name, table, keys, includes, rebuild=current is not None))
+        fixed.append(name)
+    return fixed
+
+
+def ensure_schema(conn_str: str = None, migrations: list = MIGRATIONS) -> list:
+    """
+    Aplica as migrações pendentes e confere os índices de cobertura. Chamado uma vez na
+    partida do supervisor; um applock exclusivo garante que, com vários processos subindo
+    juntos, só um migre e os outros esperem e encontrem tudo aplicado.
+    Retorna as versões aplicadas nesta chamada.
+    """
+    applied = []
+    with _connect(conn_str) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DECLARE @result INT;
+            EXEC @result = sp_getapplock @Resource = ?, @LockMode = 'Exclusive',
+                                         @LockOwner = 'Transaction', @LockTimeout = 60000;
+            IF @result < 0 THROW 50000, 'não foi possível obter o lock de migração do esquema', 1;
+        """, _LOCK_NAME)
+        _ensure_migrations_table(cursor)
+        done = applied_versions(cursor)
+        for version, description, statements in sorted(migrations, key=lambda m: m[0]):
+            if version in done:
+                continue
+            start = time.perf_counter()
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                           version, description)
+            applied.append(version)
+            logger.info("migração aplicada", extra={"version": version, "description": description,
+                                                     "seconds": round(time.perf_counter() - start, 3)})
+        fixed = verify_indexes(cursor)
+        conn.commit()
+
+    REGISTRY.increment("schema_migrations_applied", len(applied))
+    REGISTRY.increment("schema_indexes_rebuilt", len(fixed))
+    return applied
+
+
+def ensure_schema_or_retry(conn_str: str = None, backoff: float = None, backoff_max: float = None,
+                           stop_event: threading.Event = None):
+    """
+    ensure_schema() na partida sem derrubar o supervisor: com o SQL Server fora do ar ou o
+    applock esgotado, registra o erro e tenta de novo numa thread daemon, com espera
+    exponencial (SCHEMA_RETRY_SECONDS, até SCHEMA_RETRY_MAX_SECONDS). Retorna a thread de
+    novas tentativas, ou None se a primeira deu certo.
+    """
+    backoff = backoff or float(os.getenv("SCHEMA_RETRY_SECONDS", "5"))
+    backoff_max = backoff_max or float(os.getenv("SCHEMA_RETRY_MAX_SECONDS", "300"))
+    stop_event = stop_event or threading.Event()
+
+    def attempt() -> bool:
+        try:
+            ensure_schema(conn_str)
+            return True
+        except Exception as e:
+            REGISTRY.increment("schema_migration_failures")
+            logger.error("falha ao aplicar as migrações do esquema; nova tentativa em %.0fs: %s", delay, e)
+            return False
+
+    delay = backoff
+    if attempt():
+        return None
+
+    def loop():
+        nonlocal delay
+        while not stop_event.wait(delay):
+            delay = min(delay * 2, backoff_max)
+            if attempt():
+                logger.info("migrações do esquema aplicadas após nova tentativa")
+                return
+
+    thread = threading.Thread(target=loop, name="schema-migrations", daemon=True)
+    thread.start()
+    return thread
+
+
+def archive_batch(cursor, table: str, cutoff, batch_size: int) -> int:
+    """Move até `batch_size` linhas anteriores a `cutoff` para a tabela de arquivo, num só comando."""
+    archive, ts_column, columns = RETENTION_TABLES[table]
+    column_list = ", ".join(columns)
+    deleted = ", ".join(f"DELETED.{c}" for c in columns)
+    cursor.execute(f"""
+        DELETE TOP (?) FROM {table}
+        OUTPUT {deleted} INTO {archive} ({column_list})
+        WHERE {ts_column} < ?
+    """, batch_size, cutoff)
+    return cursor.rowcount
+
+
+class RetentionJob:
+    """
+    Arquiva as mensagens mais antigas que LOGS_RETENTION_DAYS em lotes de
+    ARCHIVE_BATCH_SIZE linhas, cada lote na sua própria transação e com uma pausa curta
+    entre eles, para não segurar bloqueios nem inflar o log de transações. Roda a cada
+    LOGS_RETENTION_INTERVAL_SECONDS numa thread daemon do supervisor.
+    """
+
+    def __init__(self, conn_str: str = None, retention_days: int = None, batch_size: int = None,
+                 interval: float = None, pause: float = 0.2, max_batches: int = 500):
+        self.conn_str = conn_str or _connection_string()
+        self.retention_days = retention_days or int(os.getenv("LOGS_RETENTION_DAYS", "90"))
+        self.batch_size = batch_size or int(os.getenv("ARCHIVE_BATCH_SIZE", str(DEFAULT_ARCHIVE_BATCH_SIZE)))
+        self.interval = interval or float(os.getenv("LOGS_RETENTION_INTERVAL_SECONDS", "21600"))
+        self.pause = pause
+        self.max_batches = max_batches
+        self.stop_event = threading.Event()
+
+    def run_once(self, now: datetime = None) -> dict:
+        """Arquiva cada tabela até esgotar as linhas antigas (ou `max_batches`). Retorna {tabela: linhas}."""
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=self.retention_days)
+        moved = {}
+        with pyodbc.connect(self.conn_str, autocommit=False) as conn:
+            cursor = conn.cursor()
+            for table in RETENTION_TABLES:
+                moved[table] = 0
+                for _ in range(self.max_batches):
+                    start = time.perf_counter()
+                    rows = archive_batch(cursor, table, cutoff, self.batch_size)
+                    conn.commit()
+                    REGISTRY.observe("logs_archive_batch_seconds", time.perf_counter() - start, table=table)
+                    moved[table] += rows
+                    if rows < self.batch_size or self.stop_event.wait(self.pause):
+                        break
+                REGISTRY.increment("logs_archived_rows", moved[table], table=table)
+        logger.info("retenção dos logs concluída", extra={"cutoff": cutoff.isoformat(), **moved})
+        return moved
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning("falha no arquivamento dos logs: %s", e)
+            self.stop_event.wait(self.interval)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self._loop, name="logs-retention", daemon=True)
+        thread.start()
+        logger.info("retenção dos logs ativa", extra={"retention_days": self.retention_days,
+                                                     "batch_size": self.batch_size})
+        return thread
+
+
+if __name__ == "__main__":
+    print("Versões aplicadas:", ensure_schema() or "nenhuma (esquema em dia)")
+    print("Linhas arquivadas:", RetentionJob().run_once())
@@ -0,0 +1,333 @@
+import os
+import time
+import pickle
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+from zoneinfo import ZoneInfo
+
+from dude.work_order import WorkOrder
+from telemetry.logs import get_logger
+from telemetry.metrics import REGISTRY
+
+logger = get_logger("dude.analytics")
+
+DIMENSIONS = ("status", "asset", "category", "sector")
+# Concluídas entram no MTTR; canceladas não foram reparadas, mas também saem do backlog.
+COMPLETED_STATUSES = ("completed", "closed")
+CLOSED_STATUSES = COMPLETED_STATUSES + ("cancel",)
+BACKLOG_AGE_BUCKETS = ((7, "0-7d"), (30, "8-30d"), (None, ">30d"))
+UNKNOWN = "(sem apontamento)"
+
+# O Dude grava as datas das ordens no horário local da planta, sem fuso.
+PLANT_TIMEZONE = ZoneInfo(os.getenv("PLANT_TIMEZONE", "America/Sao_Paulo"))
+
+DEFAULT_SNAPSHOT_PATH = os.getenv(
+    "ANALYTICS_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "..", "analytics", "work_orders.pkl"),
+)
+
+
+def parse_dude_date(value) -> Optional[datetime]:
+    """
+    '2025-05-10T06:00:00', com ou sem fração/fuso, para datetime ingênuo no horário da
+    planta. Datas sem fuso já estão nesse horário; as com fuso são convertidas para ele.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(PLANT_TIMEZONE).replace(tzinfo=None)
+    return parsed
+
+
+def is_closed(status: Optional[str]) -> bool:
+    """Fora do backlog: concluída, fechada ou cancelada."""
+    lowered = (status or "").lower()
+    return any(s in lowered for s in CLOSED_STATUSES)
+
+
+def is_completed(status: Optional[str]) -> bool:
+    """Reparo de fato concluído (conta no MTTR); cancelada não conta."""
+    lowered = (status or "").lower()
+    return any(s in lowered for s in COMPLETED_STATUSES)
+
+
+def _plant_now() -> datetime:
+    return datetime.now(PLANT_TIMEZONE).replace(tzinfo=None)
+
+
+def _to_plant(utc: datetime) -> datetime:
+    return utc.replace(tzinfo=timezone.utc).astimezone(PLANT_TIMEZONE).replace(tzinfo=None)
+
+
+class WorkOrderAnalytics:
+    """
+    Agregados de manutenção mantidos incrementalmente por ordem (upsert): contagens por
+    dia de criação x dimensão x status, tempo de conclusão por dia de conclusão x ativo
+    (MTTR) e o conjunto de ordens abertas para a idade do backlog. Quando uma ordem muda
+    de status, a contribuição antiga é desfeita e a nova aplicada, sem recontar o resto.
+
+    A API do Dude não expõe a data de conclusão; usa-se a última modificação de uma ordem
+    concluída como aproximação. Datas e janelas ficam no horário local da planta.
+    """
+
+    def __init__(self):
+        self._orders = {}
+        self._counts = Counter()
+        self._repairs = defaultdict(lambda: [0.0, 0])
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._orders)
+
+    @staticmethod
+    def _contribution(order: WorkOrder) -> Optional[tuple]:
+        created = parse_dude_date(order.created)
+        if created is None:
+            return None
+        values = {dim: getattr(order, dim) or UNKNOWN for dim in DIMENSIONS}
+        repair = None
+        if is_completed(order.status):
+            finished = parse_dude_date(order.last_modified)
+            if finished is not None and finished >= created:
+                repair = (finished.date(), (finished - created).total_seconds() / 3600)
+        return created, values, repair
+
+    def _apply(self, order_no, contribution: tuple, sign: int):
+        created, values, repair = contribution
+        day = created.date()
+        for dim in DIMENSIONS:
+            key = (day, dim, values[dim], values["status"])
+            self._counts[key] += sign
+            if not self._counts[key]:
+                del self._counts[key]
+        if repair is not None:
+            entry = self._repairs[(repair[0], values["asset"])]
+            entry[0] += sign * repair[1]
+            entry[1] += sign
+        if sign > 0 and not is_closed(values["status"]):
+            self._open[order_no] = (values["asset"], created)
+        elif sign < 0:
+            self._open.pop(order_no, None)
+
+    def upsert(self, orders) -> int:
+        """Aplica ordens novas ou alteradas. Retorna quantas mudaram os agregados."""
+        changed = 0
+        with self._lock:
+            for order in orders:
+                if order.order_no is None:
+                    continue
+                contribution = self._contribution(order)
+                previous = self._orders.get(order.order_no)
+                if previous == contribution:
+                    continue
+                if previous is not None:
+                    self._apply(order.order_no, previous, -1)
+                    del self._orders[order.order_no]
+                if contribution is not None:
+                    self._apply(order.order_no, contribution, +1)
+                    self._orders[order.order_no] = contribution
+                changed += 1
+        return changed
+
+    def save(self, path: str):
+        """Grava as contribuições por ordem (os agregados são refeitos no load), de forma atômica."""
+        with self._lock:
+            orders = dict(self._orders)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(orders, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "WorkOrderAnalytics":
+        with open(path, "rb") as f:
+            orders = pickle.load(f)
+        analytics = cls()
+        for order_no, contribution in orders.items():
+            analytics._apply(order_no, contribution, +1)
+            analytics._orders[order_no] = contribution
+        return analytics
+
+    def prune(self, before: datetime) -> int:
+        """Descarta ordens criadas antes de `before` (mantém a memória limitada à janela)."""
+        with self._lock:
+            old = [no for no, (created, _, _) in self._orders.items() if created < before]
+            for no in old:
+                self._apply(no, self._orders.pop(no), -1)
+        return len(old)
+
+    def counts(self, days: int = 30, group_by: str = "asset", asset: Optional[str] = None,
+               now: Optional[datetime] = None) -> dict:
+        """{valor de group_by: {status: quantidade}} das ordens criadas nos últimos `days` dias."""
+        if group_by not in DIMENSIONS:
+            raise ValueError(f"group_by deve ser um de {DIMENSIONS}")
+        since = ((now or _plant_now()) - timedelta(days=days)).date()
+        result = defaultdict(Counter)
+        with self._lock:
+            if asset is None:
+                for (day, dim, value, status), n in self._counts.items():
+                    if dim == group_by and day >= since:
+                        result[value][status] += n
+            else:
+                for created, values, _ in self._orders.values():
+                    if values["asset"] == asset and created.date() >= since:
+                        result[values[group_by]][values["status"]] += 1
+        return {value: dict(statuses) for value, statuses in result.items()}
+
+    def mttr(self, days: int = 30, asset: Optional[str] = None, now: Optional[datetime] = None) -> dict:
+        """{ativo: (horas médias até a conclusão, ordens concluídas)} nos últimos `days` dias."""
+        since = ((now or _plant_now()) - timedelta(days=days)).date()
+        totals = defaultdict(lambda: [0.0, 0])
+        with self._lock:
+            for (day, key_asset), (hours, n) in self._repairs.items():
+                if n and day >= since and (asset is None or key_asset == asset):
+                    totals[key_asset][0] += hours
+                    totals[key_asset][1] += n
+        return {a: (hours / n, n) for a, (hours, n) in totals.items() if n}
+
+    def backlog(self, asset: Optional[str] = None, now: Optional[datetime] = None) -> dict:
+        """{ativo: {"abertas", faixas de idade, "idade_media_dias"}} das ordens ainda abertas."""
+        now = now or _plant_now()
+        ages = defaultdict(list)
+        with self._lock:
+            for key_asset, created in self._open.values():
+                if asset is None or key_asset == asset:
+                    ages[key_asset].append((now - created).total_seconds() / 86400)
+        result = {}
+        for key_asset, values in ages.items():
+            row = {"abertas": len(values)}
+            lower = None
+            for limit, label in BACKLOG_AGE_BUCKETS:
+                row[label] = sum(1 for a in values
+                                 if (lower is None or a > lower) and (limit is None or a <= limit))
+                lower = limit
+            row["idade_media_dias"] = sum(values) / len(values)
+            result[key_asset] = row
+        return result
+
+    def top_assets(self, days: int = 30, limit: int = 10, now: Optional[datetime] = None) -> list:
+        """[(ativo, ordens criadas)] dos ativos com mais ordens nos últimos `days` dias."""
+        totals = {a: sum(s.values()) for a, s in self.counts(days, "asset", now=now).items()}
+        return sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+class AnalyticsRefresher:
+    """
+    Mantém um WorkOrderAnalytics atualizado a partir do Dude: a primeira carga busca as
+    ordens criadas na janela (ANALYTICS_WINDOW_DAYS); depois, a cada ANALYTICS_REFRESH_SECONDS,
+    busca só as modificadas desde a última carga e aplica como upsert.
+
+    Com `snapshot_path`, cada atualização é publicada em arquivo para os processos de chat
+    (AnalyticsSnapshot): o supervisor roda um único refresher em segundo plano (start) e
+    ninguém faz a carga de 180 dias dentro do timeout da ferramenta.
+    """
+
+    OVERLAP = timedelta(minutes=5)
+
+    def __init__(self, fetch: Callable, analytics: Optional[WorkOrderAnalytics] = None,
+                 window_days: int = None, refresh_interval: float = None, snapshot_path: str = None):
+        self.fetch = fetch
+        self.analytics = analytics or WorkOrderAnalytics()
+        self.window_days = window_days or int(os.getenv("ANALYTICS_WINDOW_DAYS", "180"))
+        self.refresh_interval = refresh_interval or float(os.getenv("ANALYTICS_REFRESH_SECONDS", "300"))
+        self.snapshot_path = snapshot_path
+        self.loaded_at = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def ensure_fresh(self) -> WorkOrderAnalytics:
+        with self._lock:
+            if self.loaded_at is not None and time.monotonic() - self._last_check < self.refresh_interval:
+                return self.analytics
+
+            # Os parâmetros de busca do Dude vão em UTC, como o fim da janela em DudeConnectionBase.
+            started = datetime.now(timezone.utc).replace(tzinfo=None)
+            window_start = started - timedelta(days=self.window_days)
+            if self.loaded_at is None:
+                orders = self.fetch(window_start.strftime("%Y-%m-%dT%H:%M:%S"), "DateCreated")
+            else:
+                since = self.loaded_at - self.OVERLAP
+                orders = self.fetch(since.strftime("%Y-%m-%dT%H:%M:%S"), "DateLastModified")
+
+            changed = self.analytics.upsert(orders)
+            pruned = self.analytics.prune(_to_plant(window_start))
+            self.loaded_at = started
+            self._last_check = time.monotonic()
+            if self.snapshot_path:
+                self.analytics.save(self.snapshot_path)
+            REGISTRY.set_gauge("analytics_work_orders", len(self.analytics))
+            logger.info("análises do Dude atualizadas",
+                        extra={"fetched": len(orders), "changed": changed, "pruned": pruned})
+            return self.analytics
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.ensure_fresh()
+            except Exception as e:
+                logger.warning("falha ao atualizar as análises do Dude: %s", e)
+            self.stop_event.wait(self.refresh_interval)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self._loop, name="analytics-refresher", daemon=True)
+        thread.start()
+        logger.info("análises do Dude em segundo plano",
+                    extra={"interval": self.refresh_interval, "snapshot": self.snapshot_path})
+        return thread
+
+
+class AnalyticsSnapshot:
+    """
+    Lado dos processos de chat: lê os agregados publicados pelo refresher do supervisor e
+    só recarrega quando o arquivo muda. Retorna None se não houver arquivo ou se ele não
+    for atualizado há mais de `max_age` segundos (refresher parado).
+    """
+
+    def __init__(self, path: str = DEFAULT_SNAPSHOT_PATH, max_age: float = None):
+        self.path = path
+        self.max_age = max_age or 3 * float(os.getenv("ANALYTICS_REFRESH_SECONDS", "300"))
+        self.analytics = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[WorkOrderAnalytics]:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return None
+        if time.time() - mtime > self.max_age:
+            return None
+        with self._lock:
+            if mtime != self._mtime:
+                self.analytics = WorkOrderAnalytics.load(self.path)
+                self._mtime = mtime
+            return self.analytics
+
+
+def dude_fetch(start_date: str, date_field: str) -> list:
+    from dude.controller import DudeConnectionBase
+
+    return DudeConnectionBase().fetch_orders("Petropolis", start_date, date_field)
+
+
+def format_table(headers: list, rows: list) -> str:
+    if not rows:
+        return "Nenhuma ordem de serviço na janela consultada."
+    lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+    lines += ["| " + " | ".join(str(c) for c in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    refresher = AnalyticsRefresher(dude_fetch)
+    analytics = refresher.ensure_fresh()
+    print(format_table(["Ativo", "OS"], analytics.top_assets(days=30)))
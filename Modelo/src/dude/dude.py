@@ -19,31 +19,12 @@ class DudeSolutions:
         self.data = data
         self.status = status
     
-    def getOrderBy(self):
-
+    def getOrderBy(self) -> list:
+        """Lista de WorkOrder, como vem do controller (sem cópia intermediária)."""
         controller = DudeConnectionBase()
-        ordens = controller.fetch_new_requests("Petropolis", self.data, self.status)
-        orders = []
-        
-        for ordem in ordens:
-            s = {
-                "ID": ordem['IdOrdem'],
-                "Nome": ordem['Nome'],
-                "Problema": ordem.get('Problema', '—'),
-                "Categoria": ordem['Categoria'],
-                "Setor": ordem['Setor'],
-                "Ativo": ordem['Ativo'],
-                "Status": ordem['Status'],
-                "Criado em": ordem['CriadoEm'],
-                "Trabalho requisitado": ordem.get('TrabalhoReq', '').strip(),
-                "Última modificação": ordem['UltimaModif'],
-                "Data Esperada": ordem['DataEsperada'],
-            }
-            
-            orders.append(s)
-        
-        return orders
+        return controller.fetch_new_requests("Petropolis", self.data, self.status)
 
 if __name__ == "__main__":
     teste = DudeSolutions("2025-05-10T06:00:00", "Completed")
-    print(teste.getOrderBy())
\ No newline at end of file
+    for ordem in teste.getOrderBy():
+        print(ordem)
\ No newline at end of file
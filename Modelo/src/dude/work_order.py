@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+from typing import Optional
+
+MISSING = "Sem apontamento."
+
+
+@dataclass(slots=True)
+class WorkOrder:
+    """
+    Uma ordem de serviço do Dude. É criada uma única vez a partir do item JSON da página
+    (from_json) e usada como está pelo filtro, pela formatação e pelas análises. Campos
+    ausentes ficam None; o texto "Sem apontamento." só aparece na formatação.
+    """
+
+    order_no: Optional[str] = None
+    name: Optional[str] = None
+    problem: Optional[str] = None
+    category: Optional[str] = None
+    sector: Optional[str] = None
+    asset: Optional[str] = None
+    status: Optional[str] = None
+    created: Optional[str] = None
+    work_requested: Optional[str] = None
+    last_modified: Optional[str] = None
+    expected: Optional[str] = None
+
+    @classmethod
+    def from_json(cls, item: dict) -> "WorkOrder":
+        get = item.get
+        return cls(
+            get("WorkOrderNo"),
+            get("Name"),
+            get("ProblemName"),
+            get("WorkCategoryName"),
+            get("SourceLocationName"),
+            get("SourceAssetName"),
+            get("WOStatusName"),
+            get("DateOriginated"),
+            get("WorkRequested"),
+            get("LastModifiedOn"),
+            get("DateExpected"),
+        )
+
+    def format(self) -> str:
+        def show(value):
+            if value is None:
+                return MISSING
+            return value.strip() if isinstance(value, str) else value
+
+        return f"""
+            ### ORDEM DE SERVIÇO
+            *** ID: {show(self.order_no)}
+            *** Nome: {show(self.name)}
+            *** Problema: {show(self.problem)}
+            *** Categoria: {show(self.category)}
+            *** Setor: {show(self.sector)}
+            *** Ativo: {show(self.asset)}
+            *** Status: {show(self.status)}
+            *** Criado em: {show(self.created)}
+            *** Trabalho requisitado: {show(self.work_requested)}
+            *** Última modificação: {show(self.last_modified)}
+            *** Data Esperada: {show(self.expected)}
+        """
@@ -0,0 +1,16 @@
+"""
+Importado pelo processo modelo do forkserver (ver DEFAULT_PRELOAD em main.py): baixa o
+prompt do agente antes de qualquer fork, para que a inicialização de cada sessão, inclusive
+ao acordar da hibernação, não dependa da rede. Se o Hub falhar aqui, cada sessão tenta de
+novo sozinha; uma exceção no import derrubaria o forkserver.
+"""
+from telemetry.logs import get_logger
+
+logger = get_logger("agent_warmup")
+
+try:
+    from main_agent import load_agent_prompt
+
+    load_agent_prompt()
+except Exception as e:
+    logger.warning("prompt do agente não pré-carregado: %s", e)
@@ -0,0 +1,190 @@
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, FunctionMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from helpers.text import fold_accents
+from telemetry.logs import get_logger
+from telemetry.metrics import REGISTRY
+
+logger = get_logger("model_tiers")
+
+# Papéis: router (planejar/rotear), tool_caller (escolher ferramentas), writer (redigir a
+# resposta a partir do resultado das ferramentas). "auto" decide entre tool_caller e writer
+# pela última mensagem da conversa, que é o caso do AgentExecutor.
+ROLES = ("router", "tool_caller", "writer")
+
+DEFAULT_ROLE_MODELS = {
+    "router": "gpt-4o-mini",
+    "tool_caller": "gpt-4o-mini",
+    "writer": "gpt-4o-mini",
+}
+DEFAULT_LARGE_MODEL = "gpt-4o"
+
+# Preço em US$ por 1M de tokens (entrada, saída), para estimar custo por papel.
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+_UNSURE = re.compile(
+    r"\bnao (sei|tenho certeza|tenho (essa )?informac|consigo (responder|determinar|identificar))"
+)
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    return sum(len(str(m.content)) for m in messages) // 4
+
+
+def looks_unsure(message: AIMessage) -> bool:
+    """Baixa confiança: nada de ferramenta nem texto, ou o modelo admite que não sabe."""
+    if getattr(message, "tool_calls", None) or message.additional_kwargs.get("function_call"):
+        return False
+    content = fold_accents(str(message.content)).lower()
+    return not content.strip() or bool(_UNSURE.search(content))
+
+
+def _usage(message: AIMessage) -> tuple:
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = message.response_metadata.get("token_usage") or {}
+    return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+
+
+class TieredChatModel(BaseChatModel):
+    """
+    Chat model que delega para o modelo do papel e sobe para o modelo grande quando o
+    contexto passa de `max_small_context_tokens` ou a resposta do modelo menor parece
+    insegura. Registra latência, tokens e custo por papel/modelo.
+    """
+
+    role: str = "auto"
+    role_models: Dict[str, Any]
+    large: Any
+    max_small_context_tokens: int = 6000
+    confidence_check: Callable = looks_unsure
+    cache: Any = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "tiered"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools_to_bind=list(tools), tool_kwargs=kwargs)
+
+    def _role_for(self, messages: List[BaseMessage]) -> str:
+        if self.role != "auto":
+            return self.role
+        return "writer" if messages and isinstance(messages[-1], (ToolMessage, FunctionMessage)) else "tool_caller"
+
+    @staticmethod
+    def _with_tools(model, tools_to_bind, tool_kwargs):
+        return model.bind_tools(tools_to_bind, **(tool_kwargs or {})) if tools_to_bind else model
+
+    def _record(self, role: str, model, message: AIMessage, elapsed: float):
+        name = getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__
+        input_tokens, output_tokens = _usage(message)
+        REGISTRY.observe("llm_role_latency", elapsed, role=role, model=name)
+        REGISTRY.increment("llm_role_tokens", input_tokens, role=role, model=name, kind="input")
+        REGISTRY.increment("llm_role_tokens", output_tokens, role=role, model=name, kind="output")
+        prices = MODEL_PRICES.get(name)
+        if prices:
+            cost = (input_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000
+            REGISTRY.increment("llm_role_cost_usd", cost, role=role, model=name)
+
+    def _plan(self, messages: List[BaseMessage]) -> tuple:
+        role = self._role_for(messages)
+        small = self.role_models.get(role, self.large)
+        if small is self.large:
+            return role, self.large, None
+        if estimate_tokens(messages) > self.max_small_context_tokens:
+            return role, self.large, "contexto_longo"
+        return role, small, None
+
+    def _escalate(self, role: str, reason: str):
+        REGISTRY.increment("llm_escalations", role=role, reason=reason)
+        logger.debug("subindo para o modelo grande", extra={"role": role, "reason": reason})
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                  tools_to_bind=None, tool_kwargs=None, **kwargs) -> ChatResult:
+        role, model, reason = self._plan(messages)
+        if reason:
+            self._escalate(role, reason)
+
+        start = time.perf_counter()
+        message = self._with_tools(model, tools_to_bind, tool_kwargs).invoke(messages, stop=stop, **kwargs)
+        self._record(role, model, message, time.perf_counter() - start)
+
+        if model is not self.large and self.confidence_check(message):
+            self._escalate(role, "baixa_confianca")
+            start = time.perf_counter()
+            message = self._with_tools(self.large, tools_to_bind, tool_kwargs).invoke(messages, stop=stop, **kwargs)
+            self._record(role, self.large, message, time.perf_counter() - start)
+
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                         tools_to_bind=None, tool_kwargs=None, **kwargs) -> ChatResult:
+        role, model, reason = self._plan(messages)
+        if reason:
+            self._escalate(role, reason)
+
+        start = time.perf_counter()
+        message = await self._with_tools(model, tools_to_bind, tool_kwargs).ainvoke(messages, stop=stop, **kwargs)
+        self._record(role, model, message, time.perf_counter() - start)
+
+        if model is not self.large and self.confidence_check(message):
+            self._escalate(role, "baixa_confianca")
+            start = time.perf_counter()
+            message = await self._with_tools(self.large, tools_to_bind, tool_kwargs).ainvoke(messages, stop=stop, **kwargs)
+            self._record(role, self.large, message, time.perf_counter() - start)
+
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _default_factory(model_name: str):
+    from langchain_openai import ChatOpenAI
+    from llm_scheduler.coordinator import scheduler_enabled
+    from llm_scheduler.langchain_gate import gate_chat_model
+
+    llm = ChatOpenAI(model=model_name, temperature=0)
+    return gate_chat_model(llm) if scheduler_enabled() else llm
+
+
+class ModelTiers:
+    """
+    Modelos por papel, configuráveis por ambiente (LLM_MODEL_ROUTER, LLM_MODEL_TOOL_CALLER,
+    LLM_MODEL_WRITER, LLM_MODEL_LARGE, LLM_ESCALATE_CONTEXT_TOKENS). Uma instância por
+    nome de modelo é criada pela `factory` e compartilhada entre os papéis.
+    """
+
+    def __init__(self, factory: Optional[Callable] = None, role_models: Optional[dict] = None,
+                 large_model: Optional[str] = None, max_small_context_tokens: Optional[int] = None):
+        self.factory = factory or _default_factory
+        self.role_models = {
+            role: (role_models or {}).get(role) or os.getenv(f"LLM_MODEL_{role.upper()}", default)
+            for role, default in DEFAULT_ROLE_MODELS.items()
+        }
+        self.large_model = large_model or os.getenv("LLM_MODEL_LARGE", DEFAULT_LARGE_MODEL)
+        self.max_small_context_tokens = max_small_context_tokens or int(
+            os.getenv("LLM_ESCALATE_CONTEXT_TOKENS", "6000"))
+        self._instances = {}
+
+    def _instance(self, model_name: str):
+        if model_name not in self._instances:
+            self._instances[model_name] = self.factory(model_name)
+        return self._instances[model_name]
+
+    def chat_model(self, role: str = "auto") -> TieredChatModel:
+        large = self._instance(self.large_model)
+        return TieredChatModel(
+            role=role,
+            role_models={r: self._instance(name) for r, name in self.role_models.items()},
+            large=large,
+            max_small_context_tokens=self.max_small_context_tokens,
+        )
@@ -0,0 +1,46 @@
+import time
+
+from telemetry.logs import get_logger
+from telemetry.metrics import REGISTRY
+
+logger = get_logger("presence")
+
+
+class PresenceMonitor:
+    """
+    Acompanha quem está online na tabela ActiveUsers (alimentada pelas rotas api/presence
+    do WebInterface). A cada `poll()` consulta só a assinatura do conjunto ativo; a lista
+    completa é buscada apenas quando a assinatura muda, ou a cada `full_sync_interval`
+    segundos como garantia. Retorna os logins e logouts desde a última chamada.
+    """
+
+    def __init__(self, fetcher, full_sync_interval: float = 60.0):
+        self.fetcher = fetcher
+        self.full_sync_interval = full_sync_interval
+        self.active = set()
+        self._signature = None
+        self._last_full_sync = 0.0
+
+    def poll(self) -> tuple:
+        now = time.monotonic()
+        signature = self.fetcher.presence_signature()
+        if signature is None:
+            return set(), set()
+        if signature == self._signature and now - self._last_full_sync < self.full_sync_interval:
+            return set(), set()
+
+        user_ids = self.fetcher.get_user_ids()
+        if user_ids is None:
+            return set(), set()
+
+        current = set(user_ids)
+        logins, logouts = current - self.active, self.active - current
+        self.active = current
+        self._signature = signature
+        self._last_full_sync = now
+
+        if logins or logouts:
+            REGISTRY.increment("presence_events", amount=len(logins), kind="login")
+            REGISTRY.increment("presence_events", amount=len(logouts), kind="logout")
+            logger.info("presença alterada", extra={"logins": sorted(logins), "logouts": sorted(logouts)})
+        return logins, logouts
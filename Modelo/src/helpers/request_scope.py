@@ -0,0 +1,136 @@
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from telemetry.logs import get_logger
+from telemetry.metrics import REGISTRY
+
+logger = get_logger("request_scope")
+
+_current_scope = ContextVar("request_scope", default=None)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _prefetch_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=int(os.getenv("PREFETCH_WORKERS", "4")),
+                                           thread_name_prefix="prefetch")
+        return _executor
+
+
+class RequestScope:
+    """
+    Estado de uma única resposta (da mensagem tirada da caixa até a resposta final).
+    Guarda as consultas disparadas especulativamente antes do agente pedir por elas; as
+    ferramentas consomem o resultado pela mesma chave e o que sobrar é cancelado em close().
+    Também memoiza as chamadas de ferramenta da resposta (ver memoize).
+    """
+
+    def __init__(self):
+        self._prefetched = {}
+        self._memo = {}
+        self.duplicate_calls = {}
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def prefetch(self, key: tuple, func: Callable, *args, **kwargs):
+        with self._lock:
+            if self.closed or key in self._prefetched:
+                return
+            entry = {"started": time.perf_counter(), "finished": None}
+
+            def run():
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    entry["finished"] = time.perf_counter()
+
+            entry["future"] = _prefetch_executor().submit(run)
+            self._prefetched[key] = entry
+
+    def take(self, key: tuple):
+        """Retorna (True, resultado) se a consulta foi antecipada e deu certo; senão (False, None)."""
+        with self._lock:
+            entry = self._prefetched.pop(key, None)
+        if entry is None:
+            return False, None
+
+        requested = time.perf_counter()
+        try:
+            result = entry["future"].result()
+        except Exception as e:
+            logger.warning("consulta antecipada falhou, executando de novo: %s", e)
+            REGISTRY.increment("prefetch", result="failed", tool=key[0])
+            return False, None
+
+        finished = entry["finished"] or time.perf_counter()
+        # Tempo da consulta que ficou escondido atrás do turno do LLM.
+        saved = min(finished, requested) - entry["started"]
+        REGISTRY.increment("prefetch", result="hit", tool=key[0])
+        REGISTRY.observe("prefetch_saved_seconds", max(saved, 0.0), tool=key[0])
+        return True, result
+
+    def memoize(self, key: tuple, func: Callable):
+        """
+        Executa `func` uma vez por chave nesta resposta (single-flight: chamadas simultâneas
+        com a mesma chave esperam a primeira). Retorna (resultado, repetida).
+        """
+        with self._lock:
+            future = self._memo.get(key)
+            owner = future is None
+            if owner:
+                future = self._memo[key] = Future()
+            else:
+                self.duplicate_calls[key[0]] = self.duplicate_calls.get(key[0], 0) + 1
+        if not owner:
+            return future.result(), True
+
+        try:
+            result = func()
+        except BaseException as e:
+            with self._lock:
+                self._memo.pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result, False
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            unused, self._prefetched = self._prefetched, {}
+        for key, entry in unused.items():
+            entry["future"].cancel()
+            REGISTRY.increment("prefetch", result="unused", tool=key[0])
+
+
+def current_scope() -> Optional[RequestScope]:
+    return _current_scope.get()
+
+
+@contextmanager
+def activate(scope: RequestScope):
+    """Torna `scope` visível às ferramentas; asyncio.to_thread copia o contexto para a thread."""
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def prefetched(key: tuple, func: Callable, *args, **kwargs):
+    """Usa o resultado antecipado para `key`, se houver; senão executa `func` normalmente."""
+    scope = current_scope()
+    if scope is not None:
+        hit, result = scope.take(key)
+        if hit:
+            return result
+    return func(*args, **kwargs)
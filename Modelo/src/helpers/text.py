@@ -0,0 +1,46 @@
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+_PUNCTUATION = re.compile(r"[^\w\s/.-]")
+
+
+def fold_accents(text: str) -> str:
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in normalized if not unicodedata.combining(ch))
+
+
+def normalize_question(text: str) -> str:
+    """Normaliza uma pergunta para comparação: caixa, acentos, pontuação e espaços."""
+    if not text:
+        return ""
+    text = fold_accents(text.lower())
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+# "os" fica de fora: aqui costuma ser OS (ordem de serviço), termo central da consulta.
+PORTUGUESE_STOPWORDS = {
+    "a", "o", "as", "um", "uma", "uns", "umas",
+    "de", "do", "da", "dos", "das", "em", "no", "na", "nos", "nas",
+    "por", "com", "para", "pra", "e", "ou", "que", "qual", "quais", "ao", "aos",
+    "se", "sobre", "como", "sao", "ser", "tem", "ha", "me", "meu", "minha",
+    "sua", "seu", "este", "esta", "esse", "essa", "isso", "isto",
+    "quero", "saber", "preciso", "informacoes", "informacao",
+}
+
+
+def _light_stem(token: str) -> str:
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def normalize_query(text: str) -> str:
+    """
+    Forma canônica de uma consulta de busca: sem acentos, minúscula, sem stopwords,
+    plural simples removido e termos ordenados ("EPIs aguarrás" == "aguarras epi").
+    """
+    tokens = normalize_question(text).split()
+    terms = {_light_stem(t) for t in tokens if t not in PORTUGUESE_STOPWORDS}
+    return " ".join(sorted(terms))
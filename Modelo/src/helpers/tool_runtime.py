@@ -0,0 +1,105 @@
+import json
+import asyncio
+import threading
+from typing import Optional
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from helpers.request_scope import current_scope
+from helpers.text import normalize_question
+from telemetry.metrics import REGISTRY
+
+DEFAULT_TOOL_TIMEOUT = 30.0
+
+REPEATED_CALL_HINT = (
+    "[Resultado reaproveitado: esta ferramenta já foi chamada com argumentos equivalentes "
+    "nesta resposta. Não repita a chamada; use o resultado acima.]"
+)
+
+
+def _argument_key(kwargs: dict, normalizers: dict) -> tuple:
+    key = []
+    for name, value in sorted(kwargs.items()):
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = normalizers.get(name, normalize_question)(value)
+        else:
+            value = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+        key.append((name, value))
+    return tuple(key)
+
+
+def memoized(base_tool: BaseTool, normalizers: Optional[dict] = None) -> StructuredTool:
+    """
+    Memoiza a ferramenta dentro da resposta atual (RequestScope ativo), pela chave dos
+    argumentos normalizados: strings sem caixa/acento/pontuação por padrão, ou pelo
+    normalizador do argumento em `normalizers` (ex.: normalize_query para consultas).
+    Uma repetição devolve o mesmo resultado com um aviso para o modelo não insistir.
+    """
+    func = base_tool.func
+    normalizers = normalizers or {}
+
+    def _run_memoized(**kwargs):
+        scope = current_scope()
+        if scope is None:
+            return func(**kwargs)
+        key = (base_tool.name, _argument_key(kwargs, normalizers))
+        result, repeated = scope.memoize(key, lambda: func(**kwargs))
+        if not repeated:
+            return result
+        REGISTRY.increment("tool_duplicate_calls", tool=base_tool.name)
+        return f"{result}\n\n{REPEATED_CALL_HINT}"
+
+    return StructuredTool(
+        name=base_tool.name,
+        description=base_tool.description,
+        args_schema=base_tool.args_schema,
+        func=_run_memoized,
+    )
+
+
+def with_timeout(base_tool: BaseTool, timeout: float = DEFAULT_TOOL_TIMEOUT) -> StructuredTool:
+    """
+    Cria uma variante assíncrona da ferramenta: a função síncrona roda em uma thread
+    (pyodbc e requests bloqueiam) e a chamada é limitada por `timeout` segundos.
+    O AgentExecutor executa em paralelo as chamadas de um mesmo turno quando usado via ainvoke.
+    """
+    func = base_tool.func
+
+    async def _run_offloaded(**kwargs):
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(func, **kwargs), timeout=timeout)
+        except asyncio.TimeoutError:
+            return (f"A ferramenta '{base_tool.name}' excedeu o tempo limite de {timeout:.0f}s. "
+                    "Informe ao usuário que a fonte de dados não respondeu a tempo.")
+
+    return StructuredTool(
+        name=base_tool.name,
+        description=base_tool.description,
+        args_schema=base_tool.args_schema,
+        func=func,
+        coroutine=_run_offloaded,
+    )
+
+
+async def run_cancellable(coro, cancel_event: Optional[threading.Event], poll_interval: float = 0.1):
+    """
+    Executa `coro` até terminar ou até `cancel_event` ser sinalizado por outra thread.
+    Retorna None quando a execução foi cancelada.
+    """
+    task = asyncio.ensure_future(coro)
+    if cancel_event is None:
+        return await task
+
+    while not task.done():
+        if cancel_event.is_set():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            return None
+        await asyncio.wait({task}, timeout=poll_interval)
+
+    return task.result()
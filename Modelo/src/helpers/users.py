@@ -2,6 +2,10 @@ import os
 import pyodbc
 from dotenv import load_dotenv
 
+from telemetry.logs import get_logger
+
+logger = get_logger("users")
+
 class SqlServerUserFetcher:
     def __init__(self):
         load_dotenv()
@@ -13,6 +17,10 @@ class SqlServerUserFetcher:
         self.table_name = "ActiveUsers"
         self.email_column = "UserEmail"
         self.active_column = "Active"
+        self.last_active_column = "LastActive"
+        # Sessões sem heartbeat (a cada 30 s, ver api/presence) há mais que isso contam como
+        # inativas, mesmo que o logout do navegador não tenha chegado. 0 desliga o corte.
+        self.stale_after_seconds = int(os.getenv("PRESENCE_STALE_SECONDS", "120"))
         self.driver = "{ODBC Driver 17 for SQL Server}"
 
     def _get_connection(self):
@@ -27,17 +35,45 @@ class SqlServerUserFetcher:
         
         return pyodbc.connect(conn_str)
 
+    def _active_filter(self) -> str:
+        condition = f"{self.active_column} = 1"
+        if self.stale_after_seconds > 0:
+            # O mssql do Next grava LastActive em UTC.
+            condition += (f" AND {self.last_active_column} >= "
+                          f"DATEADD(SECOND, -{self.stale_after_seconds}, GETUTCDATE())")
+        return condition
+
     def get_user_ids(self) -> list:
-        query = f"SELECT DISTINCT {self.email_column}, {self.active_column} FROM {self.table_name}"
-        ids = []
+        """
+        Usuários ativos; o filtro roda no banco em vez de trazer a tabela inteira.
+        Retorna None se o banco não respondeu, para não confundir falha com "ninguém online".
+        """
+        query = f"SELECT DISTINCT {self.email_column} FROM {self.table_name} WHERE {self._active_filter()}"
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query)
+                return [row[0] for row in cursor.fetchall()]
+        except pyodbc.Error as e:
+            logger.error("erro ao acessar o banco: %s", e)
+            return None
+
+    def presence_signature(self):
+        """
+        Assinatura barata do conjunto de usuários ativos (quantidade + checksum dos e-mails).
+        Só muda em login/logout; os heartbeats, que atualizam LastActive, não a alteram.
+        Retorna None se o banco não respondeu.
+        """
+        query = (f"SELECT COUNT(*), CHECKSUM_AGG(CHECKSUM({self.email_column})) "
+                 f"FROM {self.table_name} WHERE {self._active_filter()}")
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(query)
-                ids = [row[0] for row in cursor.fetchall() if row[1] == 1]
+                return tuple(cursor.fetchone())
         except pyodbc.Error as e:
-            print(f"Erro ao acessar o banco: {e}")
-        return ids
+            logger.error("erro ao acessar o banco: %s", e)
+            return None
 
 if __name__ == "__main__":
     fetcher = SqlServerUserFetcher()
@@ -0,0 +1,198 @@
+import re
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Callable, Optional
+
+from helpers.text import fold_accents, normalize_question
+from telemetry.logs import get_logger
+from telemetry.metrics import REGISTRY
+
+logger = get_logger("fast_path")
+
+_MACHINE = r"(?P<machine>[a-z0-9][a-z0-9 /.-]*?)"
+_ARTICLE = r"(?:o |a |os |as )?"
+
+# Regras aplicadas sobre normalize_question (minúsculas, sem acento, sem pontuação final).
+# A ordem importa: produto antes de máquina, porque "status do produto do tear 5" também
+# casaria com a regra genérica de status.
+INTENT_RULES = [
+    ("product_status", [
+        rf"^(?:qual (?:e )?o )?(?:status do )?produto (?:atual )?(?:do |da |no |na |em ){_MACHINE}$",
+        rf"^o que {_ARTICLE}{_MACHINE} (?:esta )?produzindo(?: agora)?$",
+        rf"^o que (?:esta )?(?:sendo )?produzido (?:no |na |em ){_MACHINE}$",
+    ]),
+    ("machine_status", [
+        rf"^(?:qual (?:e )?o )?status (?:atual )?(?:do |da |de )?(?:maquina |equipamento )?{_MACHINE}(?: agora)?$",
+        rf"^como (?:esta|estao|anda) {_ARTICLE}{_MACHINE}(?: agora| hoje)?$",
+    ]),
+    ("open_orders", [
+        rf"^(?:quais (?:sao )?)?(?:as |os )?(?:ordens(?: de servico)?|os|chamados) "
+        rf"(?:abert[oa]s|em aberto|pendentes) (?:do |da |de |no |na |para (?:o |a )?){_MACHINE}$",
+    ]),
+]
+_COMPILED_RULES = [(intent, [re.compile(p) for p in patterns]) for intent, patterns in INTENT_RULES]
+
+OPEN_ORDER_STATUSES = ("New Request", "In Progress")
+
+
+def match_intent(text: str) -> Optional[tuple]:
+    """Retorna (intenção, nome citado da máquina) se alguma regra casar, senão None."""
+    normalized = normalize_question(text)
+    for intent, patterns in _COMPILED_RULES:
+        for pattern in patterns:
+            found = pattern.match(normalized)
+            if found:
+                return intent, found.group("machine").strip()
+    return None
+
+
+def machine_alias(text: str) -> str:
+    """'Tear 05' -> 'tear5', 'CLT-2' -> 'clt2': sem acento, só letras e números, sem zeros à esquerda."""
+    text = re.sub(r"[^a-z0-9]", "", fold_accents(text).lower())
+    return re.sub(r"\d+", lambda m: str(int(m.group())), text)
+
+
+class MachineResolver:
+    """
+    Resolve o nome citado pelo usuário para o nome canônico por apelidos exatos: cada
+    parte do nome ("Tear05 / HF324" -> "tear5", "hf324"), a parte sem a marca
+    ("Texo HF 324" -> "hf324") e a primeira palavra ("Dilo PMA 82" -> "dilo"). Apelidos só
+    numéricos ou que apontam para mais de uma máquina são descartados: na dúvida, a
+    pergunta vai para o agente.
+    """
+
+    def __init__(self, names):
+        candidates = {}
+        for name in names:
+            for part in re.split(r"\s+[/-]\s+", name):
+                words = part.split()
+                if not words:
+                    continue
+                for alias in {machine_alias(part), machine_alias(" ".join(words[1:])), machine_alias(words[0])}:
+                    if re.search(r"[a-z]", alias):
+                        candidates.setdefault(alias, set()).add(name)
+        self.aliases = {alias: next(iter(found)) for alias, found in candidates.items() if len(found) == 1}
+
+    def resolve(self, text: str) -> Optional[str]:
+        return self.aliases.get(machine_alias(text))
+
+    def find_in(self, text: str, max_words: int = 3) -> list:
+        """Máquinas citadas em texto livre: janelas de até `max_words` palavras, na ordem em que aparecem."""
+        words = normalize_question(text).split()
+        found = []
+        for start in range(len(words)):
+            for size in range(max_words, 0, -1):
+                machine = self.aliases.get(machine_alias(" ".join(words[start:start + size])))
+                if machine and machine not in found:
+                    found.append(machine)
+                    break
+        return found
+
+
+def _field_lines(data: dict) -> str:
+    return "\n".join(
+        f"- {str(key).replace('_', ' ').capitalize()}: {value}"
+        for key, value in data.items()
+        if value not in (None, "")
+    )
+
+
+class IntentRouter:
+    """
+    Atalho antes do agente para perguntas de status com formato conhecido. Reconhece a
+    intenção por regras locais, resolve a máquina sem fuzzy, chama a função da ferramenta
+    direto e responde por template, sem nenhuma chamada ao LLM. Qualquer dúvida (máquina
+    não resolvida, ferramenta sem JSON, erro) retorna None e a pergunta segue para o agente.
+    """
+
+    def __init__(self, machine_status: Callable, product_status: Callable, service_orders: Callable,
+                 status_machines, order_machines):
+        self.handlers = {
+            "machine_status": self._machine_status,
+            "product_status": self._product_status,
+            "open_orders": self._open_orders,
+        }
+        self.machine_status = machine_status
+        self.product_status = product_status
+        self.service_orders = service_orders
+        self.status_resolver = MachineResolver(status_machines)
+        self.order_resolver = MachineResolver(order_machines)
+        self.hits = 0
+        self.misses = 0
+
+    def match(self, text: str) -> Optional[tuple]:
+        """Retorna (intenção, nome citado da máquina) ou None."""
+        return match_intent(text)
+
+    @staticmethod
+    def _parse(result: str) -> Optional[dict]:
+        try:
+            data = json.loads(result)
+        except (TypeError, ValueError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _machine_status(self, mention: str, user_input: str) -> Optional[str]:
+        machine = self.status_resolver.resolve(mention)
+        if machine is None:
+            return None
+        data = self._parse(self.machine_status(machine))
+        if data is None:
+            return None
+        return f"Status atual de {machine}:\n{_field_lines(data)}"
+
+    def _product_status(self, mention: str, user_input: str) -> Optional[str]:
+        machine = self.status_resolver.resolve(mention)
+        if machine is None:
+            return None
+        data = self._parse(self.product_status(machine))
+        if data is None:
+            return None
+        return f"Produto atual em {machine}:\n{_field_lines(data)}"
+
+    def _open_orders(self, mention: str, user_input: str) -> Optional[str]:
+        machine = self.order_resolver.resolve(mention)
+        if machine is None:
+            return None
+        # As threads do pool não herdam o contexto; cada consulta leva uma cópia dele para
+        # enxergar o RequestScope da mensagem (e usar as consultas antecipadas).
+        contexts = [copy_context() for _ in OPEN_ORDER_STATUSES]
+        with ThreadPoolExecutor(max_workers=len(OPEN_ORDER_STATUSES)) as pool:
+            results = list(pool.map(
+                lambda context, status: context.run(
+                    self.service_orders, user_input=user_input, equipment_name=machine, status=status),
+                contexts, OPEN_ORDER_STATUSES,
+            ))
+        found = [r for r in results if r and r.strip() != "Nenhuma ordem encontrada"]
+        if not found:
+            return f"Não há ordens de serviço abertas para {machine} no último mês."
+        return f"Ordens de serviço abertas de {machine} (último mês):\n" + "\n".join(found)
+
+    def answer(self, user_input: str) -> Optional[str]:
+        start = time.perf_counter()
+        matched = self.match(user_input)
+        answer = None
+        if matched:
+            intent, mention = matched
+            try:
+                answer = self.handlers[intent](mention, user_input)
+            except Exception as e:
+                logger.warning("atalho de intenção falhou, seguindo para o agente: %s", e)
+
+        if answer is None:
+            self.misses += 1
+            REGISTRY.increment("fast_path", result="miss", intent=matched[0] if matched else "nenhuma")
+            return None
+
+        self.hits += 1
+        REGISTRY.increment("fast_path", result="hit", intent=matched[0])
+        REGISTRY.observe("answer_latency", time.perf_counter() - start, path="fast_path")
+        logger.info("respondido pelo atalho de intenção", extra={"intent": matched[0]})
+        return answer
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0}
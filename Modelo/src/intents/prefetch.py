@@ -0,0 +1,57 @@
+from typing import Callable
+
+from helpers.request_scope import RequestScope
+from intents.fast_path import MachineResolver, OPEN_ORDER_STATUSES, match_intent
+from telemetry.logs import get_logger
+
+logger = get_logger("prefetch")
+
+
+class ToolPrefetcher:
+    """
+    Antecipa, enquanto o LLM pensa, as consultas que o agente provavelmente vai pedir. As
+    consultas começam em segundo plano no RequestScope da mensagem, com as mesmas chaves
+    que as ferramentas pedem (máquina canônica + status), e quem pedir primeiro usa o resultado.
+
+    - Mensagem que o atalho de intenção (intents.fast_path) vai responder sozinho não dispara
+      nada: o atalho consulta na hora e não há turno do LLM para esconder a latência.
+    - Nas que vão para o agente, o status ao vivo (consulta SQL barata) das máquinas citadas
+      é antecipado, até `max_machines` por mensagem.
+    - A busca de ordens no Dude é cara e uma consulta em andamento não pode ser cancelada:
+      só é antecipada quando a mensagem casa com a regra de ordens abertas (com o atalho
+      desligado, FAST_PATH=off).
+    """
+
+    def __init__(self, machine_status: Callable, service_orders: Callable, status_machines, order_machines,
+                 fast_path: bool = True, max_machines: int = 2):
+        self.machine_status = machine_status
+        self.service_orders = service_orders
+        self.status_resolver = MachineResolver(status_machines)
+        self.order_resolver = MachineResolver(order_machines)
+        self.fast_path = fast_path
+        self.max_machines = max_machines
+
+    def _resolver(self, intent: str) -> MachineResolver:
+        return self.order_resolver if intent == "open_orders" else self.status_resolver
+
+    def start(self, user_message: str) -> RequestScope:
+        scope = RequestScope()
+        matched = match_intent(user_message)
+        if matched is not None and self.fast_path and self._resolver(matched[0]).resolve(matched[1]):
+            return scope
+
+        machines = self.status_resolver.find_in(user_message)[:self.max_machines]
+        for machine in machines:
+            scope.prefetch(("machine_status", machine), self.machine_status, machine)
+
+        order_machine = None
+        if matched is not None and matched[0] == "open_orders":
+            order_machine = self.order_resolver.resolve(matched[1])
+            if order_machine:
+                for status in OPEN_ORDER_STATUSES:
+                    scope.prefetch(("service_orders", order_machine, status, None),
+                                   self.service_orders, user_message, order_machine, status, None)
+
+        if machines or order_machine:
+            logger.debug("consultas antecipadas", extra={"machines": machines, "orders": order_machine})
+        return scope
@@ -0,0 +1,164 @@
+import os
+import time
+import threading
+from multiprocessing import current_process
+from multiprocessing.connection import Listener, Client
+from dotenv import load_dotenv
+
+from llm_scheduler.fair_scheduler import FairScheduler
+from telemetry.logs import get_logger
+
+load_dotenv()
+
+logger = get_logger("llm_scheduler")
+
+
+def scheduler_enabled() -> bool:
+    return os.getenv("LLM_SCHEDULER", "on").lower() != "off"
+
+
+def _address_from_env():
+    host, _, port = os.getenv("LLM_COORDINATOR_ADDRESS", "127.0.0.1:6001").rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _authkey_from_env() -> bytes:
+    return os.getenv("LLM_COORDINATOR_AUTHKEY", "andritz-llm").encode("utf-8")
+
+
+def scheduler_from_env() -> FairScheduler:
+    return FairScheduler(
+        requests_per_minute=float(os.getenv("LLM_RPM", "500")),
+        tokens_per_minute=float(os.getenv("LLM_TPM", "30000")),
+    )
+
+
+def _serve_connection(conn, scheduler: FairScheduler):
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            kind = message[0]
+            if kind == "acquire":
+                _, client_id, priority, tokens = message
+                conn.send(("granted", scheduler.acquire(client_id, priority, tokens)))
+            elif kind == "usage":
+                scheduler.report_usage(message[1])
+            elif kind == "throttled":
+                scheduler.report_throttled(message[1])
+            elif kind == "stats":
+                conn.send(scheduler.stats())
+
+
+def serve_coordinator(scheduler: FairScheduler = None, address=None, authkey: bytes = None):
+    """
+    Sobe o coordenador do nó numa thread daemon (chamado pelo supervisor do main.py).
+    Cada processo de chat mantém uma conexão e pede liberação antes de cada chamada ao LLM.
+    Retorna o Listener, ou None se o endereço já está em uso (outro coordenador ativo).
+    """
+    scheduler = scheduler or scheduler_from_env()
+    try:
+        listener = Listener(address or _address_from_env(), authkey=authkey or _authkey_from_env())
+    except OSError as e:
+        logger.warning("coordenador de LLM não iniciado: %s", e)
+        return None
+
+    def accept_loop():
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError:
+                return
+            except Exception as e:
+                logger.warning("conexão recusada pelo coordenador de LLM: %s", e)
+                continue
+            threading.Thread(target=_serve_connection, args=(conn, scheduler), daemon=True).start()
+
+    threading.Thread(target=accept_loop, name="llm-coordinator", daemon=True).start()
+    logger.info("coordenador de LLM ativo", extra={"address": str(listener.address)})
+    return listener
+
+
+class SchedulerClient:
+    """
+    Lado do processo de chat. Fala com o coordenador; se ele não estiver no ar, usa um
+    FairScheduler local (limites por processo, como era antes) e tenta reconectar depois.
+    """
+
+    RECONNECT_INTERVAL = 30.0
+
+    def __init__(self, client_id: str = None, address=None, authkey: bytes = None,
+                 estimated_tokens: float = None):
+        self.client_id = client_id or current_process().name
+        self.address = address or _address_from_env()
+        self.authkey = authkey or _authkey_from_env()
+        self.estimated_tokens = estimated_tokens or float(os.getenv("LLM_ESTIMATED_TOKENS", "1500"))
+        self._conn = None
+        self._next_connect = 0.0
+        self._local = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None and time.monotonic() >= self._next_connect:
+            try:
+                self._conn = Client(self.address, authkey=self.authkey)
+            except (OSError, EOFError) as e:
+                self._next_connect = time.monotonic() + self.RECONNECT_INTERVAL
+                logger.warning("coordenador de LLM indisponível, usando limites locais: %s", e)
+        return self._conn
+
+    def _local_scheduler(self) -> FairScheduler:
+        if self._local is None:
+            self._local = scheduler_from_env()
+        return self._local
+
+    def _call(self, message, expect_reply: bool):
+        with self._lock:
+            conn = self._connection()
+            if conn is not None:
+                try:
+                    conn.send(message)
+                    return conn.recv() if expect_reply else None
+                except (OSError, EOFError):
+                    self._conn = None
+                    self._next_connect = time.monotonic() + self.RECONNECT_INTERVAL
+        return self._fallback(message)
+
+    def _fallback(self, message):
+        local = self._local_scheduler()
+        kind = message[0]
+        if kind == "acquire":
+            return ("granted", local.acquire(*message[1:]))
+        if kind == "usage":
+            local.report_usage(message[1])
+        elif kind == "throttled":
+            local.report_throttled(message[1])
+        elif kind == "stats":
+            return local.stats()
+        return None
+
+    def acquire(self, priority: str = "interactive", tokens: float = None) -> float:
+        _, waited = self._call(("acquire", self.client_id, priority, tokens or self.estimated_tokens), True)
+        return waited
+
+    def report_usage(self, actual_tokens: float, estimated_tokens: float = None):
+        delta = actual_tokens - (estimated_tokens or self.estimated_tokens)
+        self._call(("usage", delta), False)
+
+    def report_throttled(self, retry_after: float = None):
+        self._call(("throttled", retry_after), False)
+
+    def stats(self) -> dict:
+        return self._call(("stats",), True)
+
+
+_default_client = None
+
+
+def default_client() -> SchedulerClient:
+    global _default_client
+    if _default_client is None:
+        _default_client = SchedulerClient()
+    return _default_client
@@ -0,0 +1,149 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Callable
+
+from telemetry.metrics import REGISTRY
+
+# Classes de prioridade: chats interativos sempre passam na frente de tarefas de fundo
+# (ex.: embeddings do RAGIndexer).
+PRIORITIES = {"interactive": 0, "background": 1}
+
+
+class TokenBucket:
+    """Balde que se recarrega continuamente até `per_minute` unidades por minuto."""
+
+    def __init__(self, per_minute: float, now: float = None):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float, now: float):
+        """Corrige o saldo com o uso real (delta positivo = gastou mais que o estimado)."""
+        self._refill(now)
+        self.level = min(self.capacity, self.level - delta)
+
+
+class _Request:
+    __slots__ = ("client_id", "rank", "tokens", "enqueued")
+
+    def __init__(self, client_id: str, rank: int, tokens: float, enqueued: float):
+        self.client_id = client_id
+        self.rank = rank
+        self.tokens = tokens
+        self.enqueued = enqueued
+
+
+class FairScheduler:
+    """
+    Libera chamadas ao LLM respeitando requisições/min e tokens/min do nó inteiro.
+    A ordem é: prioridade primeiro; dentro da mesma prioridade, rodízio entre clientes
+    (um pedido de cada usuário por vez), então um usuário com muitas chamadas não atrasa
+    os outros. Um 429 da OpenAI pausa todas as liberações com backoff exponencial.
+
+    `clock` (padrão time.monotonic) pode ser trocado por um relógio falso nos testes.
+    """
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 30000,
+                 max_backoff: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.requests = TokenBucket(requests_per_minute, clock())
+        self.tokens = TokenBucket(tokens_per_minute, clock())
+        self.max_backoff = max_backoff
+        self.paused_until = 0.0
+        self.strikes = 0
+        self.queues = {rank: OrderedDict() for rank in sorted(PRIORITIES.values())}
+        self._cond = threading.Condition()
+
+    def _head(self):
+        for queue in self.queues.values():
+            if queue:
+                return queue[next(iter(queue))][0]
+        return None
+
+    def _dequeue(self, request: _Request):
+        queue = self.queues[request.rank]
+        pending = queue[request.client_id]
+        pending.popleft()
+        if pending:
+            queue.move_to_end(request.client_id)
+        else:
+            del queue[request.client_id]
+
+    def _publish_depth(self):
+        for name, rank in PRIORITIES.items():
+            depth = sum(len(pending) for pending in self.queues[rank].values())
+            REGISTRY.set_gauge("llm_queue_depth", depth, priority=name)
+
+    def _wait_time(self, request: _Request, now: float) -> float:
+        return max(
+            self.paused_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(request.tokens, now),
+        )
+
+    def acquire(self, client_id: str, priority: str = "interactive", tokens: float = 1000) -> float:
+        """Bloqueia até a chamada poder sair. Retorna o tempo de espera em segundos."""
+        request = _Request(client_id, PRIORITIES.get(priority, PRIORITIES["interactive"]), tokens, self.clock())
+        with self._cond:
+            self.queues[request.rank].setdefault(client_id, deque()).append(request)
+            self._publish_depth()
+            while True:
+                now = self.clock()
+                if self._head() is request:
+                    wait = self._wait_time(request, now)
+                    if wait <= 0:
+                        self.requests.take(1, now)
+                        self.tokens.take(request.tokens, now)
+                        self._dequeue(request)
+                        self._publish_depth()
+                        self._cond.notify_all()
+                        break
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait(1.0)
+
+        waited = self.clock() - request.enqueued
+        REGISTRY.observe("llm_queue_wait", waited, priority=priority)
+        return waited
+
+    def report_usage(self, delta_tokens: float):
+        with self._cond:
+            self.tokens.adjust(delta_tokens, self.clock())
+            self.strikes = 0
+            # Uma estimativa maior que o uso real devolve tokens: o primeiro da fila pode sair antes.
+            self._cond.notify_all()
+
+    def report_throttled(self, retry_after: float = None):
+        with self._cond:
+            self.strikes += 1
+            pause = retry_after if retry_after else min(self.max_backoff, 2 ** self.strikes)
+            self.paused_until = max(self.paused_until, self.clock() + pause)
+            REGISTRY.increment("llm_throttled")
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queue_depth": {name: sum(len(p) for p in self.queues[rank].values())
+                                for name, rank in PRIORITIES.items()},
+                "paused_for": round(max(0.0, self.paused_until - self.clock()), 3),
+                "requests_available": round(self.requests.level, 1),
+                "tokens_available": round(self.tokens.level, 1),
+            }
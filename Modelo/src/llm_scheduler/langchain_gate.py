@@ -0,0 +1,96 @@
+import asyncio
+from typing import List
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from llm_scheduler.coordinator import SchedulerClient, default_client
+
+
+def _retry_after(error) -> float:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit_error(error) -> bool:
+    return type(error).__name__ == "RateLimitError" or getattr(error, "status_code", None) == 429
+
+
+class SchedulerRateLimiter(BaseRateLimiter):
+    """
+    Plugado no `rate_limiter` do chat model: o LangChain chama acquire só depois de
+    consultar o cache de LLM, então respostas em cache não consomem a cota do nó.
+    """
+
+    def __init__(self, client: SchedulerClient = None, priority: str = "interactive"):
+        self.client = client or default_client()
+        self.priority = priority
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        self.client.acquire(self.priority)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        await asyncio.to_thread(self.client.acquire, self.priority)
+        return True
+
+
+class SchedulerUsageHandler(BaseCallbackHandler):
+    """Informa ao coordenador os tokens realmente gastos e os 429 recebidos."""
+
+    def __init__(self, client: SchedulerClient = None):
+        self.client = client or default_client()
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("total_tokens"):
+            self.client.report_usage(usage["total_tokens"])
+
+    def on_llm_error(self, error, **kwargs):
+        if is_rate_limit_error(error):
+            self.client.report_throttled(_retry_after(error))
+
+
+def gate_chat_model(llm, client: SchedulerClient = None, priority: str = "interactive"):
+    """Faz todas as chamadas deste chat model passarem pelo agendador do nó."""
+    client = client or default_client()
+    llm.rate_limiter = SchedulerRateLimiter(client, priority)
+    llm.callbacks = list(llm.callbacks or []) + [SchedulerUsageHandler(client)]
+    return llm
+
+
+class GatedEmbeddings(Embeddings):
+    """Embeddings em lotes liberados pelo agendador, por padrão com prioridade de fundo."""
+
+    def __init__(self, base_embedder: Embeddings, client: SchedulerClient = None,
+                 priority: str = "background", batch_size: int = 256):
+        self.base_embedder = base_embedder
+        self.client = client or default_client()
+        self.priority = priority
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _estimate_tokens(texts: List[str]) -> int:
+        return sum(len(t) for t in texts) // 4 + 1
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            self.client.acquire(self.priority, self._estimate_tokens(batch))
+            try:
+                vectors.extend(self.base_embedder.embed_documents(batch))
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    self.client.report_throttled(_retry_after(e))
+                raise
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        self.client.acquire(self.priority, self._estimate_tokens([text]))
+        return self.base_embedder.embed_query(text)
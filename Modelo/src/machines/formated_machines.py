@@ -16,7 +16,7 @@ formated_machines = [
     "Dilo PMA 82",
     "Hechtenberg",
     "Sixmeter",
-    "NLI"
+    "NLI",
     "CLT-1",
     "CLT-2",
     "Torre de Resfriamento",
@@ -0,0 +1,254 @@
+import os
+import re
+import json
+import time
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from telemetry.logs import get_logger
+from telemetry.metrics import REGISTRY
+
+load_dotenv()
+
+logger = get_logger("status_history")
+
+DEFAULT_HISTORY_DIR = os.getenv(
+    "STATUS_HISTORY_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "..", "status_history"),
+)
+
+# Um registro por mudança de estado: instante (epoch) e código do estado (ver states.json).
+RECORD_DTYPE = np.dtype([("ts", "<f8"), ("code", "<i4")])
+# Os dois primeiros registros do arquivo são cabeçalho: total já gravado e última amostra.
+HEADER_RECORDS = 2
+STATES_FILE = "states.json"
+
+DEFAULT_RUNNING_STATES = "running,rodando,produzindo,em producao,em operacao,operando,ligada,ligado,on,1,true"
+
+
+def running_states_from_env() -> set:
+    return {s.strip().lower() for s in os.getenv("STATUS_HISTORY_RUNNING_STATES", DEFAULT_RUNNING_STATES).split(",")}
+
+
+def series_key(machine: str) -> str:
+    """Nome da máquina como aparece no arquivo da série ('Tear05 / HF324' -> 'Tear05_HF324')."""
+    return re.sub(r"[^A-Za-z0-9]+", "_", machine).strip("_")
+
+
+def _series_file(kind: str, machine: str) -> str:
+    return f"{kind}__{series_key(machine)}.bin"
+
+
+class StatusHistoryStore:
+    """
+    Histórico de estado por máquina em anéis de tamanho fixo: um arquivo numpy memmap por
+    série ("machine"/"product" x máquina) com `capacity` registros, gravando só mudanças.
+    Disco e memória por série ficam em capacity x 12 bytes (STATUS_HISTORY_CAPACITY); quando
+    o anel enche, as mudanças mais antigas são sobrescritas. Um único processo grava (o
+    supervisor); os processos de chat só leem.
+    """
+
+    def __init__(self, directory: str = DEFAULT_HISTORY_DIR, capacity: int = None):
+        self.directory = directory
+        self.capacity = capacity or int(os.getenv("STATUS_HISTORY_CAPACITY", "4096"))
+        os.makedirs(directory, exist_ok=True)
+        self._series = {}
+        self._states = {}
+        self._names = []
+        self._states_mtime = None
+        self._lock = threading.Lock()
+
+    # --- dicionário de estados ---
+
+    def _load_states(self):
+        path = os.path.join(self.directory, STATES_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return
+        if mtime != self._states_mtime:
+            with open(path, encoding="utf-8") as f:
+                self._names = json.load(f)
+            self._states = {name: code for code, name in enumerate(self._names)}
+            self._states_mtime = mtime
+
+    def _code(self, state: str) -> int:
+        self._load_states()
+        code = self._states.get(state)
+        if code is None:
+            code = len(self._names)
+            self._names.append(state)
+            self._states[state] = code
+            path = os.path.join(self.directory, STATES_FILE)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._names, f, ensure_ascii=False)
+            os.replace(tmp, path)
+            self._states_mtime = os.path.getmtime(path)
+        return code
+
+    def _state_name(self, code: int) -> str:
+        if code >= len(self._names):
+            self._load_states()
+        return self._names[code] if code < len(self._names) else "?"
+
+    # --- séries ---
+
+    def _open(self, kind: str, machine: str, create: bool):
+        key = (kind, machine)
+        series = self._series.get(key)
+        if series is not None:
+            return series
+        path = os.path.join(self.directory, _series_file(kind, machine))
+        if not os.path.exists(path):
+            if not create:
+                return None
+            series = np.memmap(path, dtype=RECORD_DTYPE, mode="w+", shape=(HEADER_RECORDS + self.capacity,))
+        else:
+            series = np.memmap(path, dtype=RECORD_DTYPE, mode="r+" if create else "r")
+        self._series[key] = series
+        return series
+
+    def record(self, kind: str, machine: str, state: str, ts: float = None) -> bool:
+        """Registra a amostra; só grava um registro novo quando o estado mudou. Retorna se mudou."""
+        ts = ts or time.time()
+        state = str(state)
+        with self._lock:
+            series = self._open(kind, machine, create=True)
+            capacity = len(series) - HEADER_RECORDS
+            total = int(series[0]["ts"])
+            code = self._code(state)
+            changed = total == 0 or int(series[HEADER_RECORDS + (total - 1) % capacity]["code"]) != code
+            if changed:
+                series[HEADER_RECORDS + total % capacity] = (ts, code)
+                series[0]["ts"] = total + 1
+            series[1]["ts"] = ts
+        return changed
+
+    def _records(self, kind: str, machine: str):
+        """(instantes, códigos) em ordem cronológica e o instante da última amostra."""
+        series = self._open(kind, machine, create=False)
+        if series is None:
+            return None
+        capacity = len(series) - HEADER_RECORDS
+        total = int(series[0]["ts"])
+        last_seen = float(series[1]["ts"])
+        body = np.array(series[HEADER_RECORDS:])
+        if total <= capacity:
+            body = body[:total]
+        else:
+            body = np.roll(body, -(total % capacity))
+        return body["ts"], body["code"], last_seen
+
+    def changes(self, kind: str, machine: str, start: float, end: float) -> list:
+        """[(instante, estado)] das mudanças no intervalo, começando pelo estado vigente em `start`."""
+        data = self._records(kind, machine)
+        if data is None:
+            return []
+        stamps, codes, _ = data
+        first = max(int(np.searchsorted(stamps, start, side="right")) - 1, 0)
+        last = int(np.searchsorted(stamps, end, side="right"))
+        return [(max(float(stamps[i]), start), self._state_name(int(codes[i]))) for i in range(first, last)]
+
+    def state_durations(self, kind: str, machine: str, start: float, end: float) -> dict:
+        """{estado: segundos} no intervalo, até a última amostra (sem inventar o que não foi visto)."""
+        data = self._records(kind, machine)
+        if data is None:
+            return {}
+        end = min(end, data[2])
+        events = self.changes(kind, machine, start, end)
+        durations = {}
+        for i, (ts, state) in enumerate(events):
+            until = events[i + 1][0] if i + 1 < len(events) else end
+            if until > ts:
+                durations[state] = durations.get(state, 0.0) + until - ts
+        return durations
+
+    def uptime(self, kind: str, machine: str, start: float, end: float, running_states: set = None) -> Optional[float]:
+        """Fração do tempo observado em estados de operação, ou None sem dados no intervalo."""
+        running_states = running_states or running_states_from_env()
+        durations = self.state_durations(kind, machine, start, end)
+        observed = sum(durations.values())
+        if not observed:
+            return None
+        return sum(s for state, s in durations.items() if state.lower() in running_states) / observed
+
+    def machines(self, kind: str) -> list:
+        """Séries gravadas do tipo, pelo series_key da máquina."""
+        prefix = f"{kind}__"
+        return sorted(f[len(prefix):-4] for f in os.listdir(self.directory) if f.startswith(prefix))
+
+    def find(self, kind: str, machine: str) -> Optional[str]:
+        """Série cujo nome contém o da máquina (como o LIKE '%nome%' das ferramentas de status)."""
+        wanted = series_key(machine).lower()
+        matches = [m for m in self.machines(kind) if wanted in m.lower()]
+        return min(matches, key=len) if matches else None
+
+
+class SqlStatusSource:
+    """Lê o estado atual de machines_status e products_status (colunas configuráveis por ambiente)."""
+
+    def __init__(self):
+        self.conn_str = (
+            "DRIVER={ODBC Driver 17 for SQL Server};"
+            f"SERVER={os.getenv('DB_SERVER_DEV')};DATABASE={os.getenv('DB_NAME_CONVERSATION')};"
+            f"UID={os.getenv('DB_USER_DEV')};PWD={os.getenv('DB_PASSWORD')}"
+        )
+        self.tables = {
+            "machine": ("machines_status", os.getenv("STATUS_HISTORY_MACHINE_FIELD", "status")),
+            "product": ("products_status", os.getenv("STATUS_HISTORY_PRODUCT_FIELD", "product")),
+        }
+
+    def rows(self) -> list:
+        import pyodbc
+
+        rows = []
+        with pyodbc.connect(self.conn_str) as conn:
+            with conn.cursor() as cursor:
+                for kind, (table, field) in self.tables.items():
+                    cursor.execute(f"SELECT machine_name, {field} FROM {table}")
+                    rows.extend((kind, machine, state) for machine, state in cursor.fetchall() if machine)
+        return rows
+
+
+class StatusRecorder:
+    """Amostra as tabelas de status a cada `interval` segundos (thread daemon no supervisor)."""
+
+    def __init__(self, store: StatusHistoryStore, fetch_rows: Callable, interval: float = None):
+        self.store = store
+        self.fetch_rows = fetch_rows
+        self.interval = interval or float(os.getenv("STATUS_HISTORY_INTERVAL", "30"))
+        self.stop_event = threading.Event()
+
+    def sample_once(self) -> int:
+        now = time.time()
+        changed = 0
+        for kind, machine, state in self.fetch_rows():
+            changed += self.store.record(kind, str(machine).strip(), state, now)
+        REGISTRY.increment("status_history_changes", changed)
+        return changed
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.sample_once()
+            except Exception as e:
+                logger.warning("falha ao amostrar o status das máquinas: %s", e)
+            self.stop_event.wait(self.interval)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self._loop, name="status-history", daemon=True)
+        thread.start()
+        logger.info("histórico de status ativo", extra={"interval": self.interval, "directory": self.store.directory})
+        return thread
+
+
+if __name__ == "__main__":
+    store = StatusHistoryStore()
+    StatusRecorder(store, SqlStatusSource().rows).sample_once()
+    now = time.time()
+    for machine in store.machines("machine"):
+        print(machine, store.state_durations("machine", machine, now - 86400, now))
@@ -1,38 +1,163 @@
-import traceback
+import os
+import sys
 import time
-from multiprocessing import Process, set_start_method
+import threading
+from datetime import datetime
+from multiprocessing import get_context, get_all_start_methods
 
-from main_agent import IntelligentAssistant
-from db_logs.receive import LastMessageFetcher
+from db_logs.receive import PendingMessageScanner
+from db_logs.inbox import UserInbox, SqlMessageSource
 from user_conversation.conversation import Conversation
+from user_conversation.session_state import SessionStateStore
 from helpers.users import SqlServerUserFetcher
+from helpers.presence import PresenceMonitor
+from llm_scheduler.coordinator import scheduler_enabled, serve_coordinator
+from cluster.membership import ClusterMembership, cluster_enabled
+from telemetry.logs import get_logger
+from telemetry.metrics import REGISTRY, MultiprocessMetrics, default_metrics_dir, start_metrics_server
+from telemetry.tracing import span, record_span, start_trace
 
-from langchain_core.messages import AIMessage, HumanMessage
+logger = get_logger("main")
+
+# Código de saída de um processo de chat que hibernou (não é erro: o supervisor o acorda
+# quando chegar mensagem nova).
+HIBERNATED_EXIT_CODE = 75
+# Falha ao montar a sessão (ex.: hub.pull ou banco fora do ar): o supervisor reinicia
+# com espera exponencial e desiste depois de algumas falhas seguidas.
+INIT_FAILED_EXIT_CODE = 70
 
 class ChatAndritz:
-    def __init__(self, user_id):
+    def __init__(self, user_id, message_fetcher=None, assistant=None, conversation_factory=Conversation,
+                 stop_event=None, state_store=None, idle_timeout=None):
         self.user_id = user_id
-        self.message_fetcher = LastMessageFetcher(self.user_id)
-        self.assistant = IntelligentAssistant()
+        self.stop_event = stop_event or threading.Event()
+        self.state_store = state_store
+        self.idle_timeout = idle_timeout
+        self.last_activity = time.monotonic()
+        self.hibernating = False
+        self.created_at = time.time()
+        self.restored = False
+        self.message_fetcher = message_fetcher or UserInbox(SqlMessageSource(self.user_id))
+        if assistant is None:
+            from main_agent import IntelligentAssistant
+
+            assistant = IntelligentAssistant()
+        self.assistant = assistant
+        self.conversation_factory = conversation_factory
         self.chat_history = []
+        self._restore()
+
+    def _restore(self):
+        if self.state_store is None:
+            return
+        restore_start = time.perf_counter()
+        state = self.state_store.load(self.user_id)
+        if state is None:
+            return
+        self.chat_history, self.message_fetcher.last_message_timestamp = state
+        self.restored = True
+        record_span("session_restore", time.perf_counter() - restore_start)
+        logger.info("sessão reidratada", extra={"user_id": self.user_id, "messages": len(self.chat_history)})
+
+    def _record_wake(self):
+        """
+        Custo real de acordar: da chegada da mensagem (timestamp gravado no banco) até a
+        primeira resposta, passando pela rodada do supervisor, o PendingMessageScanner, o
+        fork do processo e a inicialização do assistente. Sem timestamp utilizável, conta
+        a partir da criação da sessão.
+        """
+        self.restored = False
+        arrived = getattr(self.message_fetcher, "message_timestamp", None)
+        if isinstance(arrived, datetime):
+            seconds = (datetime.now(arrived.tzinfo) - arrived).total_seconds()
+        else:
+            seconds = time.time() - self.created_at
+        record_span("session_wake", max(seconds, 0.0))
+        logger.info("primeira resposta após acordar", extra={"user_id": self.user_id, "seconds": round(seconds, 2)})
+
+    def _ocioso(self) -> bool:
+        return bool(self.idle_timeout) and time.monotonic() - self.last_activity >= self.idle_timeout
+
+    def _hibernar(self):
+        """Salva o estado e sinaliza que o processo pode sair para liberar a memória."""
+        self.state_store.save(self.user_id, self.chat_history, self.message_fetcher.last_message_timestamp)
+        REGISTRY.increment("session_lifecycle", event="hibernate")
+        logger.info("sessão ociosa, hibernando", extra={"user_id": self.user_id})
 
     def _log_and_print(self, message):
         if not message: return
         
-        conv = Conversation(message, self.user_id)
-        conv.botResponse()
+        with span("bot_logs_write"):
+            conv = self.conversation_factory(message, self.user_id)
+            conv.botResponse()
     
     def _esperar_entrada_usuario(self):
-        while True:
-            nova_mensagem = self.message_fetcher.fetch_last_message()
-            if nova_mensagem: return nova_mensagem
-            time.sleep(0.5)
+        """
+        Retorna a próxima mensagem, ou None quando o supervisor pede para encerrar a sessão
+        ou quando ela ficou ociosa por mais de `idle_timeout` (nesse caso marca `hibernating`).
+        """
+        while not self.stop_event.is_set():
+            if self.state_store is not None and self._ocioso():
+                self.hibernating = True
+                return None
+            poll_start = time.perf_counter()
+            nova_mensagem = self.message_fetcher.next_message()
+            if nova_mensagem:
+                start_trace()
+                record_span("intake_poll", time.perf_counter() - poll_start)
+                return nova_mensagem
+            self.stop_event.wait(0.5)
+        return None
 
-    def chat(self):
+    def _vigiar_nova_mensagem(self, cancel_event, finished):
+        while not finished.wait(0.5):
+            if self.message_fetcher.has_new_message():
+                cancel_event.set()
+                return
+
+    def _responder(self, user_message):
+        # O status das máquinas citadas já começa a ser buscado enquanto o agente pensa.
+        scope = self.assistant.prefetch(user_message)
+        cancel_event = threading.Event()
+        finished = threading.Event()
+        watcher = threading.Thread(
+            target=self._vigiar_nova_mensagem, args=(cancel_event, finished), daemon=True
+        )
+        watcher.start()
+        try:
+            return self.assistant.run(user_message, self.chat_history, cancel_event=cancel_event, scope=scope)
+        finally:
+            finished.set()
+            watcher.join()
+            scope.close()
+
+    def chat(self) -> bool:
+        """Atende o usuário até o supervisor encerrar a sessão. Retorna True se ela hibernou."""
+        from langchain_core.messages import AIMessage, HumanMessage
 
         while True:
             user_message = self._esperar_entrada_usuario()
-            bot_response = self.assistant.run(user_message, self.chat_history)
+            if user_message is None:
+                if self.hibernating:
+                    self._hibernar()
+                    return True
+                if self.state_store is not None:
+                    # Se a sessão foi transferida para outro nó do cluster, ela continua de
+                    # onde parou; num logout o supervisor apaga este estado ao fim da drenagem.
+                    self.state_store.save(self.user_id, self.chat_history, self.message_fetcher.last_message_timestamp)
+                logger.info("sessão encerrada pelo supervisor", extra={"user_id": self.user_id})
+                return False
+            message_start = time.perf_counter()
+            logger.info("mensagem recebida", extra={"user_id": self.user_id})
+            bot_response = self._responder(user_message)
+
+            if bot_response is None:
+                # O usuário mandou outra mensagem (ex.: uma correção) durante a resposta: ela é
+                # descartada e a pergunta original volta para a caixa, junto com a nova.
+                logger.info("nova mensagem recebida, resposta anterior cancelada", extra={"user_id": self.user_id})
+                REGISTRY.increment("superseded_runs")
+                self.message_fetcher.requeue(user_message)
+                continue
     
             self.chat_history.append(HumanMessage(content=user_message))
             self.chat_history.append(AIMessage(content=bot_response))
@@ -40,51 +165,359 @@ class ChatAndritz:
             if len(self.chat_history) > 20:
                 self.chat_history = self.chat_history[-20:]
 
-            print(f"[{self.user_id}] Resposta do Bot: '{bot_response}'")
+            logger.debug("resposta do bot", extra={"user_id": self.user_id, "response": bot_response})
             self._log_and_print(bot_response)
+            record_span("message", time.perf_counter() - message_start)
+            if self.restored:
+                self._record_wake()
+            self.last_activity = time.monotonic()
+
+def exit_when_orphaned(interval: float = 1.0):
+    """
+    Encerra o processo de chat se o supervisor morrer. Sem isso a sessão continuaria
+    respondendo depois que a concessão do usuário vencesse e outro nó a assumisse.
+    """
+    parent = os.getppid()
 
-def start_chat_for_user(user_id):
+    def watch():
+        while os.getppid() == parent:
+            time.sleep(interval)
+        os._exit(1)
+
+    threading.Thread(target=watch, name="orphan-watch", daemon=True).start()
+
+def start_chat_for_user(user_id, stop_event=None):
+    exit_when_orphaned()
+    # O supervisor define METRICS_DIR quando expõe /metrics; aqui só se grava o arquivo do processo.
+    metrics = MultiprocessMetrics(os.environ["METRICS_DIR"]) if os.getenv("METRICS_DIR") else None
+    if metrics is not None:
+        metrics.start_export()
     try:
-        bot = ChatAndritz(user_id=user_id)
-        bot.chat()
-    except Exception:
-        print(f"O processo para o usuário {user_id} encontrou um erro fatal.")
-        traceback.print_exc()
+        _chat_session(user_id, stop_event)
+    finally:
+        if metrics is not None:
+            metrics.write()
 
-if __name__ == "__main__":
+def _chat_session(user_id, stop_event):
     try:
-        set_start_method('spawn')
-    except RuntimeError:
-        pass
-    
-    users = SqlServerUserFetcher()
-    active_processes = {}
-    POLL_INTERVAL = 60
+        bot = ChatAndritz(
+            user_id=user_id,
+            stop_event=stop_event,
+            state_store=SessionStateStore(),
+            idle_timeout=float(os.getenv("HIBERNATE_AFTER_SECONDS", "900")),
+        )
+    except Exception:
+        logger.exception("falha ao iniciar a sessão do usuário", extra={"user_id": user_id})
+        sys.exit(INIT_FAILED_EXIT_CODE)
+    try:
+        hibernated = bot.chat()
+    except Exception:
+        logger.exception("o processo do usuário encontrou um erro fatal", extra={"user_id": user_id})
+        sys.exit(1)
+    if hibernated:
+        sys.exit(HIBERNATED_EXIT_CODE)
 
-    while True:
-        try:
-            current_ids = set(users.get_user_ids())
-            running_ids = set(active_processes.keys())
-
-            for uid in (current_ids - running_ids):
-                print(f"Novo usuário detectado: {uid}. Iniciando processo de chat.")
-                
-                p = Process(
-                    target=start_chat_for_user,
-                    args=(uid,),
-                    name=f"ChatAndritz-{uid}"
-                )
-                p.daemon = True
-                p.start()
-                active_processes[uid] = p
-
-            for uid, p in list(active_processes.items()):
-                if not p.is_alive():
-                    active_processes.pop(uid)
+# Módulos carregados uma única vez no processo modelo do forkserver; cada usuário
+# novo é um fork dele e já nasce com LangChain, Chroma e o cliente do Dude importados.
+# helpers.agent_warmup baixa o prompt do agente no modelo: sessões novas e acordadas não
+# esperam o LangChain Hub.
+DEFAULT_PRELOAD = (
+    "main_agent,langchain_community.vectorstores,langchain_openai,dude.filter,thefuzz.process,"
+    "helpers.agent_warmup"
+)
 
-            time.sleep(POLL_INTERVAL)
+def process_context():
+    default_method = "forkserver" if "forkserver" in get_all_start_methods() else "spawn"
+    method = os.getenv("CHAT_START_METHOD", default_method)
+    ctx = get_context(method)
+    if method == "forkserver":
+        preload = os.getenv("CHAT_PRELOAD_MODULES", DEFAULT_PRELOAD)
+        ctx.set_forkserver_preload([m for m in preload.split(",") if m])
+    return ctx
+
+class SessionSupervisor:
+    """
+    Mantém um processo de chat por usuário online, reagindo aos logins/logouts do
+    PresenceMonitor. Quem sai recebe o sinal de parada: termina a resposta em andamento
+    e encerra; se passar de `drain_timeout`, o processo é finalizado à força. Acima de
+    `max_sessions` processos, os usuários novos esperam em fila até abrir vaga.
+    Sessões que hibernaram (processo saiu com HIBERNATED_EXIT_CODE) não ocupam vaga nem
+    fazem polling próprio: uma consulta única por rodada descobre quem recebeu mensagem
+    e a sessão é reiniciada a partir do estado salvo.
+
+    Com `cluster` (ClusterMembership), o supervisor só atende os usuários online que o
+    cluster atribuiu a este nó; os que passam para outro nó são drenados como num logout,
+    mas mantendo o estado salvo para o novo dono continuar a conversa.
+
+    Um processo que morre sem hibernar é reiniciado com espera exponencial por usuário
+    (`restart_backoff` dobrando até `restart_backoff_max`); depois de `max_restarts`
+    falhas seguidas o supervisor desiste até o usuário sair e entrar de novo. Uma sessão
+    que ficou de pé por `healthy_after` segundos zera a contagem.
+
+    Com `metrics` (MultiprocessMetrics), o arquivo de métricas de cada processo que termina
+    é consolidado, para o diretório não crescer a cada sessão.
+    """
+
+    def __init__(self, ctx, presence: PresenceMonitor, max_sessions: int = 100,
+                 drain_timeout: float = 30.0, target=start_chat_for_user,
+                 state_store=None, scanner=None, cluster=None,
+                 restart_backoff: float = 1.0, restart_backoff_max: float = 300.0,
+                 max_restarts: int = 5, healthy_after: float = 60.0, metrics=None):
+        self.ctx = ctx
+        self.presence = presence
+        self.max_sessions = max_sessions
+        self.drain_timeout = drain_timeout
+        self.target = target
+        self.state_store = state_store
+        self.scanner = scanner
+        self.cluster = cluster
+        self.assigned = set()
+        self.sessions = {}
+        self.draining = {}
+        self.waiting = []
+        self.hibernated = {}
+        self.restart_backoff = restart_backoff
+        self.restart_backoff_max = restart_backoff_max
+        self.max_restarts = max_restarts
+        self.healthy_after = healthy_after
+        self.started_at = {}
+        self.failures = {}
+        self.retry_at = {}
+        self.metrics = metrics
+
+    def _start(self, uid):
+        logger.info("iniciando processo de chat", extra={"user_id": uid})
+        stop_event = self.ctx.Event()
+        p = self.ctx.Process(target=self.target, args=(uid, stop_event), name=f"ChatAndritz-{uid}")
+        p.daemon = True
+        p.start()
+        self.sessions[uid] = (p, stop_event)
+        self.started_at[uid] = time.monotonic()
+
+    def _crashed(self, uid, exitcode):
+        """Agenda o reinício com espera exponencial, ou desiste depois de `max_restarts` falhas seguidas."""
+        now = time.monotonic()
+        if now - self.started_at.pop(uid, now) >= self.healthy_after:
+            self.failures.pop(uid, None)
+        failures = self.failures.get(uid, 0) + 1
+        self.failures[uid] = failures
+        reason = "init" if exitcode == INIT_FAILED_EXIT_CODE else "crash"
+        REGISTRY.increment("session_lifecycle", event=reason)
+        if failures >= self.max_restarts:
+            self.retry_at.pop(uid, None)
+            REGISTRY.increment("session_lifecycle", event="gave_up")
+            logger.error("processo de chat falhou repetidamente, desistindo até um novo login",
+                         extra={"user_id": uid, "exitcode": exitcode, "failures": failures})
+            return
+        delay = min(self.restart_backoff * 2 ** (failures - 1), self.restart_backoff_max)
+        self.retry_at[uid] = now + delay
+        logger.warning("processo de chat terminou inesperadamente",
+                       extra={"user_id": uid, "exitcode": exitcode, "failures": failures, "retry_in": delay})
+        if uid in self.assigned and uid not in self.waiting:
+            self.waiting.append(uid)
 
+    def _stop(self, uid, forget_state: bool = True):
+        if uid in self.waiting:
+            self.waiting.remove(uid)
+        self.hibernated.pop(uid, None)
+        self.started_at.pop(uid, None)
+        self.failures.pop(uid, None)
+        self.retry_at.pop(uid, None)
+        session = self.sessions.pop(uid, None)
+        if session is None:
+            self._forget(uid, forget_state)
+            return
+        p, stop_event = session
+        logger.info("encerrando a sessão", extra={"user_id": uid, "logout": forget_state})
+        stop_event.set()
+        # O processo salva o estado ao sair; num logout ele é apagado depois, em _reap.
+        self.draining[uid] = (p, time.monotonic() + self.drain_timeout, forget_state)
+
+    def _exited(self, p):
+        if self.metrics is not None:
+            try:
+                self.metrics.mark_process_dead(p.pid)
+            except OSError as e:
+                logger.warning("falha ao consolidar as métricas do processo: %s", e, extra={"pid": p.pid})
+
+    def _forget(self, uid, forget_state: bool):
+        if forget_state and self.state_store is not None:
+            self.state_store.delete(uid)
+
+    def _reap(self):
+        now = time.monotonic()
+        for uid, (p, deadline, forget_state) in list(self.draining.items()):
+            if not p.is_alive():
+                self.draining.pop(uid)
+                self._exited(p)
+                self._forget(uid, forget_state)
+            elif now >= deadline:
+                logger.warning("sessão não encerrou a tempo, finalizando", extra={"user_id": uid})
+                p.terminate()
+                p.join(1)
+                self.draining.pop(uid)
+                self._exited(p)
+                self._forget(uid, forget_state)
+
+        for uid, (p, _) in list(self.sessions.items()):
+            if p.is_alive():
+                continue
+            self.sessions.pop(uid)
+            self._exited(p)
+            if p.exitcode == HIBERNATED_EXIT_CODE:
+                self.started_at.pop(uid, None)
+                self.failures.pop(uid, None)
+                self.hibernated[uid] = self.state_store.last_seen(uid) if self.state_store else None
+            else:
+                self._crashed(uid, p.exitcode)
+
+    def _full(self) -> bool:
+        return len(self.sessions) + len(self.draining) >= self.max_sessions
+
+    def _fill(self):
+        now = time.monotonic()
+        for uid in list(self.waiting):
+            if self._full():
+                return
+            if uid in self.draining or self.retry_at.get(uid, now) > now:
+                continue
+            self.waiting.remove(uid)
+            self.retry_at.pop(uid, None)
+            self._start(uid)
+
+    def _wake(self):
+        if not self.hibernated or self.scanner is None:
+            return
+        try:
+            pending = self.scanner.users_with_new_messages(self.hibernated)
         except Exception as e:
-            print(f"Erro no loop principal do gerenciador de processos: {e}")
-            traceback.print_exc()
-            time.sleep(POLL_INTERVAL)
\ No newline at end of file
+            logger.error("erro ao verificar mensagens das sessões hibernadas: %s", e)
+            return
+        for uid in pending:
+            self.hibernated.pop(uid)
+            REGISTRY.increment("session_lifecycle", event="wake")
+            logger.info("mensagem nova, acordando a sessão", extra={"user_id": uid})
+            if uid not in self.waiting:
+                self.waiting.insert(0, uid)
+
+    def _assignment(self) -> tuple:
+        """Usuários que passaram a ser (logins) e deixaram de ser (logouts) deste nó."""
+        logins, logouts = self.presence.poll()
+        if self.cluster is None:
+            self.assigned = set(self.presence.active)
+            return logins, logouts
+        serving = self.cluster.sync(self.presence.active, set(self.sessions) | set(self.draining))
+        if serving is None:
+            self._fence()
+            serving = set()
+        logins, logouts = serving - self.assigned, self.assigned - serving
+        self.assigned = serving
+        REGISTRY.set_gauge("cluster_sessions", len(self.sessions), node=self.cluster.node_id)
+        return logins, logouts
+
+    def _fence(self):
+        """Nó isolado da coordenação: outro nó vai assumir estes usuários, então nada pode seguir respondendo."""
+        if not (self.sessions or self.draining or self.waiting or self.hibernated):
+            return
+        logger.error("sem contato com a coordenação do cluster, derrubando as sessões",
+                     extra={"sessions": len(self.sessions), "draining": len(self.draining)})
+        REGISTRY.increment("cluster_fenced", node=self.cluster.node_id)
+        for uid in list(self.sessions):
+            self._stop(uid, forget_state=False)
+        for uid, (p, _, _) in list(self.draining.items()):
+            p.terminate()
+            p.join(1)
+            self.draining.pop(uid)
+            self._exited(p)
+        self.waiting.clear()
+        self.hibernated.clear()
+        self.failures.clear()
+        self.retry_at.clear()
+
+    def tick(self):
+        logins, logouts = self._assignment()
+        for uid in logouts:
+            # Ainda online = transferido para outro nó: o estado salvo segue com o usuário.
+            self._stop(uid, forget_state=uid not in self.presence.active)
+        for uid in sorted(logins):
+            if uid not in self.sessions and uid not in self.waiting:
+                self.waiting.append(uid)
+                if self._full():
+                    logger.warning("limite de sessões atingido, usuário na fila",
+                                   extra={"user_id": uid, "waiting": len(self.waiting)})
+        self._reap()
+        self._wake()
+        self._fill()
+
+    def shutdown(self):
+        for uid in list(self.sessions):
+            self._stop(uid, forget_state=False)
+        while self.draining:
+            self._reap()
+            time.sleep(0.2)
+        if self.cluster is not None:
+            self.cluster.leave()
+
+if __name__ == "__main__":
+    ctx = process_context()
+
+    # Um único /metrics por supervisor: os processos de chat herdam METRICS_DIR e gravam
+    # lá as próprias métricas, somadas a cada coleta do Prometheus.
+    metrics = None
+    if os.getenv("METRICS_PORT"):
+        metrics_port = int(os.getenv("METRICS_PORT"))
+        metrics = MultiprocessMetrics(default_metrics_dir(metrics_port))
+        metrics.reset()
+        os.environ["METRICS_DIR"] = metrics.directory
+        if start_metrics_server(metrics_port, collector=metrics) is None:
+            logger.error("porta de métricas ocupada, /metrics indisponível", extra={"port": metrics_port})
+
+    if scheduler_enabled():
+        serve_coordinator()
+
+    if os.getenv("SCHEMA_MIGRATIONS", "on").lower() != "off":
+        from db_logs.schema import ensure_schema_or_retry, RetentionJob
+
+        ensure_schema_or_retry()
+        if int(os.getenv("LOGS_RETENTION_DAYS", "90")) > 0:
+            RetentionJob().start()
+
+    if os.getenv("STATUS_HISTORY", "on").lower() != "off":
+        from machines.status_history import StatusHistoryStore, StatusRecorder, SqlStatusSource
+
+        StatusRecorder(StatusHistoryStore(), SqlStatusSource().rows).start()
+
+    if os.getenv("ANALYTICS_REFRESHER", "on").lower() != "off":
+        from dude.analytics import AnalyticsRefresher, DEFAULT_SNAPSHOT_PATH, dude_fetch
+
+        AnalyticsRefresher(dude_fetch, snapshot_path=DEFAULT_SNAPSHOT_PATH).start()
+
+    cluster = None
+    if cluster_enabled():
+        cluster = ClusterMembership()
+        logger.info("modo cluster ativo", extra={"node": cluster.node_id})
+
+    supervisor = SessionSupervisor(
+        ctx,
+        PresenceMonitor(SqlServerUserFetcher()),
+        max_sessions=int(os.getenv("MAX_CHAT_SESSIONS", "100")),
+        drain_timeout=float(os.getenv("SESSION_DRAIN_SECONDS", "30")),
+        state_store=SessionStateStore(),
+        scanner=PendingMessageScanner(),
+        cluster=cluster,
+        restart_backoff=float(os.getenv("SESSION_RESTART_BACKOFF_SECONDS", "1")),
+        restart_backoff_max=float(os.getenv("SESSION_RESTART_BACKOFF_MAX_SECONDS", "300")),
+        max_restarts=int(os.getenv("SESSION_MAX_RESTARTS", "5")),
+        metrics=metrics,
+    )
+    POLL_INTERVAL = float(os.getenv("PRESENCE_POLL_SECONDS", "1"))
+
+    try:
+        while True:
+            try:
+                supervisor.tick()
+            except Exception as e:
+                logger.exception("erro no loop principal do gerenciador de processos: %s", e)
+            time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        supervisor.shutdown()
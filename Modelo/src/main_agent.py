@@ -1,27 +1,46 @@
 import os
 import json
+import time
+import asyncio
+import threading
 import pyodbc
 from dotenv import load_dotenv
 
 from machines.formated_machines import formated_machines
 from machines.machines import machines_names
-from dude.filter import Filter
 from cache.cache import ManualCachedEmbedder
-
-from langchain_openai import ChatOpenAI
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain.tools.retriever import create_retriever_tool
-from langchain.agents import AgentExecutor, create_openai_functions_agent
+from cache.llm_cache import build_llm_cache
+from cache.semantic_cache import SemanticAnswerCache, InMemorySemanticBackend, RedisSemanticBackend
+from RAG.hybrid_search import HybridRetriever, load_lexical_index
+from RAG.retrieval_cache import RetrievalCache
+from RAG.index_store import DEFAULT_INDEX_ROOT, current_directory, current_version
+from helpers.tool_runtime import with_timeout, memoized, run_cancellable, DEFAULT_TOOL_TIMEOUT
+from helpers.text import normalize_query
+from helpers.request_scope import RequestScope, activate, prefetched
+from telemetry.callbacks import TracingCallbackHandler
+from telemetry.logs import get_logger
+from telemetry.tracing import span
+from telemetry.metrics import REGISTRY
+from llm_scheduler.coordinator import scheduler_enabled
+from intents.fast_path import IntentRouter, MachineResolver
+from intents.prefetch import ToolPrefetcher
+from dude.analytics import AnalyticsRefresher, AnalyticsSnapshot, BACKLOG_AGE_BUCKETS, DIMENSIONS, dude_fetch, format_table
+from llm_scheduler.langchain_gate import gate_chat_model, GatedEmbeddings
+from helpers.model_tiers import ModelTiers
+
+from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain_core.tools import tool
-from langchain import hub
 from typing import Optional
-from thefuzz import process
 from langchain.globals import set_llm_cache
-from langchain_redis.cache import RedisCache
+
+# Chroma, OpenAI, thefuzz e o cliente do Dude são importados no primeiro uso: o supervisor
+# e o processo de cada usuário não pagam por eles antes de precisar. No modo forkserver
+# eles já vêm carregados do processo modelo (ver main.py).
 
 load_dotenv()
 
+logger = get_logger("main_agent")
+
 sql_server_config = {
     'driver': '{ODBC Driver 17 for SQL Server}', 
     'server': os.getenv("DB_SERVER_DEV"), 
@@ -30,6 +49,90 @@ sql_server_config = {
     'pwd': os.getenv("DB_PASSWORD") 
 }
 
+documentation_settings = {
+    "index_root": DEFAULT_INDEX_ROOT,
+    "embedder": None,
+}
+
+def configure_documentation(index_root: Optional[str] = None, embedder=None):
+    """Define a raiz do índice (RAG_INDEX_ROOT) e o embedder usados por search_documentation."""
+    if index_root:
+        documentation_settings["index_root"] = index_root
+    if embedder is not None:
+        documentation_settings["embedder"] = embedder
+
+def _documentation_embedder():
+    embedder = documentation_settings["embedder"]
+    if embedder is None:
+        from langchain_openai import OpenAIEmbeddings
+
+        base_embedder = OpenAIEmbeddings(model="text-embedding-3-small")
+        if scheduler_enabled():
+            base_embedder = GatedEmbeddings(base_embedder, priority="interactive")
+        embedder = ManualCachedEmbedder(base_embedder=base_embedder)
+        documentation_settings["embedder"] = embedder
+    return embedder
+
+_machine_resolvers = {}
+
+def _best_match(query: str, choices):
+    """
+    Apelido exato da máquina (o mesmo MachineResolver do atalho e do prefetch) antes do
+    fuzzy: sozinho, o fuzzy casa "Tear 5" com "CF1035 / Tear 04", e a chave da consulta
+    antecipada nunca coincidia com a da ferramenta.
+    """
+    resolver = _machine_resolvers.get(id(choices))
+    if resolver is None:
+        resolver = _machine_resolvers[id(choices)] = MachineResolver(choices)
+    exact = resolver.resolve(query)
+    if exact:
+        return exact, 100
+
+    from thefuzz import process
+
+    return process.extractOne(query, choices)
+
+_vectorstores = {}
+
+# Resultados de search_documentation por consulta normalizada; zerado quando o indexador
+# publica uma versão nova do índice (ponteiro CURRENT, ver RAG/index_store.py).
+retrieval_cache = RetrievalCache(
+    version_source=lambda: current_version(documentation_settings["index_root"]),
+    max_bytes=int(os.getenv("RETRIEVAL_CACHE_MAX_BYTES", str(8 * 2**20))),
+)
+
+def _open_vectorstore(persist_directory: str):
+    """
+    Abre o índice uma vez por processo. RAG_VECTOR_BACKEND=quantized usa a matriz quantizada
+    em mmap (compartilhada entre os processos pelo page cache); o padrão continua sendo o Chroma.
+    Quando uma versão nova é publicada, a anterior é liberada e a nova aberta na próxima consulta.
+    """
+    backend = os.getenv("RAG_VECTOR_BACKEND", "chroma").lower()
+    key = (backend, persist_directory)
+    store = _vectorstores.get(key)
+    if store is not None:
+        return store
+
+    for stale in [k for k in _vectorstores if k[0] == backend]:
+        del _vectorstores[stale]
+
+    if backend == "quantized":
+        from RAG.quantized_store import QuantizedVectorStore
+
+        if QuantizedVectorStore.exists(persist_directory):
+            store = QuantizedVectorStore(persist_directory, _documentation_embedder(),
+                                         nprobe=int(os.getenv("RAG_QUANTIZED_NPROBE", "8")))
+        else:
+            logger.warning("índice quantizado não encontrado em %s; usando o Chroma", persist_directory)
+
+    if store is None:
+        from langchain_community.vectorstores import Chroma
+
+        store = Chroma(persist_directory=persist_directory, embedding_function=_documentation_embedder())
+
+    _vectorstores[key] = store
+    return store
+
 @tool
 def get_live_general_status() -> str:
     """Use esta ferramenta para obter o status em tempo real das maquinas e produtos. Quando não for informado uma máquina específica, retorna o status geral de todas as máquinas e produtos."""
@@ -38,7 +141,7 @@ def get_live_general_status() -> str:
                 f"DATABASE={sql_server_config['database']};UID={sql_server_config['uid']};"
                 f"PWD={sql_server_config['pwd']};charset='UTF-8'")
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with span("sql"), pyodbc.connect(conn_str) as conn:
             with conn.cursor() as cursor:
                 query = """
                             SELECT * FROM products_status JOIN
@@ -63,18 +166,21 @@ def get_live_machine_status(machine_name_db: str) -> str:
 
     canonical_equipment_name = None
     if machine_name_db:
-        best_match, score = process.extractOne(machine_name_db, machines_names)
-        print(best_match, score)
+        best_match, score = _best_match(machine_name_db, machines_names)
+        logger.debug("máquina resolvida", extra={"query": machine_name_db, "match": best_match, "score": score})
         if score >= 80:
             canonical_equipment_name = best_match
         else:
             return f"Equipamento '{machine_name_db}' não encontrado na lista de máquinas válidas."
-        
+
+    return prefetched(("machine_status", canonical_equipment_name), _machine_status_query, canonical_equipment_name)
+
+def _machine_status_query(canonical_equipment_name: str) -> str:
     conn_str = (f"DRIVER={sql_server_config['driver']};SERVER={sql_server_config['server']};"
                 f"DATABASE={sql_server_config['database']};UID={sql_server_config['uid']};"
                 f"PWD={sql_server_config['pwd']};charset='UTF-8'")
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with span("sql"), pyodbc.connect(conn_str) as conn:
             with conn.cursor() as cursor:
                 query = "SELECT * FROM machines_status WHERE machine_name LIKE ?"
                 cursor.execute(query, f'%{canonical_equipment_name}%')
@@ -96,7 +202,7 @@ def get_live_product_status(machine_name_db: str) -> str:
 
     canonical_equipment_name = None
     if machine_name_db:
-        best_match, score = process.extractOne(machine_name_db, machines_names)
+        best_match, score = _best_match(machine_name_db, machines_names)
 
         if score >= 80:
             canonical_equipment_name = best_match
@@ -107,7 +213,7 @@ def get_live_product_status(machine_name_db: str) -> str:
                 f"DATABASE={sql_server_config['database']};UID={sql_server_config['uid']};"
                 f"PWD={sql_server_config['pwd']};charset='UTF-8'")
     try:
-        with pyodbc.connect(conn_str) as conn:
+        with span("sql"), pyodbc.connect(conn_str) as conn:
             with conn.cursor() as cursor:
                 query = "SELECT * FROM products_status WHERE machine_name LIKE ?"
                 cursor.execute(query, f'%{canonical_equipment_name}%')
@@ -132,15 +238,21 @@ def search_service_orders_api(user_input: str, equipment_name: Optional[str] = N
     - equipment_name: O nome do equipamento ou máquina a ser consultado.
     - date_iso: Estamos em 2025. A data da consulta no formato 'YYYY-MM-DDThh-mm-ss'. O agente pode converter 'hoje' ou 'ontem' para este formato.
     """
-    print(f"--- ATIVANDO FERRAMENTA: search_service_orders_api ---")
-    print(f"Parâmetros recebidos: Equipamento='{equipment_name}', Status='{status}', Data='{date_iso}'")
+    logger.debug("search_service_orders_api", extra={"equipment_name": equipment_name, "status": status, "date_iso": date_iso})
     
     canonical_equipment_name = None
     if equipment_name:
-        best_match, score = process.extractOne(equipment_name, formated_machines)
+        best_match, score = _best_match(equipment_name, formated_machines)
         if score >= 80:
             canonical_equipment_name = best_match
-    
+
+    # A chave não inclui o user_input: dentro da mesma resposta ele é sempre a mensagem do
+    # usuário (ou uma paráfrase dela feita pelo LLM), e é a máquina e o status que definem a consulta.
+    key = ("service_orders", canonical_equipment_name, status, date_iso)
+    return prefetched(key, _service_orders_query, user_input, canonical_equipment_name, status, date_iso)
+
+def _service_orders_query(user_input: str, canonical_equipment_name: Optional[str],
+                          status: Optional[str], date_iso: Optional[str]) -> str:
     api_body_list = ["vazio", "vazio", "vazio"]
 
     if date_iso:
@@ -152,10 +264,111 @@ def search_service_orders_api(user_input: str, equipment_name: Optional[str] = N
     if canonical_equipment_name:
         api_body_list[2] = canonical_equipment_name
 
+    from dude.filter import Filter
+
     filter_instance = Filter(api_body_list, user_input)
-    result = filter_instance.filter_order()
+    return filter_instance.filter_order()
+
+status_history = None
+
+def _status_history():
+    global status_history
+    if status_history is None:
+        from machines.status_history import StatusHistoryStore
+
+        status_history = StatusHistoryStore()
+    return status_history
+
+@tool
+def get_machine_status_history(machine_name_db: str, hours: float = 24, kind: str = "machine") -> str:
+    """
+    Histórico de estado de uma máquina (ou do produto nela) gravado a cada mudança. Use para perguntas sobre o passado, como "quanto tempo o tear 3 ficou parado hoje" ou "qual foi a disponibilidade da Dilo nas últimas 8 horas".
+    - machine_name_db: nome ou identificador da máquina.
+    - hours: janela em horas até agora (para "hoje", use as horas desde a meia-noite).
+    - kind: 'machine' para o estado da máquina ou 'product' para o produto em produção.
+    """
+    if kind not in ("machine", "product"):
+        return "kind deve ser 'machine' ou 'product'."
+    best_match, score = _best_match(machine_name_db, machines_names)
+    if score < 80:
+        return f"Equipamento '{machine_name_db}' não encontrado na lista de máquinas válidas."
+
+    store = _status_history()
+    series = store.find(kind, best_match)
+    if series is None:
+        return f"Ainda não há histórico gravado para '{best_match}'."
+
+    end = time.time()
+    start = end - hours * 3600
+    durations = store.state_durations(kind, series, start, end)
+    if not durations:
+        return f"Sem amostras de '{best_match}' nas últimas {hours:g} horas."
+
+    rows = sorted(([state, f"{seconds / 60:.0f}", f"{seconds / sum(durations.values()):.0%}"]
+                   for state, seconds in durations.items()), key=lambda r: -float(r[1]))
+    lines = [f"Estados de {best_match} nas últimas {hours:g} horas:", format_table(["Estado", "Minutos", "Fração"], rows)]
+    uptime = store.uptime(kind, series, start, end)
+    if kind == "machine" and uptime is not None:
+        lines.append(f"Disponibilidade (tempo em operação / tempo observado): {uptime:.1%}")
+    recent = store.changes(kind, series, start, end)[-10:]
+    lines.append("Últimas mudanças:\n" + "\n".join(
+        f"- {time.strftime('%d/%m %H:%M', time.localtime(ts))}: {state}" for ts, state in recent))
+    return "\n\n".join(lines)
+
+# Agregados de manutenção sobre as ordens do Dude. O supervisor (main.py) os mantém
+# atualizados em segundo plano e publica em arquivo; sem esse arquivo (ex.: main_agent
+# rodando sozinho), o processo carrega e atualiza os seus no primeiro uso.
+shared_analytics = AnalyticsSnapshot()
+maintenance_analytics = AnalyticsRefresher(dude_fetch)
+
+ANALYTICS_METRICS = ("counts", "mttr", "backlog", "top_assets")
 
-    return result
+@tool
+def get_maintenance_analytics(metric: str, equipment_name: Optional[str] = None, days: int = 30, group_by: str = "asset") -> str:
+    """
+    Indicadores de manutenção já calculados sobre as ordens de serviço do Dude. Use esta ferramenta (e não search_service_orders_api) para perguntas de contagem, tempo médio ou ranking, como "quantas OS abertas por máquina", "tempo médio de conclusão do tear 7" ou "quais máquinas mais quebraram este mês". Retorna tabelas pequenas e exatas.
+    - metric: 'counts' (quantidade de OS por status, agrupada por group_by), 'mttr' (tempo médio até a conclusão, em horas), 'backlog' (OS abertas e há quanto tempo estão abertas) ou 'top_assets' (máquinas com mais OS).
+    - equipment_name: opcional, restringe a uma máquina.
+    - days: janela em dias contada a partir de hoje (padrão 30). Para "este mês", use os dias desde o dia 1.
+    - group_by: para 'counts': 'asset', 'status', 'category' ou 'sector'.
+    """
+    if metric not in ANALYTICS_METRICS:
+        return f"Métrica '{metric}' inválida. Use uma de: {', '.join(ANALYTICS_METRICS)}."
+
+    asset = None
+    if equipment_name:
+        best_match, score = _best_match(equipment_name, formated_machines)
+        if score < 80:
+            return f"Equipamento '{equipment_name}' não encontrado na lista de máquinas válidas."
+        asset = best_match
+
+    try:
+        analytics = shared_analytics.current() or maintenance_analytics.ensure_fresh()
+    except Exception as e:
+        return f"Ocorreu um erro ao consultar as ordens do Dude: {e}"
+
+    if metric == "counts":
+        if group_by not in DIMENSIONS:
+            return f"group_by '{group_by}' inválido. Use uma de: {', '.join(DIMENSIONS)}."
+        table = analytics.counts(days, group_by, asset)
+        statuses = sorted({status for row in table.values() for status in row})
+        rows = sorted(([value] + [row.get(s, 0) for s in statuses] + [sum(row.values())]
+                       for value, row in table.items()), key=lambda r: -r[-1])
+        return format_table([group_by] + statuses + ["Total"], rows)
+
+    if metric == "mttr":
+        table = analytics.mttr(days, asset)
+        rows = sorted(([a, f"{hours:.1f}", n] for a, (hours, n) in table.items()), key=lambda r: r[0])
+        return format_table(["Ativo", "Horas médias até concluir", "OS concluídas"], rows)
+
+    if metric == "backlog":
+        table = analytics.backlog(asset)
+        labels = [label for _, label in BACKLOG_AGE_BUCKETS]
+        rows = sorted(([a, row["abertas"]] + [row[l] for l in labels] + [f"{row['idade_media_dias']:.1f}"]
+                       for a, row in table.items()), key=lambda r: -r[1])
+        return format_table(["Ativo", "Abertas"] + labels + ["Idade média (dias)"], rows)
+
+    return format_table(["Ativo", "OS criadas"], [list(item) for item in analytics.top_assets(days)])
 
 @tool
 def search_documentation(query: str, source_filter: Optional[dict] = None) -> str:
@@ -165,79 +378,238 @@ def search_documentation(query: str, source_filter: Optional[dict] = None) -> st
     Exemplo para filtrar por nome de arquivo: {"file_name": "Analista de Automação Sr - 1.057 .pdf"}
     Exemplo para filtrar por tipo de documento (tabela): {"source_table": "mantas"}
     """
-    print(f"--- ATIVANDO FERRAMENTA: search_documentation ---")
-    print(f"Query: '{query}', Filtro: {source_filter}")
+    logger.debug("search_documentation", extra={"query": query, "source_filter": source_filter})
 
-    db_path = r"C:\Users\Rafael\Desktop\Projeto 2025\Modelo\rag_db_index"
+    # O cache guarda só os trechos: a chave é a consulta normalizada, e o cabeçalho cita a
+    # pergunta atual, não a de quem preencheu a entrada.
+    context = retrieval_cache.get(query, source_filter)
+    if context is None:
+        persist_directory = current_directory(documentation_settings["index_root"])
+        vectorstore = _open_vectorstore(persist_directory)
 
-    base_embedder = OpenAIEmbeddings(model="text-embedding-3-small")
-    cached_embedder = ManualCachedEmbedder(base_embedder=base_embedder)
+        retriever = HybridRetriever(vectorstore, load_lexical_index(persist_directory), k=5)
 
-    vectorstore = Chroma(
-        persist_directory=db_path,
-        embedding_function=cached_embedder
-    )
-
-    search_kwargs = {'k': 5}
-    
-    if source_filter:
-        search_kwargs['filter'] = source_filter
+        with span("chroma"):
+            docs = retriever.search(query, source_filter)
 
-    retriever = vectorstore.as_retriever(search_kwargs=search_kwargs)
-    
-    docs = retriever.invoke(query)
+        context = "\n\n---\n\n".join(
+            f"[Fonte: {doc.metadata.get('file_name', doc.metadata.get('source_table', 'N/A'))}]\n{doc.page_content}"
+            for doc in docs
+        )
+        retrieval_cache.put(query, source_filter, context)
 
-    if not docs:
+    if not context:
         return "Nenhuma informação relevante foi encontrada para esta consulta com os filtros aplicados."
-
-    context = "\n\n---\n\n".join(
-        f"[Fonte: {doc.metadata.get('file_name', doc.metadata.get('source_table', 'N/A'))}]\n{doc.page_content}"
-        for doc in docs
-    )
     return f"Aqui estão os trechos de documentos encontrados sobre '{query}':\n\n{context}"
 
+TOOL_TIMEOUTS = {
+    "search_service_orders_api": 60.0,
+    "get_maintenance_analytics": 60.0,
+    "search_documentation": 20.0,
+}
+
+# Como cada argumento entra na chave de memoização da resposta (padrão: normalize_question).
+TOOL_ARGUMENT_NORMALIZERS = {
+    "search_documentation": {"query": normalize_query},
+}
+
+AGENT_PROMPT = "hwchase17/openai-functions-agent"
+_agent_prompt = None
+
+def load_agent_prompt():
+    """
+    Prompt do agente, baixado do LangChain Hub uma vez por processo. No forkserver o
+    download acontece no processo modelo (helpers.agent_warmup), então cada sessão nova
+    ou acordada já herda o prompt em memória. Cada chamada retorna uma cópia própria.
+    """
+    global _agent_prompt
+    if _agent_prompt is None:
+        from langchain import hub
+
+        prompt = hub.pull(AGENT_PROMPT)
+        prompt.input_variables.append("chat_history")
+        _agent_prompt = prompt
+    return _agent_prompt.model_copy(deep=True)
+
+def create_agent_executor(llm, tools: list, prompt) -> AgentExecutor:
+    """
+    Usa o agente de tools da OpenAI, que pode pedir várias ferramentas no mesmo turno.
+    Via ainvoke, o AgentExecutor executa essas chamadas concorrentemente.
+    """
+    agent = create_openai_tools_agent(llm, tools, prompt)
+    return AgentExecutor(agent=agent, tools=tools, verbose=False, return_intermediate_steps=True)
+
 class IntelligentAssistant:
-    def __init__(self, persist_directory=r"C:\Users\Rafael\Desktop\Projeto 2025\Modelo\rag_db_index"):
+    def __init__(self, index_root=None, llm=None, prompt=None, embedder=None):
 
         load_dotenv()
         
-        try:
-            redis_url = "redis://localhost:6379/0"
-            set_llm_cache(RedisCache(redis_url=redis_url))
-        except Exception as e:
-            print(f"AVISO: Cache de LLM com Redis desativado. Erro: {e}")
+        self.llm_cache = build_llm_cache()
+        set_llm_cache(self.llm_cache)
+
+        configure_documentation(index_root, embedder)
 
-        self.llm = ChatOpenAI(model="gpt-4o", temperature=0)
+        if llm is None:
+            llm = self._create_llm()
+        self.llm = llm
         self.tools = self._create_tools()
 
-        prompt = hub.pull("hwchase17/openai-functions-agent")
-        prompt.input_variables.append("chat_history")
-        agent = create_openai_functions_agent(self.llm, self.tools, prompt)
+        if prompt is None:
+            prompt = load_agent_prompt()
+        self.agent_executor = create_agent_executor(self.llm, self.tools, prompt)
+        self.tracing_handler = TracingCallbackHandler()
+        self.answer_cache = self._create_answer_cache()
+        self.intent_router = self._create_intent_router()
+        self.prefetcher = self._create_prefetcher()
+
+    @staticmethod
+    def _create_llm():
+        """
+        Com LLM_TIERS ligado (padrão), o agente escolhe ferramentas e redige com os modelos
+        menores de cada papel e só sobe para o grande em contexto longo ou baixa confiança.
+        """
+        if os.getenv("LLM_TIERS", "on").lower() != "off":
+            return ModelTiers().chat_model("auto")
+
+        from langchain_openai import ChatOpenAI
+
+        llm = ChatOpenAI(model="gpt-4o", temperature=0)
+        return gate_chat_model(llm) if scheduler_enabled() else llm
+
+    def _create_intent_router(self) -> Optional[IntentRouter]:
+        if os.getenv("FAST_PATH", "on").lower() == "off":
+            return None
+        return IntentRouter(
+            machine_status=get_live_machine_status.func,
+            product_status=get_live_product_status.func,
+            service_orders=search_service_orders_api.func,
+            status_machines=machines_names,
+            order_machines=formated_machines,
+        )
+
+    def _create_prefetcher(self) -> Optional[ToolPrefetcher]:
+        if os.getenv("PREFETCH", "on").lower() == "off":
+            return None
+        return ToolPrefetcher(
+            machine_status=_machine_status_query,
+            service_orders=_service_orders_query,
+            status_machines=machines_names,
+            order_machines=formated_machines,
+            fast_path=self.intent_router is not None,
+        )
+
+    def prefetch(self, user_input: str) -> RequestScope:
+        """
+        Chamado assim que a mensagem sai da caixa: dispara em segundo plano as consultas
+        que o agente provavelmente vai pedir. Passe o scope retornado para run() e feche-o
+        no fim da resposta (close() cancela o que não foi usado).
+        """
+        if self.prefetcher is None:
+            return RequestScope()
+        try:
+            return self.prefetcher.start(user_input)
+        except Exception as e:
+            logger.warning("falha ao antecipar consultas: %s", e)
+            return RequestScope()
+
+    def _create_answer_cache(self) -> SemanticAnswerCache:
+        embedder = _documentation_embedder()
+        threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        max_entries = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500"))
+
+        backend = InMemorySemanticBackend(max_entries=max_entries)
+        redis_url = os.getenv("REDIS_URL")
+        if redis_url:
+            try:
+                backend = RedisSemanticBackend(redis_url, max_entries=max_entries)
+                backend.client.ping()
+            except Exception as e:
+                logger.warning("cache semântico usando memória local; Redis indisponível: %s", e)
+                backend = InMemorySemanticBackend(max_entries=max_entries)
+
+        return SemanticAnswerCache(embedder, backend=backend, similarity_threshold=threshold)
+
+    def _cached_answer(self, user_input: str, chat_history: list) -> Optional[str]:
+        try:
+            return self.answer_cache.lookup(user_input, chat_history)
+        except Exception as e:
+            logger.warning("falha ao consultar o cache semântico: %s", e)
+            return None
 
-        self.agent_executor = AgentExecutor(agent=agent, tools=self.tools, verbose=True)
+    def _store_answer(self, user_input: str, chat_history: list, answer: str, intermediate_steps: list):
+        tools_used = [action.tool for action, _ in intermediate_steps]
+        try:
+            self.answer_cache.store(user_input, answer, tools_used, chat_history)
+        except Exception as e:
+            logger.warning("falha ao gravar no cache semântico: %s", e)
 
     def _create_tools(self) -> list:
-        
-        print("Criando ferramenta de RAG com MultiQueryRetriever...")
 
-        return [
+        default_timeout = float(os.getenv("TOOL_TIMEOUT_SECONDS", DEFAULT_TOOL_TIMEOUT))
+        tools = [
             get_live_machine_status,
             get_live_product_status,
             search_service_orders_api,
             get_live_general_status,
             search_documentation,
+            get_maintenance_analytics,
+            get_machine_status_history,
+        ]
+        return [
+            with_timeout(memoized(t, TOOL_ARGUMENT_NORMALIZERS.get(t.name)), TOOL_TIMEOUTS.get(t.name, default_timeout))
+            for t in tools
         ]
 
-    def run(self, user_input: str, chat_history: list) -> str:
+    def run(self, user_input: str, chat_history: list, cancel_event: Optional[threading.Event] = None,
+            scope: Optional[RequestScope] = None) -> Optional[str]:
+        """Retorna None quando `cancel_event` é sinalizado antes do agente terminar."""
+        return asyncio.run(self.arun(user_input, chat_history, cancel_event, scope))
+
+    async def arun(self, user_input: str, chat_history: list, cancel_event: Optional[threading.Event] = None,
+                   scope: Optional[RequestScope] = None) -> Optional[str]:
+        with activate(scope or RequestScope()) as active:
+            try:
+                return await self._arun(user_input, chat_history, cancel_event)
+            finally:
+                if active.duplicate_calls:
+                    logger.info("chamadas repetidas de ferramenta", extra={"duplicates": active.duplicate_calls})
+
+    async def _arun(self, user_input: str, chat_history: list, cancel_event: Optional[threading.Event]) -> Optional[str]:
+        if self.intent_router is not None:
+            with span("fast_path"):
+                fast_answer = await asyncio.to_thread(self.intent_router.answer, user_input)
+            if fast_answer is not None:
+                return fast_answer
+
+        with span("semantic_cache_lookup"):
+            cached = self._cached_answer(user_input, chat_history)
+        if cached:
+            logger.info("resposta servida pelo cache semântico")
+            return cached
+
+        agent_start = time.perf_counter()
         try:
-            response = self.agent_executor.invoke({
-                "input": user_input,
-                "chat_history": chat_history 
-            })
-
-            return response.get('output', "Não obtive uma resposta.")
+            with span("agent_invoke"):
+                response = await run_cancellable(
+                    self.agent_executor.ainvoke(
+                        {"input": user_input, "chat_history": chat_history},
+                        config={"callbacks": [self.tracing_handler]},
+                    ),
+                    cancel_event,
+                )
+            if response is None:
+                return None
+
+            output = response.get('output')
+            if not output:
+                return "Não obtive uma resposta."
+
+            self._store_answer(user_input, chat_history, output, response.get("intermediate_steps", []))
+            REGISTRY.observe("answer_latency", time.perf_counter() - agent_start, path="agent")
+            return output
         
         except Exception as e:
+            logger.exception("falha ao executar o agente")
             return "Desculpe, enfrentei um problema técnico e não consegui processar sua solicitação."
 
     def start_chat(self):
@@ -248,7 +620,7 @@ class IntelligentAssistant:
                 print("Até logo!")
                 break
             
-            assistant_response = self.run(user_input, "")
+            assistant_response = self.run(user_input, [])
 
             print(f"\nAssistente: {assistant_response}\n")
 
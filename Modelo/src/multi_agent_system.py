@@ -5,7 +5,6 @@ from typing import List, TypedDict, Annotated
 import operator
 
 # Importações de Ferramentas e Agentes
-from langchain_openai import ChatOpenAI
 from langchain import hub
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
@@ -20,14 +19,19 @@ from langchain_core.output_parsers import StrOutputParser
 # Importações do LangGraph
 from langgraph.graph import StateGraph, END
 
+from helpers.model_tiers import ModelTiers
+from telemetry.logs import get_logger
+
 # --- Carregando Configurações ---
 load_dotenv()
 
+logger = get_logger("multi_agent")
+
 # --- Ferramentas ---
 @tool
 def search_internal_docs(query: str) -> str:
     """Busca na documentação interna da empresa (manuais, PDFs, procedimentos) para responder a uma pergunta."""
-    print(f"--- Ferramenta Interna (RAG) ativada com a query: '{query}' ---")
+    logger.debug("ferramenta interna (RAG) ativada", extra={"query": query})
     vectorstore = Chroma(persist_directory="./rag_db_index", embedding_function=OpenAIEmbeddings(model="text-embedding-3-small"))
     retriever = vectorstore.as_retriever(search_kwargs={'k': 5}) # Aumentei k para mais contexto
     docs = retriever.invoke(query)
@@ -49,68 +53,70 @@ class AgentState(TypedDict):
     revision_number: int
 
 # --- Definição dos Nós do Grafo ---
-llm = ChatOpenAI(model="gpt-4o", temperature=0)
+# Cada nó usa o modelo do seu papel; o grande (gpt-4o) só entra em contexto longo ou baixa confiança.
+tiers = ModelTiers()
+planner_llm = tiers.chat_model("router")
+researcher_llm = tiers.chat_model("auto")
+writer_llm = tiers.chat_model("writer")
 
 def plan_node(state: AgentState):
     """Nó de Planejamento: O supervisor cria um plano."""
-    print("--- Nó: Planejador ---")
+    logger.debug("nó em execução", extra={"node": "planner"})
     system_prompt = "Você é o agente planejador. Sua tarefa é criar um plano passo a passo conciso para responder à solicitação do usuário. Descreva qual especialista deve agir: o 'pesquisador de documentação interna' ou o 'pesquisador web', ou ambos."
     
     # Usando uma chain simples: Prompt | LLM | Parser
     prompt = ChatPromptTemplate.from_messages([("system", system_prompt), ("human", "{task}")])
-    planner_chain = prompt | llm | StrOutputParser()
+    planner_chain = prompt | planner_llm | StrOutputParser()
     result = planner_chain.invoke({"task": state['task']})
     return {"plan": result}
 
 def documentation_research_node(state: AgentState):
     """Nó de Pesquisa Interna: Executa a busca nos documentos RAG."""
-    print("--- Nó: Pesquisador de Documentação ---")
+    logger.debug("nó em execução", extra={"node": "doc_researcher"})
     prompt = hub.pull("hwchase17/openai-functions-agent")
     system_prompt = "Você é um especialista em documentação interna da Andritz. Use a ferramenta de busca para encontrar a informação solicitada pelo usuário."
-    agent = create_openai_functions_agent(llm, [search_internal_docs], prompt.partial(system_prompt=system_prompt))
+    agent = create_openai_functions_agent(researcher_llm, [search_internal_docs], prompt.partial(system_prompt=system_prompt))
     executor = AgentExecutor(agent=agent, tools=[search_internal_docs])
     result = executor.invoke({"input": state['task'], "chat_history": []})
     return {"tool_output": [f"Resultado da Pesquisa Interna:\n{result['output']}"]}
 
 def web_search_node(state: AgentState):
     """Nó de Pesquisa Web: Executa a busca na internet."""
-    print("--- Nó: Pesquisador Web ---")
+    logger.debug("nó em execução", extra={"node": "web_searcher"})
     prompt = hub.pull("hwchase17/openai-functions-agent")
     system_prompt = "Você é um especialista em encontrar informações atualizadas e regulamentações na internet. Use a ferramenta de busca na web."
-    agent = create_openai_functions_agent(llm, [web_search_tool], prompt.partial(system_prompt=system_prompt))
+    agent = create_openai_functions_agent(researcher_llm, [web_search_tool], prompt.partial(system_prompt=system_prompt))
     executor = AgentExecutor(agent=agent, tools=[web_search_tool])
     result = executor.invoke({"input": state['task'], "chat_history": []})
     return {"tool_output": [f"Resultado da Pesquisa Web:\n{result['output']}"]}
 
 def draft_node(state: AgentState):
     """Nó de Rascunho: Junta todas as informações em uma resposta coesa."""
-    print("--- Nó: Redator ---")
+    logger.debug("nó em execução", extra={"node": "drafter"})
     draft_input = f"Tarefa do Usuário: {state['task']}\n\nDados Coletados:\n" + "\n\n".join(state['tool_output'])
     system_prompt = "Você é um redator especialista. Com base na tarefa do usuário e nos dados coletados, escreva uma resposta final completa, consolidada e bem estruturada."
 
     # Usando uma chain simples para o redator também
     prompt = ChatPromptTemplate.from_messages([("system", system_prompt), ("human", "{draft_input}")])
-    drafting_chain = prompt | llm | StrOutputParser()
+    drafting_chain = prompt | writer_llm | StrOutputParser()
     result = drafting_chain.invoke({"draft_input": draft_input})
     return {"draft": result}
 
 # --- Lógica de Roteamento ---
 def router(state: AgentState):
     """Decide qual nó executar a seguir com base no plano."""
-    print("--- Nó: Roteador ---")
     plan = state['plan'].lower()
     if "pesquisador web" in plan and ("documentação interna" in plan or "documentos internos" in plan):
-        print("Decisão: Chamar ambos os pesquisadores.")
-        return ["doc_researcher", "web_searcher"]
+        decision = ["doc_researcher", "web_searcher"]
     elif "pesquisador web" in plan:
-        print("Decisão: Chamar Pesquisador Web.")
-        return "web_searcher"
+        decision = "web_searcher"
     elif "documentação interna" in plan or "documentos internos" in plan:
-        print("Decisão: Chamar Pesquisador de Documentação.")
-        return "doc_researcher"
+        decision = "doc_researcher"
     else:
-        print("Decisão: Nenhum pesquisador necessário, seguir para a redação.")
-        return "drafter"
+        # Nenhum pesquisador necessário: segue direto para a redação.
+        decision = "drafter"
+    logger.info("decisão do roteador", extra={"decision": decision})
+    return decision
 
 # --- Construção do Grafo ---
 workflow = StateGraph(AgentState)
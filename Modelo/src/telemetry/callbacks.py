@@ -0,0 +1,51 @@
+import time
+from typing import Any, Dict, List
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from telemetry.logs import get_logger
+from telemetry.tracing import record_span
+
+logger = get_logger("agent")
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Mede cada chamada de LLM e de ferramenta do AgentExecutor. Substitui o verbose=True."""
+
+    def __init__(self):
+        self._started = {}
+
+    def _start(self, run_id: UUID, name: str):
+        self._started[run_id] = (name, time.perf_counter())
+
+    def _finish(self, run_id: UUID, status: str = "ok", **attrs):
+        item = self._started.pop(run_id, None)
+        if item is None:
+            return
+        name, start = item
+        record_span(name, time.perf_counter() - start, status, **attrs)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage", {}) if response else {}
+        self._finish(run_id, total_tokens=usage.get("total_tokens"))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._finish(run_id, "error", error=str(error))
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs):
+        name = (serialized or {}).get("name", "desconhecida")
+        logger.debug("ferramenta iniciada", extra={"tool": name, "tool_input": input_str})
+        self._start(run_id, f"tool:{name}")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._finish(run_id, "error", error=str(error))
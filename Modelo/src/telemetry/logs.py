@@ -0,0 +1,56 @@
+import os
+import json
+import logging
+
+from telemetry.tracing import current_trace_id
+
+_configured = False
+
+
+class _TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
+class _StructuredFormatter(logging.Formatter):
+    """Uma linha JSON por evento; campos extras passados em `extra=` entram no objeto."""
+
+    _RESERVED = set(vars(logging.makeLogRecord({}))) | {"trace_id", "message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging():
+    """Configura o logging do processo. Nível vem de LOG_LEVEL (padrão INFO)."""
+    global _configured
+    if _configured:
+        return
+    handler = logging.StreamHandler()
+    handler.addFilter(_TraceIdFilter())
+    handler.setFormatter(_StructuredFormatter())
+
+    root = logging.getLogger("andritz")
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root.addHandler(handler)
+    root.propagate = False
+    _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    configure_logging()
+    return logging.getLogger(f"andritz.{name}")
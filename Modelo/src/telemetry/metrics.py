@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import bisect
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites dos buckets em segundos: de 5 ms (cache/SQL local) até 2 min (turno completo do agente).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Aproximação pelo limite superior do bucket que contém o quantil."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for i, c in enumerate(self.counts):
+            running += c
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            histograms = {
+                _series_name(name, labels): {
+                    "count": h.count,
+                    "sum": round(h.total, 6),
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                    "p99": h.quantile(0.99),
+                }
+                for (name, labels), h in self._histograms.items()
+            }
+            counters = {_series_name(name, labels): v for (name, labels), v in self._counters.items()}
+            gauges = {_series_name(name, labels): v for (name, labels), v in self._gauges.items()}
+        return {"histograms": histograms, "counters": counters, "gauges": gauges}
+
+    def dump(self) -> dict:
+        """Estado bruto, em JSON, para somar os registros de vários processos (MultiprocessMetrics)."""
+        with self._lock:
+            return {
+                "histograms": [[name, list(labels), list(h.buckets), list(h.counts), h.total, h.count]
+                               for (name, labels), h in self._histograms.items()],
+                "counters": [[name, list(labels), v] for (name, labels), v in self._counters.items()],
+                "gauges": [[name, list(labels), v] for (name, labels), v in self._gauges.items()],
+            }
+
+    def merge(self, data: dict, gauges: bool = True, **gauge_labels):
+        """Soma histogramas e contadores de `data` (ver dump); gauges recebem `gauge_labels` extras."""
+        with self._lock:
+            for name, labels, buckets, counts, total, count in data.get("histograms", ()):
+                key = (name, _label_key(labels))
+                hist = self._histograms.get(key)
+                if hist is None:
+                    hist = self._histograms[key] = Histogram(buckets)
+                if list(hist.buckets) != list(buckets):
+                    continue
+                hist.counts = [a + b for a, b in zip(hist.counts, counts)]
+                hist.total += total
+                hist.count += count
+            for name, labels, value in data.get("counters", ()):
+                key = (name, _label_key(labels))
+                self._counters[key] = self._counters.get(key, 0) + value
+            if gauges:
+                for name, labels, value in data.get("gauges", ()):
+                    self._gauges[(name, _label_key(list(labels) + list(gauge_labels.items())))] = value
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for (name, labels), h in sorted(self._histograms.items()):
+                metric = f"andritz_{name}" if name.endswith("_seconds") else f"andritz_{name}_seconds"
+                running = 0
+                for bound, c in zip(h.buckets, h.counts):
+                    running += c
+                    lines.append(f"{metric}_bucket{_labels(labels, le=bound)} {running}")
+                lines.append(f"{metric}_bucket{_labels(labels, le='+Inf')} {h.count}")
+                lines.append(f"{metric}_sum{_labels(labels)} {h.total:.6f}")
+                lines.append(f"{metric}_count{_labels(labels)} {h.count}")
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f"andritz_{name}_total{_labels(labels)} {value}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                lines.append(f"andritz_{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _label_key(labels) -> tuple:
+    return tuple(sorted((str(k), v) for k, v in labels))
+
+
+def _series_name(name: str, labels: tuple) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+def _labels(labels: tuple, **extra) -> str:
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class MultiprocessMetrics:
+    """
+    Métricas de todos os processos de chat num diretório, servidas por um único endpoint
+    no supervisor. Cada processo grava o próprio registro em <pid>.json a cada `interval`
+    segundos (start_export); o supervisor soma os arquivos ao responder /metrics. Quando
+    um processo termina (mark_process_dead), seus contadores e histogramas passam para
+    archive.json, para os totais não voltarem, e os gauges dele são descartados.
+    Os gauges dos processos de chat levam o rótulo `pid`.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.archive_path = os.path.join(directory, "archive.json")
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _pid_path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def _read(self, path: str) -> dict:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, path: str, data: dict):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def write(self, registry: MetricsRegistry = REGISTRY):
+        self._write(self._pid_path(os.getpid()), registry.dump())
+
+    def start_export(self, registry: MetricsRegistry = REGISTRY, interval: float = None) -> threading.Thread:
+        interval = interval or float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+        def loop():
+            while True:
+                try:
+                    self.write(registry)
+                except OSError:
+                    pass
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, name="metrics-export", daemon=True)
+        thread.start()
+        return thread
+
+    def mark_process_dead(self, pid: int):
+        path = self._pid_path(pid)
+        data = self._read(path)
+        if not data:
+            return
+        archive = MetricsRegistry()
+        with self._lock:
+            archive.merge(self._read(self.archive_path))
+            archive.merge(data, gauges=False)
+            self._write(self.archive_path, archive.dump())
+            os.remove(path)
+
+    def reset(self):
+        """Apaga o que sobrou de uma execução anterior (chamado na subida do supervisor)."""
+        for name in os.listdir(self.directory):
+            if name.endswith(".json") or name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def collect(self, registry: MetricsRegistry = REGISTRY) -> MetricsRegistry:
+        """O registro deste processo somado aos arquivos dos demais."""
+        merged = MetricsRegistry()
+        merged.merge(registry.dump())
+        with self._lock:
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                stem = name[:-len(".json")]
+                if stem == str(os.getpid()):
+                    continue
+                data = self._read(os.path.join(self.directory, name))
+                if stem.isdigit():
+                    merged.merge(data, pid=stem)
+                else:
+                    merged.merge(data, gauges=False)
+        return merged
+
+
+def default_metrics_dir(port: int) -> str:
+    return os.getenv("METRICS_DIR") or os.path.join(tempfile.gettempdir(), f"andritz-metrics-{port}")
+
+
+def start_metrics_server(port: int, registry: MetricsRegistry = REGISTRY, collector: MultiprocessMetrics = None):
+    """
+    Sobe um endpoint /metrics no formato Prometheus em uma thread daemon. Com `collector`,
+    a resposta soma as métricas gravadas pelos processos de chat. Retorna None se a porta
+    estiver ocupada.
+    """
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            source = collector.collect(registry) if collector is not None else registry
+            body = source.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    except OSError:
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from typing import Optional
+
+from telemetry.metrics import REGISTRY
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+def start_trace(trace_id: str = None) -> str:
+    """Abre um novo trace para a mensagem atual. Vale para o contexto corrente e suas tasks/threads."""
+    trace_id = trace_id or uuid.uuid4().hex[:16]
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+class JsonlSpanExporter:
+    """Grava spans em JSONL por uma thread de fundo, sem bloquear o caminho da mensagem."""
+
+    def __init__(self, path: str, max_queue: int = 10000):
+        self.path = path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        threading.Thread(target=self._drain, name="span-exporter", daemon=True).start()
+
+    def export(self, record: dict):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch)
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except OSError:
+                self.dropped += len(batch)
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def _get_exporter() -> Optional[JsonlSpanExporter]:
+    global _exporter
+    path = os.getenv("TRACE_JSONL_PATH")
+    if not path:
+        return None
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = JsonlSpanExporter(path)
+    return _exporter
+
+
+def record_span(name: str, duration: float, status: str = "ok", **attrs):
+    """Registra um span já medido (usado pelos callbacks do LangChain)."""
+    REGISTRY.observe("span", duration, span=name)
+    if status != "ok":
+        REGISTRY.increment("span_errors", span=name)
+    exporter = _get_exporter()
+    if exporter:
+        exporter.export({
+            "trace_id": current_trace_id(),
+            "span": name,
+            "duration_ms": round(duration * 1000, 3),
+            "status": status,
+            "pid": os.getpid(),
+            "ts": time.time(),
+            **attrs,
+        })
+
+
+@contextmanager
+def span(name: str, **attrs):
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        record_span(name, time.perf_counter() - start, status, **attrs)
+
+
+def traced(name: str):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Os módulos do projeto são importados a partir de Modelo/src, como nos benchmarks.
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
@@ -0,0 +1,198 @@
+"""
+FairScheduler com relógio falso: a cota de requisições é de 1 por minuto, então cada
+avanço de 60 s no relógio libera exatamente uma chamada e a ordem de liberação fica
+determinística. As threads só servem para bloquear em acquire como os processos de chat.
+"""
+import threading
+import time
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+
+from llm_scheduler.fair_scheduler import FairScheduler
+from llm_scheduler.langchain_gate import gate_chat_model
+
+
+class FakeClock:
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class LocalClient:
+    """Mesma interface do SchedulerClient, direto num FairScheduler (sem coordenador)."""
+
+    def __init__(self, scheduler: FairScheduler, client_id: str = "chat-1", estimated_tokens: float = 100):
+        self.scheduler = scheduler
+        self.client_id = client_id
+        self.estimated_tokens = estimated_tokens
+
+    def acquire(self, priority: str = "interactive", tokens: float = None) -> float:
+        return self.scheduler.acquire(self.client_id, priority, tokens or self.estimated_tokens)
+
+    def report_usage(self, actual_tokens: float, estimated_tokens: float = None):
+        self.scheduler.report_usage(actual_tokens - (estimated_tokens or self.estimated_tokens))
+
+    def report_throttled(self, retry_after: float = None):
+        self.scheduler.report_throttled(retry_after)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class ThrottledChatModel(FakeListChatModel):
+    """Modelo falso que responde 429 em toda chamada."""
+
+    def _call(self, *args, **kwargs):
+        raise RateLimitError("rate limit")
+
+
+def _wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condição não atingida a tempo")
+        time.sleep(0.005)
+
+
+def _queued(scheduler: FairScheduler) -> int:
+    return sum(scheduler.stats()["queue_depth"].values())
+
+
+class Harness:
+    def __init__(self, scheduler: FairScheduler, clock: FakeClock):
+        self.scheduler = scheduler
+        self.clock = clock
+        self.granted = []
+        self.threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, client_id: str, priority: str = "interactive", tokens: float = 1):
+        """Dispara um acquire numa thread e espera ele entrar na fila (a ordem de chegada fica fixa)."""
+        before = _queued(self.scheduler)
+
+        def run():
+            self.scheduler.acquire(client_id, priority, tokens)
+            with self._lock:
+                self.granted.append(name)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        _wait_for(lambda: _queued(self.scheduler) > before or name in self.granted)
+
+    def advance(self, seconds: float):
+        self.clock.now += seconds
+        # report_usage(0) só acorda quem espera; o relógio falso não avança sozinho.
+        self.scheduler.report_usage(0)
+
+    def release_one(self) -> str:
+        count = len(self.granted)
+        self.advance(60)
+        _wait_for(lambda: len(self.granted) > count)
+        return self.granted[-1]
+
+    def join(self):
+        for thread in self.threads:
+            thread.join(5)
+
+
+@pytest.fixture
+def harness():
+    clock = FakeClock()
+    scheduler = FairScheduler(requests_per_minute=1, tokens_per_minute=1_000_000, clock=clock)
+    # Gasta a única requisição disponível: daqui em diante só sai uma a cada 60 s do relógio.
+    scheduler.acquire("warmup")
+    return Harness(scheduler, clock)
+
+
+def test_round_robin_between_clients(harness):
+    for name in ("a1", "a2", "a3"):
+        harness.submit(name, "user-a")
+    harness.submit("b1", "user-b")
+    harness.submit("c1", "user-c")
+
+    order = [harness.release_one() for _ in range(5)]
+    harness.join()
+
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+
+
+def test_interactive_goes_before_background(harness):
+    harness.submit("embeddings-1", "indexer", priority="background")
+    harness.submit("embeddings-2", "indexer", priority="background")
+    harness.submit("chat", "user-a", priority="interactive")
+
+    order = [harness.release_one() for _ in range(3)]
+    harness.join()
+
+    assert order == ["chat", "embeddings-1", "embeddings-2"]
+
+
+def test_nothing_released_before_the_clock_allows(harness):
+    harness.submit("a1", "user-a")
+    harness.advance(30)
+    time.sleep(0.05)
+    assert harness.granted == []
+
+    harness.advance(30)
+    _wait_for(lambda: harness.granted == ["a1"])
+    harness.join()
+
+
+def test_throttled_pauses_with_exponential_backoff():
+    clock = FakeClock()
+    scheduler = FairScheduler(max_backoff=5, clock=clock)
+
+    scheduler.report_throttled()
+    assert scheduler.stats()["paused_for"] == 2
+    scheduler.report_throttled()
+    assert scheduler.stats()["paused_for"] == 4
+    scheduler.report_throttled()
+    assert scheduler.stats()["paused_for"] == 5
+
+    scheduler.report_usage(0)
+    clock.now += 10
+    scheduler.report_throttled()
+    assert scheduler.stats()["paused_for"] == 2
+
+
+def test_throttled_honours_retry_after_and_blocks_acquire():
+    clock = FakeClock()
+    scheduler = FairScheduler(clock=clock)
+    harness = Harness(scheduler, clock)
+
+    scheduler.report_throttled(retry_after=7)
+    assert scheduler.stats()["paused_for"] == 7
+
+    harness.submit("a1", "user-a")
+    harness.advance(6)
+    time.sleep(0.05)
+    assert harness.granted == []
+
+    harness.advance(1)
+    _wait_for(lambda: harness.granted == ["a1"])
+    harness.join()
+
+
+def test_gated_fake_model_takes_a_request_from_the_node_quota():
+    clock = FakeClock()
+    scheduler = FairScheduler(requests_per_minute=10, clock=clock)
+    model = gate_chat_model(FakeListChatModel(responses=["ok"], cache=False), client=LocalClient(scheduler))
+
+    assert model.invoke("status do tear 5").content == "ok"
+    assert scheduler.stats()["requests_available"] == 9
+
+
+def test_rate_limit_error_from_model_pauses_the_scheduler():
+    clock = FakeClock()
+    scheduler = FairScheduler(clock=clock)
+    model = gate_chat_model(ThrottledChatModel(responses=["nunca"], cache=False), client=LocalClient(scheduler))
+
+    with pytest.raises(RateLimitError):
+        model.invoke("status do tear 5")
+
+    assert scheduler.stats()["paused_for"] == 2
@@ -0,0 +1,26 @@
+"""
+Orçamento de importação do supervisor (user-031): main.py tem que subir rápido e sem
+carregar LangChain, Chroma, OpenAI etc., que só entram no processo de cada usuário.
+IMPORT_BUDGET_MS ajusta o limite em máquinas mais lentas (CI).
+"""
+import os
+
+import pytest
+
+from bench.import_profile import SUPERVISOR_FORBIDDEN, check_budget
+
+SUPERVISOR_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "400"))
+
+
+@pytest.fixture(autouse=True)
+def _requires_odbc():
+    # main importa o pyodbc no start (pollers SQL); sem o driver ODBC o import nem roda.
+    pytest.importorskip("pyodbc", exc_type=ImportError)
+
+
+def test_supervisor_import_within_budget():
+    assert check_budget("main", SUPERVISOR_BUDGET_MS) == []
+
+
+def test_supervisor_does_not_import_agent_stack():
+    assert check_budget("main", float("inf"), SUPERVISOR_FORBIDDEN) == []
@@ -0,0 +1,126 @@
+"""
+Níveis de modelo (helpers.model_tiers) com FakeListChatModel no lugar da OpenAI: quando
+sobe para o modelo grande e o que fica registrado por papel/modelo.
+"""
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import helpers.model_tiers as model_tiers
+from helpers.model_tiers import ModelTiers
+from telemetry.metrics import MetricsRegistry
+
+USAGE = {"input_tokens": 1000, "output_tokens": 100, "total_tokens": 1100}
+
+
+class NamedFakeChatModel(FakeListChatModel):
+    """FakeListChatModel com nome de modelo e uso de tokens, como a resposta da OpenAI."""
+
+    model_name: str
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        result.generations[0].message.usage_metadata = dict(USAGE)
+        return result
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(model_tiers, "REGISTRY", registry)
+    return registry
+
+
+def _calls(registry, model: str) -> int:
+    histograms = registry.snapshot()["histograms"]
+    return sum(h["count"] for name, h in histograms.items()
+               if name.startswith("llm_role_latency") and f"model={model}," in name)
+
+
+def _tiers(small_responses, large_responses, max_small_context_tokens=6000):
+    models = {
+        "gpt-4o-mini": NamedFakeChatModel(model_name="gpt-4o-mini", responses=small_responses, cache=False),
+        "gpt-4o": NamedFakeChatModel(model_name="gpt-4o", responses=large_responses, cache=False),
+    }
+    return ModelTiers(factory=models.__getitem__, large_model="gpt-4o",
+                      role_models={role: "gpt-4o-mini" for role in model_tiers.ROLES},
+                      max_small_context_tokens=max_small_context_tokens)
+
+
+def test_confident_small_model_answers_alone(registry):
+    tiers = _tiers(["O tear 5 está rodando."], ["grande"])
+
+    answer = tiers.chat_model("auto").invoke([HumanMessage(content="status do tear 5")])
+
+    assert answer.content == "O tear 5 está rodando."
+    assert (_calls(registry, "gpt-4o-mini"), _calls(registry, "gpt-4o")) == (1, 0)
+    counters = registry.snapshot()["counters"]
+    assert not any(name.startswith("llm_escalations") for name in counters)
+
+
+def test_low_confidence_escalates_to_large_model(registry):
+    tiers = _tiers(["Não sei responder isso."], ["Resposta do modelo grande."])
+
+    answer = tiers.chat_model("auto").invoke([HumanMessage(content="por que o tear 5 parou?")])
+
+    assert answer.content == "Resposta do modelo grande."
+    assert (_calls(registry, "gpt-4o-mini"), _calls(registry, "gpt-4o")) == (1, 1)
+    counters = registry.snapshot()["counters"]
+    assert counters["llm_escalations{reason=baixa_confianca,role=tool_caller}"] == 1
+
+
+def test_long_context_goes_straight_to_large_model(registry):
+    tiers = _tiers(["pequeno"], ["Resumo do manual."], max_small_context_tokens=100)
+
+    answer = tiers.chat_model("auto").invoke([HumanMessage(content="trecho do manual " * 100)])
+
+    assert answer.content == "Resumo do manual."
+    assert (_calls(registry, "gpt-4o-mini"), _calls(registry, "gpt-4o")) == (0, 1)
+    counters = registry.snapshot()["counters"]
+    assert counters["llm_escalations{reason=contexto_longo,role=tool_caller}"] == 1
+
+
+def test_writer_role_after_tool_result(registry):
+    tiers = _tiers(["Há 2 ordens abertas."], ["grande"])
+    messages = [
+        HumanMessage(content="ordens abertas do tear 5"),
+        AIMessage(content="", tool_calls=[{"name": "search_service_orders_api", "args": {}, "id": "call-1"}]),
+        ToolMessage(content='[{"ordem": 1}, {"ordem": 2}]', tool_call_id="call-1"),
+    ]
+
+    tiers.chat_model("auto").invoke(messages)
+
+    histograms = registry.snapshot()["histograms"]
+    assert histograms["llm_role_latency{model=gpt-4o-mini,role=writer}"]["count"] == 1
+    assert _calls(registry, "gpt-4o") == 0
+
+
+def test_metrics_recorded_per_role_and_model(registry):
+    tiers = _tiers(["Não sei."], ["Resposta."])
+
+    tiers.chat_model("auto").invoke([HumanMessage(content="status do tear 5")])
+
+    snapshot = registry.snapshot()
+    histograms, counters = snapshot["histograms"], snapshot["counters"]
+    for model in ("gpt-4o-mini", "gpt-4o"):
+        assert histograms[f"llm_role_latency{{model={model},role=tool_caller}}"]["count"] == 1
+        assert counters[f"llm_role_tokens{{kind=input,model={model},role=tool_caller}}"] == 1000
+        assert counters[f"llm_role_tokens{{kind=output,model={model},role=tool_caller}}"] == 100
+    for model, (input_price, output_price) in model_tiers.MODEL_PRICES.items():
+        expected = (1000 * input_price + 100 * output_price) / 1_000_000
+        assert counters[f"llm_role_cost_usd{{model={model},role=tool_caller}}"] == pytest.approx(expected)
+
+
+def test_one_instance_per_model_name():
+    calls = []
+
+    def factory(name):
+        calls.append(name)
+        return NamedFakeChatModel(model_name=name, responses=["ok"])
+
+    tiers = ModelTiers(factory=factory, large_model="gpt-4o",
+                       role_models={role: "gpt-4o-mini" for role in model_tiers.ROLES})
+    tiers.chat_model("auto")
+    tiers.chat_model("writer")
+
+    assert sorted(calls) == ["gpt-4o", "gpt-4o-mini"]
@@ -23,24 +23,8 @@ class Conversation:
             f'PWD={self.password};'
             'TrustServerCertificate=yes;'
         )
+        # bot_logs e seus índices são criados pelas migrações em db_logs.schema.
         conn = pyodbc.connect(conn_str, autocommit=True)
-        cursor = conn.cursor()
-        cursor.execute("""
-        IF NOT EXISTS (
-            SELECT * 
-            FROM sys.tables 
-            WHERE name = 'bot_logs'
-        )
-        BEGIN
-            CREATE TABLE bot_logs (
-                id INT IDENTITY(1,1) PRIMARY KEY,
-                userId NVARCHAR(50) NOT NULL,
-                botMessage NVARCHAR(MAX) NOT NULL,
-                userTimeStamp DATETIMEOFFSET NOT NULL 
-                    DEFAULT SYSDATETIMEOFFSET()
-            );
-        END
-        """)
         return conn
 
     def botResponse(self):
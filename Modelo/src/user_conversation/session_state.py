@@ -0,0 +1,80 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_STATE_DIR = os.getenv(
+    "SESSION_STATE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "session_state"),
+)
+
+
+def _encode_timestamp(value):
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    return value
+
+
+def _decode_timestamp(value):
+    if isinstance(value, dict) and "datetime" in value:
+        return datetime.fromisoformat(value["datetime"])
+    return value
+
+
+class SessionStateStore:
+    """
+    Guarda em disco o estado de uma sessão hibernada: histórico do chat e o timestamp da
+    última mensagem já lida. Um arquivo JSON por usuário, gravado de forma atômica.
+    """
+
+    def __init__(self, directory: str = DEFAULT_STATE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, user_id: str) -> str:
+        name = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def save(self, user_id: str, chat_history: list, last_message_timestamp):
+        from langchain_core.messages import messages_to_dict
+
+        state = {
+            "user_id": user_id,
+            "chat_history": messages_to_dict(chat_history),
+            "last_message_timestamp": _encode_timestamp(last_message_timestamp),
+        }
+        path = self._path(user_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _read(self, user_id: str):
+        try:
+            with open(self._path(user_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, user_id: str):
+        """Retorna (chat_history, last_message_timestamp), ou None se não há estado salvo."""
+        from langchain_core.messages import messages_from_dict
+
+        state = self._read(user_id)
+        if state is None:
+            return None
+        return messages_from_dict(state["chat_history"]), _decode_timestamp(state["last_message_timestamp"])
+
+    def last_seen(self, user_id: str):
+        state = self._read(user_id)
+        return _decode_timestamp(state["last_message_timestamp"]) if state else None
+
+    def delete(self, user_id: str):
+        try:
+            os.remove(self._path(user_id))
+        except OSError:
+            pass